@@ -1,5 +1,5 @@
 import os
-from datetime import timedelta
+import numpy as np
 from datetime import datetime
 from shinywaffle.common.event.event_handler import EventHandler
 from shinywaffle.data.data_provider import BacktestDataProvider
@@ -7,18 +7,30 @@ from shinywaffle.backtesting.reporter import Reporter
 from shinywaffle.utils import misc
 from shinywaffle.common.context import Context
 from shinywaffle.utils.progress_bar import ProgressBar
-from typing import List
+from shinywaffle.backtesting import clock
+from shinywaffle.backtesting.clock import ClockType, TradingSession
+from shinywaffle.utils.instrumentation import Instrumentation
+from typing import Optional
 
 
 class Backtester:
 
     """
     Class for holding the backtesting code
+
+    The clock decides which times the backtest steps through: every time increment (ClockType.TYPE_GRID) or only the
+    times with data in any of the time series of the context (ClockType.TYPE_DATA). The session, if given, removes
+    the times outside of the trading session from either clock.
+
+    With instrument=True the event loop records the number of calls and the time spent per event type, strategy and
+    subsystem, which is reported under 'instrumentation'. It is None when the backtest is not instrumented.
     """
 
     def __init__(self, context: Context, time_increment: str, run_from: datetime = None,
                  run_to: datetime = None, path: str = os.getcwd(),
-                 filename: str = "Backtest {}".format(datetime.now().strftime("%d-%m-%Y %H%M%S"))):
+                 filename: str = "Backtest {}".format(datetime.now().strftime("%d-%m-%Y %H%M%S")),
+                 clock: ClockType = ClockType.TYPE_GRID, session: Optional[TradingSession] = None,
+                 instrument: bool = False):
 
         self.context = context
         self.account = context.account
@@ -31,6 +43,10 @@ class Backtester:
 
         self.run_from = run_from
         self.run_to = run_to
+        self.clock = ClockType(clock)
+        self.session = session
+        self.instrument = instrument
+        self.instrumentation = None
 
         if self.run_from is not None:
             assert isinstance(self.run_from, datetime)
@@ -40,13 +56,25 @@ class Backtester:
         self.times = self.make_times()
         self.data_provider = BacktestDataProvider(self.context, self.times)
 
-    def make_times(self) -> List[datetime]:
-        dt = misc.get_backtest_dt(self.time_increment)
-        num_steps = int((self.backtest_to - self.backtest_from).days / dt)
-        return [self.backtest_from + i*timedelta(days=dt) for i in range(0, num_steps)]
+    def make_times(self) -> np.ndarray:
+        """
+        Makes the time steps of the backtest from backtest_from up to, but not including, backtest_to as int64
+        nanoseconds from epoch. Grid steps are an exact integer grid, so there is no floating point drift
+        """
+        time_from = misc.datetime_to_ns(self.backtest_from)
+        time_to = misc.datetime_to_ns(self.backtest_to)
+        if self.clock == ClockType.TYPE_DATA:
+            times = clock.data_times(self.context, time_from, time_to)
+        else:
+            times = clock.grid_times(time_from, time_to, misc.get_backtest_step_ns(self.time_increment))
+
+        if self.session is not None:
+            times = times[self.session.mask(times)]
+        return times
 
     def copy(self):
-        return Backtester(self.context.copy(), self.time_increment, self.run_from, self.run_to)
+        return Backtester(self.context.copy(), self.time_increment, self.run_from, self.run_to, clock=self.clock,
+                          session=self.session, instrument=self.instrument)
 
     @property
     def backtest_from(self):
@@ -70,13 +98,25 @@ class Backtester:
             'strategies': [s.report() for s in self.context.strategies.values()],
             'backtest_from': self.backtest_from.strftime(self.datetime_format),
             'backtest_to': self.backtest_to.strftime(self.datetime_format),
+            'clock': self.clock.value,
             'account': self.account.report(),
-            'times': [t.strftime(self.datetime_format) for t in self.context.times],
-            'events': self.event_handler.event_stack.report()
+            'times': misc.ns_to_strings(self.context.times_ns, self.datetime_format),
+            'events': self.event_handler.event_stack.report(),
+            'instrumentation': self.instrumentation.report() if self.instrumentation is not None else None
         }
         return data
 
     def run(self):
         self.context.progress_bar = ProgressBar(len(self.times))
-        self.event_handler = EventHandler(self.context, data_provider=self.data_provider)
+        if self.instrument:
+            self.instrumentation = Instrumentation()
+            run = self.instrumentation.wrap('subsystems', 'event loop', EventHandler)
+        else:
+            run = EventHandler
+        try:
+            self.event_handler = run(self.context, data_provider=self.data_provider,
+                                     instrumentation=self.instrumentation)
+        finally:
+            # Stops the prefetching of the time series streams also if the backtest is stopped by an exception
+            self.data_provider.close()
         self.reporter.aggregate_report(self.report())
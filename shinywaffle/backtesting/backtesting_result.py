@@ -1,7 +1,18 @@
 import json
+import numpy as np
 from datetime import datetime
 from collections import defaultdict
-from shinywaffle.backtesting import DATETIME_FORMAT
+from typing import List
+
+
+def parse_time(string: str) -> datetime:
+    """ Parses a time written in a report, either as a date or as a date and time, to a datetime object """
+    return np.datetime64(string, 'us').item()
+
+
+def parse_times(strings: list) -> List[datetime]:
+    """ Parses all the times of a list written in a report in one vectorized call to a list of datetime objects """
+    return np.array(strings, dtype='datetime64[us]').astype(object).tolist()
 
 
 def parse_positions(data: dict) -> dict:
@@ -19,15 +30,15 @@ class ResultTransaction:
         self.price = data['price']
         self.size = data['size']
         self.side = data['side']
-        self.time = datetime.strptime(data['time'], DATETIME_FORMAT)
+        self.time = parse_time(data['time'])
 
 
 class ResultPosition:
     def __init__(self, data: dict):
         self.id = data['id']
-        self.opened_time = datetime.strptime(data['opened_time'], DATETIME_FORMAT)
+        self.opened_time = parse_time(data['opened_time'])
         try:
-            self.closed_time = datetime.strptime(data['closed_time'], DATETIME_FORMAT)
+            self.closed_time = parse_time(data['closed_time'])
         except TypeError:
             self.closed_time = None
 
@@ -43,12 +54,12 @@ class ResultPosition:
         self.days_in_trade = data['days_in_trade']
         self.hours_in_trade = data['hours_in_trade']
         self.minutes_in_trade = data['minutes_in_trade']
-        self.times = [datetime.strptime(t, DATETIME_FORMAT) for t in data['times']]
+        self.times = parse_times(data['times'])
         self.volumes = data['volumes']
         self.transactions = [ResultTransaction(data=d) for d in data['transactions']]
         self.num_transactions = data['num_transactions']
         try:
-            self.closed = datetime.strptime(data['closed'], DATETIME_FORMAT)
+            self.closed = parse_time(data['closed'])
         except ValueError:
             self.closed = None
 
@@ -89,9 +100,9 @@ class BacktestResult:
         self.broker = DictResultHolder(data=data['broker'])
         self.assets = data['assets']
         self.strategies = data['strategies']
-        self.backtest_from = datetime.strptime(data['backtest_from'], DATETIME_FORMAT)
-        self.backtest_to = datetime.strptime(data['backtest_to'], DATETIME_FORMAT)
-        self.times = [datetime.strptime(dt, DATETIME_FORMAT) for dt in data['times']]
+        self.backtest_from = parse_time(data['backtest_from'])
+        self.backtest_to = parse_time(data['backtest_to'])
+        self.times = parse_times(data['times'])
         self.events = DictResultHolder(data=data['events'])
         self.account = ResultAccount(data=data['account'])
 
@@ -0,0 +1,87 @@
+"""
+The time steps a backtest is run through.
+
+A grid clock steps through every time increment between the start and the end of the backtest. A data clock steps
+only through the times that at least one of the time series saved in the context has a data point at, so weekends,
+holidays and gaps in the data are skipped instead of being visited as empty steps. Either clock can be filtered by a
+TradingSession.
+"""
+from __future__ import annotations
+import numpy as np
+from datetime import date, time
+from enum import Enum
+from typing import Iterable, Optional, TYPE_CHECKING
+from shinywaffle.utils.misc import datetime_to_ns, EPOCH, NS_PER_DAY
+
+if TYPE_CHECKING:
+    from shinywaffle.common.context import Context
+
+
+class ClockType(Enum):
+    """
+    Type of clock used by the backtester
+
+        - Grid steps through every time increment between the start and the end of the backtest
+        - Data steps through the union of the times of the data points of all the time series in the context
+    """
+    TYPE_GRID = 'grid'
+    TYPE_DATA = 'data'
+
+
+def _time_of_day_ns(t: time) -> int:
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 10 ** 9 + t.microsecond * 1000
+
+
+class TradingSession:
+
+    """
+    Exchange session calendar used to filter the times of a clock. A time is in the session if it is on one of the
+    weekdays (Monday is 0), not on a holiday, and at or after open and before close. The times are compared as they
+    are, i.e. in the timezone of the data.
+    """
+
+    def __init__(self, weekdays: Iterable[int] = (0, 1, 2, 3, 4), open: Optional[time] = None,
+                 close: Optional[time] = None, holidays: Iterable[date] = ()):
+        """
+        :param weekdays: The days of the week the exchange is open
+        :param open: Opening time of the exchange. None keeps all times from the start of the day
+        :param close: Closing time of the exchange. None keeps all times to the end of the day
+        :param holidays: Dates the exchange is closed
+        """
+        self.weekdays = np.array(sorted(weekdays), dtype=np.int64)
+        self.open = open
+        self.close = close
+        self.holidays = np.array(sorted((d - EPOCH.date()).days for d in holidays), dtype=np.int64)
+
+    def mask(self, times: np.ndarray) -> np.ndarray:
+        """
+        :param times: int64 array of nanoseconds from epoch
+        :return: Boolean array that is True where the time is in the session
+        """
+        days = times // NS_PER_DAY
+        # 1 January 1970 was a Thursday
+        mask = np.isin((days + 3) % 7, self.weekdays)
+        if len(self.holidays):
+            mask &= ~np.isin(days, self.holidays)
+
+        time_of_day = times - days * NS_PER_DAY
+        if self.open is not None:
+            mask &= time_of_day >= _time_of_day_ns(self.open)
+        if self.close is not None:
+            mask &= time_of_day < _time_of_day_ns(self.close)
+        return mask
+
+
+def grid_times(time_from_ns: int, time_to_ns: int, step_ns: int) -> np.ndarray:
+    """ Every step_ns from time_from_ns up to, but not including, time_to_ns as int64 nanoseconds from epoch """
+    return np.arange(time_from_ns, time_to_ns, step_ns, dtype=np.int64)
+
+
+def data_times(context: Context, time_from_ns: int, time_to_ns: int) -> np.ndarray:
+    """
+    The sorted union of the times of the data points of all the time series saved in the context from time_from_ns
+    up to, but not including, time_to_ns. Time series streams are not read ahead, so their times are not included
+    """
+    times = [series.time_index() for container in list(context.time_series.values()) for series in container]
+    times = np.unique(np.concatenate(times + [np.empty(0, dtype=np.int64)]))
+    return times[np.searchsorted(times, time_from_ns, side='left'):np.searchsorted(times, time_to_ns, side='left')]
@@ -3,7 +3,12 @@ from datetime import datetime
 from shinywaffle.common.event import events
 from shinywaffle.common.event.events import PendingOrderEvent
 from shinywaffle.backtesting import OrderSide, OrderType
-from typing import Union, TYPE_CHECKING, Optional, List
+from shinywaffle.utils.misc import datetime_to_ns
+import heapq
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from typing import Dict, Union, TYPE_CHECKING, Optional, List, Tuple
 
 if TYPE_CHECKING:
     from shinywaffle.common.assets import Asset
@@ -16,7 +21,21 @@ class EmptyOrderError(Exception):
 
 
 class Order:
-    def __init__(self, asset: Asset, volume: Union[int, float], time: datetime, expires_at: datetime):
+
+    """
+    Base class for orders. The orders use __slots__, and the side and type are class attributes of the BuyOrder,
+    SellOrder, MarketOrder and LimitOrder mixins
+    """
+
+    __slots__ = ('id', 'asset', 'volume', 'time', 'order_price', 'filled_price', 'size', 'commission', 'expires_at',
+                 'pending_event')
+
+    def __init__(self, asset: Asset, volume: Union[int, float], time: int, expires_at: Optional[datetime]):
+        """
+        :param time: Time the order is placed as integer nanoseconds from epoch
+        :param expires_at: Time the order expires as a datetime object or integer nanoseconds from epoch. It is
+        saved as nanoseconds from epoch
+        """
         self.id = None
         self.asset = asset
         self.volume = volume
@@ -25,7 +44,10 @@ class Order:
         self.filled_price = None
         self.size = None
         self.commission = None
-        self.expires_at = expires_at
+        self.expires_at = datetime_to_ns(expires_at) if expires_at is not None else None
+
+        # The PendingOrderEvent of the order, created when the order is placed in the OrderBook
+        self.pending_event = None
 
         if self.volume == 0:
             raise EmptyOrderError
@@ -36,54 +58,49 @@ class Order:
 
 
 class MarketOrder:
-    def __init__(self):
-        self.type = OrderType.MARKET
+    __slots__ = ()
+    type = OrderType.MARKET
 
 
 class LimitOrder:
-    def __init__(self, limit_price):
-        self.type = OrderType.LIMIT
-        self.order_limit_price = limit_price
+    __slots__ = ()
+    type = OrderType.LIMIT
 
 
 class BuyOrder:
-    def __init__(self):
-        self.side = OrderSide.BUY
+    __slots__ = ()
+    side = OrderSide.BUY
 
 
 class SellOrder:
-    def __init__(self):
-        self.side = OrderSide.SELL
+    __slots__ = ()
+    side = OrderSide.SELL
 
 
 class MarketBuyOrder(Order, MarketOrder, BuyOrder):
-    def __init__(self, asset: Asset, volume: Union[int, float], time: datetime, expires_at: Optional[datetime] = None):
-        Order.__init__(self, asset, volume, time, expires_at=expires_at)
-        MarketOrder.__init__(self)
-        BuyOrder.__init__(self)
+    __slots__ = ()
 
 
 class MarketSellOrder(Order, MarketOrder, SellOrder):
-    def __init__(self, asset: Asset, volume: Union[int, float], time: datetime, expires_at: Optional[datetime] = None):
-        Order.__init__(self, asset, volume, time, expires_at=expires_at)
-        MarketOrder.__init__(self)
-        SellOrder.__init__(self)
+    __slots__ = ()
 
 
 class LimitBuyOrder(Order, LimitOrder, BuyOrder):
-    def __init__(self, asset: Asset, volume: Union[int, float], limit_price: float, time: datetime,
+    __slots__ = ('order_limit_price',)
+
+    def __init__(self, asset: Asset, volume: Union[int, float], limit_price: float, time: int,
                  expires_at: Optional[datetime] = None):
         Order.__init__(self, asset, volume, time, expires_at=expires_at)
-        LimitOrder.__init__(self, limit_price)
-        BuyOrder.__init__(self)
+        self.order_limit_price = limit_price
 
 
 class LimitSellOrder(Order, LimitOrder, SellOrder):
-    def __init__(self, asset: Asset, volume: Union[int, float], limit_price: float, time: datetime,
+    __slots__ = ('order_limit_price',)
+
+    def __init__(self, asset: Asset, volume: Union[int, float], limit_price: float, time: int,
                  expires_at: Optional[datetime] = None):
         Order.__init__(self, asset, volume, time, expires_at=expires_at)
-        LimitOrder.__init__(self, limit_price)
-        SellOrder.__init__(self)
+        self.order_limit_price = limit_price
 
 
 ANY_ORDER_TYPE = Union[MarketBuyOrder, MarketSellOrder, LimitBuyOrder, LimitSellOrder]
@@ -91,14 +108,31 @@ ANY_ORDER_TYPE = Union[MarketBuyOrder, MarketSellOrder, LimitBuyOrder, LimitSell
 
 class OrderBook:
 
+    """
+    Book of the orders placed with the broker.
+
+    The pending, filled and cancelled orders are kept per order type. The pending orders of a type are a dict of
+    order id to order, which keeps the orders in the order they were placed and lets an order be removed in O(1).
+    The pending orders are also indexed by id in pending_by_id, by asset ticker in pending_by_asset and by side in
+    pending_by_side, so placing, looking up, filling and cancelling an order are all constant time.
+
+    Orders with an expiry time are scheduled in a min-heap on expires_at, and the limit orders of each asset are
+    kept in sorted buy and sell ladders of (limit price, id). Each time step update_post_event_stack pops the
+    expired orders off the heap and, for the assets with a new bar, wakes only the limit orders with a limit price
+    within the low and high of the bar. Limit orders outside the range of the bar cost nothing per step
+    """
+
+    # Position of each order type in the order the PendingOrderEvents are returned
+    order_types = {MarketBuyOrder: 0, LimitBuyOrder: 1, MarketSellOrder: 2, LimitSellOrder: 3}
+
     def __init__(self, context):
         self.context = context
         self.latest_id = 0
-        self.pending_orders = {
-            MarketBuyOrder: [],
-            LimitBuyOrder: [],
-            MarketSellOrder: [],
-            LimitSellOrder: []
+        self.pending_orders: Dict[type, Dict[int, ANY_ORDER_TYPE]] = {
+            MarketBuyOrder: dict(),
+            LimitBuyOrder: dict(),
+            MarketSellOrder: dict(),
+            LimitSellOrder: dict()
         }
 
         self.filled_orders = {
@@ -115,43 +149,72 @@ class OrderBook:
             LimitSellOrder: []
         }
 
-    def update_post_event_stack(self) -> List[PendingOrderEvent]:
+        self.pending_by_id: Dict[int, ANY_ORDER_TYPE] = dict()
+        self.pending_by_asset: Dict[str, Dict[int, ANY_ORDER_TYPE]] = defaultdict(dict)
+        self.pending_by_side: Dict[OrderSide, Dict[int, ANY_ORDER_TYPE]] = {
+            OrderSide.BUY: dict(),
+            OrderSide.SELL: dict()
+        }
+
+        # Min-heap of (expires_at, id) and the limit price ladders of each asset ticker, sorted lists of (price, id)
+        self.expiries: List[Tuple[int, int]] = list()
+        self.limit_ladders: Dict[str, Dict[OrderSide, List[Tuple[float, int]]]] = defaultdict(
+            lambda: {OrderSide.BUY: [], OrderSide.SELL: []})
+
+        # Orders placed since the last update. Their PendingOrderEvents are already on the event stack
+        self.new_order_ids: Dict[int, None] = dict()
+
+    def update_post_event_stack(self, assets: Optional[List[Asset]] = None) -> List[PendingOrderEvent]:
         """
-        Updates the post event stack in the event handler with a list of pending events.
+        Returns the PendingOrderEvents of the pending orders that can be filled in the current time step.
+
+        First, the orders that have expired, i.e. with expires_at before the current time, are cancelled. An order
+        can still be filled in the bar at its expiry time.
+        Then the events of the pending market orders are returned, together with the events of the limit orders of
+        the assets with a new bar whose limit price is within the low and high of the bar. If assets is None, the
+        events of all the pending orders are returned.
 
-        If the PendingOrderEvent does not have an expire date, then add it to the list of pending events
-        If the PendingOrderEvent has an expire date, but it's not been reached yet then also add it to the list of
-        pending events
-        However, it the PendingOrderEvent has expired, then do not add it to the list of pending events, but rather
-        to the list of cancelled even
+        Orders placed since the previous update are left out, as their PendingOrderEvents were returned by new_order
+        and are already on the event stack. The limit orders that are returned are evaluated by the limit fill model of
+        the broker in one call, see BacktestBroker.evaluate_limit_orders.
 
+        :param assets: The assets with a new bar in the current time step
         """
-        pending_order_events = list()
-        order_ids_to_cancel = list()
-        for order_list in self.pending_orders.values():
-            for order in order_list:
-                if order.expires_at is None:
-                    # Order is still active
-                    pending_order_events.append(events.PendingOrderEvent(order.id, expires_at=order.expires_at))
-                else:
-                    if order.expires_at <= self.context.time:
-                        # Order is still active
-                        pending_order_events.append(events.PendingOrderEvent(order.id, expires_at=order.expires_at))
-                    else:
-                        # Order has expired
-                        order_ids_to_cancel.append(order.id)
-
-        # For all ids in the list of cancelled order ids
-        # Get the order object and find the index of the order object in the pending orders list
-        # Then pop that order and put it in the cancelled orders
-        for order_id in order_ids_to_cancel:
-            order = self.get_by_id(order_id=order_id)
-            for ind, pending_order in enumerate(self.pending_orders[type(order)]):
-                if pending_order.id == order_id:
-                    cancelled_order = self.pending_orders[type(order)].pop(ind)
-                    self.cancelled_orders[type(order)].append(cancelled_order)
-
-        return pending_order_events
+        self.cancel_expired_orders()
+
+        if assets is None:
+            woken = [order for order in self.pending_by_id.values() if order.id not in self.new_order_ids]
+        else:
+            woken = [order for pending in (self.pending_orders[MarketBuyOrder], self.pending_orders[MarketSellOrder])
+                     for order in pending.values() if order.id not in self.new_order_ids]
+            for asset in assets:
+                ladders = self.limit_ladders.get(asset.ticker)
+                if ladders is None:
+                    continue
+
+                low = self.context.broker.latest_bar_value(asset=asset, field='low')
+                high = self.context.broker.latest_bar_value(asset=asset, field='high')
+                for ladder in ladders.values():
+                    for _, order_id in ladder[bisect_left(ladder, (low,)):bisect_right(ladder, (high, math.inf))]:
+                        if order_id not in self.new_order_ids:
+                            woken.append(self.pending_by_id[order_id])
+
+            # Same order of the events as if all pending orders were checked
+            woken.sort(key=lambda o: (self.order_types[type(o)], o.id))
+
+        limit_orders = [order for order in woken if isinstance(order, LimitOrder)]
+        if limit_orders:
+            self.context.broker.evaluate_limit_orders(limit_orders=limit_orders)
+
+        self.new_order_ids.clear()
+        return [order.pending_event for order in woken]
+
+    def cancel_expired_orders(self) -> None:
+        """ Cancels the pending orders that expired before the current time """
+        while self.expiries and self.expiries[0][0] < self.context.time_ns:
+            _, order_id = heapq.heappop(self.expiries)
+            if order_id in self.pending_by_id:
+                self.cancel_order(order_id)
 
     def new_order(self, order: Union[MarketBuyOrder, MarketSellOrder, LimitBuyOrder, LimitSellOrder]) -> PendingOrderEvent:
         """ Places a new order. Assigns the order id to the latest Id +1. Saves the order in the pending events
@@ -160,46 +223,88 @@ class OrderBook:
         """
         order.id = self.latest_id + 1
         self.latest_id = order.id
-        self.pending_orders[type(order)].append(order)
-        return events.PendingOrderEvent(order_id=order.id, expires_at=order.expires_at)
-
-    def get_by_id(self, order_id: int) -> Union[MarketBuyOrder, MarketSellOrder, LimitBuyOrder, LimitSellOrder]:
-        """ Gets an order by the ID"""
-        for order_list in self.pending_orders.values():
-            order = [o for o in order_list if o.id == order_id]
-            try:
-                return order[0]
-            except IndexError:
-                continue
+        self.pending_orders[type(order)][order.id] = order
+        self.pending_by_id[order.id] = order
+        self.pending_by_asset[order.asset.ticker][order.id] = order
+        self.pending_by_side[order.side][order.id] = order
+        self.new_order_ids[order.id] = None
+        if order.expires_at is not None:
+            heapq.heappush(self.expiries, (order.expires_at, order.id))
+        if isinstance(order, LimitOrder):
+            insort(self.limit_ladders[order.asset.ticker][order.side], (order.order_limit_price, order.id))
+        order.pending_event = events.PendingOrderEvent(order_id=order.id, expires_at=order.expires_at)
+        return order.pending_event
+
+    def get_by_id(self, order_id: int) -> Union[MarketBuyOrder, MarketSellOrder, LimitBuyOrder, LimitSellOrder, None]:
+        """ Gets a pending order by the ID. Returns None if there is no pending order with the ID"""
+        return self.pending_by_id.get(order_id)
+
+    def get_pending(self, asset: Optional[Asset] = None, side: Optional[OrderSide] = None) -> List[ANY_ORDER_TYPE]:
+        """ The pending orders, optionally only the ones of an asset and/or a side, in the order they were placed """
+        if asset is None and side is None:
+            return list(self.pending_by_id.values())
+        if asset is None:
+            return list(self.pending_by_side[side].values())
+
+        pending = self.pending_by_asset.get(asset.ticker, {}).values()
+        if side is None:
+            return list(pending)
+        return [order for order in pending if order.side == side]
+
+    def has_pending(self, asset: Asset) -> bool:
+        """ True if the asset has any pending orders """
+        return bool(self.pending_by_asset.get(asset.ticker))
+
+    def _remove_pending(self, order: ANY_ORDER_TYPE) -> None:
+        """ Removes an order from the pending orders and all the indexes of the pending orders """
+        del self.pending_orders[type(order)][order.id]
+        del self.pending_by_id[order.id]
+        del self.pending_by_side[order.side][order.id]
+        asset_orders = self.pending_by_asset[order.asset.ticker]
+        del asset_orders[order.id]
+        if not asset_orders:
+            del self.pending_by_asset[order.asset.ticker]
+        if isinstance(order, LimitOrder):
+            ladder = self.limit_ladders[order.asset.ticker][order.side]
+            del ladder[bisect_left(ladder, (order.order_limit_price, order.id))]
+        # Expired entries of the order in self.expiries are skipped when they are popped
+
+    def cancel_order(self, order_id: int) -> None:
+        """ Moves a pending order to the cancelled orders """
+        order = self.pending_by_id[order_id]
+        self._remove_pending(order)
+        self.cancelled_orders[type(order)].append(order)
 
     def fill_order(self, pending_order_id: int, filled_price: float, order_price: float, size: Union[int, float],
-                   commission: float) -> events.OrderFilledEvent:
+                   commission: float, volume: Optional[Union[int, float]] = None) -> events.OrderFilledEvent:
         """
-        Fills a pending order
+        Fills a pending order. If volume is less than the volume of the order, the order is partially filled: the
+        order volume is reduced by the filled volume and the order stays pending
 
-        Returns a OrderFilledEvent
+        Returns a OrderFilledEvent with the filled volume
         """
-        order = self.get_by_id(pending_order_id)
+        order = self.pending_by_id[pending_order_id]
         order.filled_price = filled_price
         order.order_price = order_price
         order.size = size
         order.commission = commission
 
-        for idx, o in enumerate(self.pending_orders[type(order)]):
-            if o.id == pending_order_id:
-                filled_order = self.pending_orders[type(order)].pop(idx)
-                self.filled_orders[type(order)].append(filled_order)
-                break
+        if volume is None or volume >= order.volume:
+            volume = order.volume
+            self._remove_pending(order)
+            self.filled_orders[type(order)].append(order)
+        else:
+            order.volume -= volume
 
         return events.OrderFilledEvent(asset=order.asset,
                                        filled_price=order.filled_price,
                                        order_price=order.order_price,
                                        size=order.size,
-                                       volume=order.volume,
+                                       volume=volume,
                                        order_type=order.type,
                                        side=order.side,
                                        commission=order.commission,
-                                       time=self.context.time)
+                                       time=self.context.time_ns)
 
     def report(self) -> dict:
         return {
@@ -1,10 +1,11 @@
 from shinywaffle.backtesting.backtest import Backtester
 from shinywaffle.backtesting.study.test_train_split import TestTrainSplit
 from shinywaffle.backtesting.study.uncertainy import UncertaintyVariableManifest
-import numpy as np
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
+from shinywaffle.utils.misc import ns_to_datetime
 import json
 from enum import Enum
 from shinywaffle.common.context import Context
@@ -63,8 +64,8 @@ class BacktestStudy:
 
         # Making tuples with optimisation splits and out of sample splits
         # Tuples consist of from an to splits in terms of percentage of the total data set
-        datetime_from = self._backtest_template.times[0]
-        datetime_to = self._backtest_template.times[-1]
+        datetime_from = ns_to_datetime(self._backtest_template.times[0])
+        datetime_to = ns_to_datetime(self._backtest_template.times[-1])
 
         test_train_split = TestTrainSplit(self.wfa, self.out_of_sample_size, self.no_sub_runs)
         self._optimisation_datetimes = test_train_split.calc_optimisation_datetimes(datetime_from, datetime_to)
@@ -136,16 +137,20 @@ class BacktestStudy:
         For each run_no, sub_run_no and stochastic_run_no, a results folder is first generated (if it is not already
         in place). Then parameters are drawn from the self.parameters dictionary corresponding to the run_no.
 
-        The context object is copied using deep copy to break all pointers and then the substitute_uncertainty_variable
-        method is called on new_context.strategies, new_context.risk_manager and new_context.account to substitute all
-        UncertaintyVariable objects with the appropriate variable value collected from the self.parameters dictionary.
+        The context object is copied with Context.copy, which deep copies everything but the market data, and then
+        the substitute_uncertainty_variable method is called on new_context.strategies, new_context.risk_manager and
+        new_context.account to substitute all UncertaintyVariable objects with the appropriate variable value collected
+        from the self.parameters dictionary.
 
         A new Backtester object is then created with the new_context object and the new backtest_from and backtest_to
-        times calculated from the test_train_split method. The slippages in the broker object have to be drawn from the
-        normal distribution again and injected into the new_context.broker object. A BacktesterContainer object
-        is created with the new Backtester object and is appended to the list of backtests.
+        times calculated from the test_train_split method. The broker of the new_context object is reseeded with a
+        seed spawned from the seed of the broker of the study context, so that every run draws its own slippages and
+        intrabar prices and the whole study is reproducible from that one seed. A BacktesterContainer object is created
+        with the new Backtester objects and their seeds and is appended to the list of backtests.
         """
 
+        run_seeds = iter(np.random.SeedSequence(self.context.broker.seed).spawn(self.total_number_of_runs))
+
         for run_no in range(self.no_runs):
             params = self.parameters[run_no]
             self.variable_swap_manifest.perform_swaps(realization=params)
@@ -163,21 +168,25 @@ class BacktestStudy:
                     if self.enable_stochastic:
                         name = f"run_{run_no} sub_run_{sub_run_no} stochastic_{stochastic_run_no}"
 
-                    # Deep copy
+                    # Deep copy of everything but the market data, which is shared between the contexts
                     new_context = self.context.copy()
 
-                    # The slippages have to be re-drawn to avoid using the same slippage values in every run
-                    new_context.broker.slippages = abs(np.random.normal(new_context.broker._slippage_mean,
-                                                                        new_context.broker._slippage_stdev,
-                                                                        100000)).tolist()
+                    # The broker is reseeded to avoid using the same slippage values and intrabar prices in
+                    # every run
+                    seed = int(next(run_seeds).generate_state(1, np.uint64)[0])
+                    new_context.broker.reseed(seed)
 
                     new_backtester = Backtester(context=new_context,
                                                 time_increment=self._backtest_template.time_increment,
-                                                run_from=run_from, run_to=run_to, path=path, filename=name)
+                                                run_from=run_from, run_to=run_to, path=path, filename=name,
+                                                clock=self._backtest_template.clock,
+                                                session=self._backtest_template.session,
+                                                instrument=self._backtest_template.instrument)
 
                     result_path = f'{new_backtester.reporter.path}/{name}.json'
                     backtest_container.add_backtest(backtest=new_backtester,
-                                                    result_path=result_path)
+                                                    result_path=result_path,
+                                                    seed=seed)
                 self.backtests.append(backtest_container)
 
     def report(self):
@@ -211,10 +220,11 @@ class BacktestContainer:
         self.sub_run_no = sub_run_no
         self.backtests = list()
 
-    def add_backtest(self, backtest: Backtester, result_path: str) -> None:
+    def add_backtest(self, backtest: Backtester, result_path: str, seed: int) -> None:
         self.backtests.append({
             'backtest': backtest,
-            'result_path': result_path
+            'result_path': result_path,
+            'seed': seed
         })
 
     def stochastic_result_path(self, backtest: Backtester):
@@ -226,5 +236,6 @@ class BacktestContainer:
             'parameters': self.parameters,
             'run number': self.run_no,
             'sub run number': self.sub_run_no,
-            'runs': [s['result_path'] for s in self.backtests]
+            'runs': [s['result_path'] for s in self.backtests],
+            'seeds': [s['seed'] for s in self.backtests]
         }
@@ -1,5 +1,4 @@
 from __future__ import annotations
-from datetime import datetime
 from typing import TYPE_CHECKING, Union
 
 if TYPE_CHECKING:
@@ -8,7 +7,7 @@ if TYPE_CHECKING:
 
 
 class Trade:
-    def __init__(self, asset: Asset, size: float, fill_price: float, order_price: float, volume: Union[int, float], time: datetime,
+    def __init__(self, asset: Asset, size: float, fill_price: float, order_price: float, volume: Union[int, float], time: int,
                  commission: float, trade_side: OrderSide, trade_type: OrderType):
         self.asset = asset
         self.size = size
@@ -31,7 +30,7 @@ class TradeLog:
         self.all_trades = []
 
     def new_trade(self, asset: Asset, trade_size: float, fill_price: float, order_price: float,
-                  trade_volume: Union[int, float], trade_type: OrderType, trade_side: OrderSide, timestamp: datetime,
+                  trade_volume: Union[int, float], trade_type: OrderType, trade_side: OrderSide, timestamp: int,
                   commission: float):
 
         t = Trade(asset=asset, size=trade_size, fill_price=fill_price, order_price=order_price,
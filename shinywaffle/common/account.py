@@ -7,6 +7,7 @@ from shinywaffle.backtesting import orders
 from shinywaffle.backtesting.orders import OrderSide, PendingOrderEvent
 from shinywaffle.common.assets import Asset, BaseAsset
 from shinywaffle.common.metrics import drawdown
+import numpy as np
 from typing import Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -29,12 +30,27 @@ class BaseAssetBalance:
 
 
 class AssetBalance:
-    def __init__(self, asset: Asset, context: Context, initial_balance: float = 0):
-        """ Balance entry of an asset in the account. Holds the information of the balance and the latest value"""
+    def __init__(self, asset: Asset, context: Context, initial_balance: float = 0,
+                 balance_vector: np.ndarray = None, index: int = 0):
+        """
+        Balance entry of an asset in the account. Holds the information of the balance and the latest value.
+
+        The balance is stored in balance_vector[index], which lets the account value all balances as one vector
+        """
         self.asset = asset
         self.context = context
+        self._balance_vector = balance_vector if balance_vector is not None else np.zeros(1)
+        self._index = index
         self.balance = initial_balance
 
+    @property
+    def balance(self) -> float:
+        return float(self._balance_vector[self._index])
+
+    @balance.setter
+    def balance(self, value: Union[float, int]):
+        self._balance_vector[self._index] = value
+
     def add_to_balance(self, volume: Union[float, int]):
         """ Increase balance """
         self.balance += volume
@@ -46,7 +62,7 @@ class AssetBalance:
     @property
     def value(self):
         """ The value of the balance"""
-        return self.balance * self.asset.bars[0].close
+        return self.balance * self.asset.bars.close[0]
 
 
 class Account:
@@ -61,7 +77,9 @@ class Account:
         self.initial_holding = base_asset.initial_balance
         self.base_balance = BaseAssetBalance(context=context, base_asset=base_asset, initial_balance=base_asset.initial_balance)
         self.positions = {asset: PositionContainer(context=context, asset=asset) for asset in context.assets.values()}
-        self.balances = {asset: AssetBalance(asset=asset, context=context) for asset in context.assets.values()}
+        self.balance_vector = np.zeros(len(context.assets))
+        self.balances = {asset: AssetBalance(asset=asset, context=context, balance_vector=self.balance_vector, index=i)
+                         for i, asset in enumerate(context.assets.values())}
 
         self.time_series = {
             'values': [],
@@ -154,7 +172,7 @@ class Account:
 
     def handle_buy_order_event(self, event: Union[events.SignalEventLimitBuy, events.SignalEventMarketBuy]) -> Union[orders.MarketBuyOrder, orders.LimitBuyOrder]:
         """ Returns a MarketBuyOrder or LimitBuyOrder depending on the signal received"""
-        time_placed = self.context.time
+        time_placed = self.context.time_ns
         order_volume = self.risk_manager.position_size_entry(asset=event.asset)
         if isinstance(event, events.SignalEventMarketBuy):
             new_order = orders.MarketBuyOrder(asset=event.asset,
@@ -175,12 +193,16 @@ class Account:
 
     def handle_sell_order_event(self, event: Union[events.SignalEventMarketSell, events.SignalEventLimitSell]) -> Union[orders.MarketSellOrder, orders.LimitSellOrder]:
         """ Returning a MarketSellOrder or LimitSellOrder depending on the signal received"""
-        time_placed = self.context.time
+        time_placed = self.context.time_ns
         order_volume = self.risk_manager.position_size_exit(asset=event.asset)
 
-        # Cap the order volume to the asset balance
-        if order_volume > self.balances[event.asset].balance:
-            order_volume = self.balances[event.asset].balance
+        # Cap the order volume to the asset balance that is not already being sold by pending sell orders, e.g. the
+        # rest of a partially filled sell order
+        pending_volume = sum(order.volume for order in
+                             self.context.broker.order_book.get_pending(asset=event.asset, side=OrderSide.SELL))
+        available_volume = max(self.balances[event.asset].balance - pending_volume, 0)
+        if order_volume > available_volume:
+            order_volume = available_volume
 
         if isinstance(event, events.SignalEventMarketSell):
             new_order = orders.MarketSellOrder(asset=event.asset,
@@ -201,7 +223,14 @@ class Account:
 
     @property
     def value(self) -> float:
-        """ Total value of the account including all balances and the cash on hand. """
+        """
+        Total value of the account including all balances and the cash on hand. If the context has a BarPanel, the
+        balances are valued as one vector against the latest close of all assets, see Broker.latest_prices
+        """
+        if self.context.panel is not None:
+            holdings = self.balance_vector * self.context.broker.latest_prices('close')[:len(self.balance_vector)]
+            return self.base_balance.balance + float(np.sum(holdings[self.balance_vector != 0]))
+
         total_value = self.base_balance.balance
         for balance in self.balances.values():
             total_value += balance.value
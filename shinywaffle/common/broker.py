@@ -1,13 +1,71 @@
 from __future__ import annotations
 import numpy as np
 from shinywaffle.common.context import Context
+from shinywaffle.backtesting import OrderSide
 from shinywaffle.backtesting import orders as orders_module
-from shinywaffle.data.intrabar_simulation import simulate_intrabar_data
-from typing import Union, TYPE_CHECKING
+from shinywaffle.common.fill_models import LimitFillModel, SimulatedLimitFillModel, MarketFillModel, MarketFills, \
+    SlippageMarketFillModel
+from typing import Dict, List, Optional, Tuple, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from shinywaffle.common.event.events import OrderFilledEvent
     from shinywaffle.backtesting.orders import ANY_ORDER_TYPE
+    from shinywaffle.common.assets import Asset
+
+
+class SlippageGenerator:
+
+    """
+    Draws the market order slippage factors, the absolute values of normally distributed numbers, from a numpy
+    Generator. The factors are drawn in blocks of block_size, which are refilled when the cursor reaches the end of
+    the block, so there is no limit on the number of factors and no factors are drawn that are not used
+    """
+
+    def __init__(self, mean: float, stdev: float, rng: np.random.Generator, block_size: int = 4096,
+                 enabled: bool = True):
+        self.mean = mean
+        self.stdev = stdev
+        self.rng = rng
+        self.block_size = block_size
+        self.enabled = enabled
+        self.block = np.empty(0)
+        self.cursor = 0
+        self.drawn = 0
+
+    def refill(self) -> None:
+        """ Draws a new block of slippage factors and moves the cursor to its start """
+        self.block = np.abs(self.rng.normal(loc=self.mean, scale=self.stdev, size=self.block_size))
+        self.cursor = 0
+
+    def next(self) -> float:
+        """ The next slippage factor, 0 if slippage is not enabled """
+        if not self.enabled:
+            return 0.
+        if self.cursor == len(self.block):
+            self.refill()
+
+        value = self.block[self.cursor]
+        self.cursor += 1
+        self.drawn += 1
+        return float(value)
+
+    def take(self, n: int) -> np.ndarray:
+        """ The next n slippage factors as an array, the same factors as n calls to next() """
+        if not self.enabled:
+            return np.zeros(n)
+
+        values = np.empty(n)
+        taken = 0
+        while taken < n:
+            if self.cursor == len(self.block):
+                self.refill()
+            k = min(n - taken, len(self.block) - self.cursor)
+            values[taken:taken + k] = self.block[self.cursor:self.cursor + k]
+            self.cursor += k
+            taken += k
+
+        self.drawn += n
+        return values
 
 
 class BacktestBroker:
@@ -18,29 +76,53 @@ class BacktestBroker:
 
     """
 
-    def __init__(self, context: Context, fee: float, slippage=True, slippage_mean=0.01, slippage_stdev=0.02):
+    def __init__(self, context: Context, fee: float, slippage=True, slippage_mean=0.01, slippage_stdev=0.02,
+                 seed: Optional[int] = None, limit_fill_model: Optional[LimitFillModel] = None,
+                 market_fill_models: Optional[List[MarketFillModel]] = None):
         """
-        Modelling slippage as a normal distribution with mean 0 and standard deviation of 0.05. Generating 100000
-        values.
+        Modelling slippage as the absolute value of a normal distribution with mean slippage_mean and standard
+        deviation slippage_stdev. The values are drawn as they are needed by a SlippageGenerator.
 
         :param context: Context object containing all the cogs
         :param fee: Fee percentage
+        :param seed: Seed of the random generators used for the slippage and to simulate the intrabar prices. A
+        random seed is drawn if None. The seed is saved in the report so a backtest can be reproduced
+        :param limit_fill_model: Model deciding if and at what price limit orders within a bar are filled. Defaults
+        to simulating the intrabar prices, see shinywaffle.common.fill_models
+        :param market_fill_models: Models applied in order to the market orders of an asset to get their fill prices
+        and volumes, e.g. volume participation, spread and market impact. Defaults to the random slippage only
         """
-        n = 100000
         self.context = context
         self.name = 'Backtest broker'
         self.fee = fee
         self.total_commission = 0
         self.total_slippage = 0
         self.order_book = orders_module.OrderBook(context=context)
-        if slippage is not True:
-            self.slippages = [0] * n
-        else:
-            self.slippages = abs(np.random.normal(loc=slippage_mean,
-                                                  scale=slippage_stdev,
-                                                  size=n)).tolist()
+        self.slippage = slippage is True
         self._slippage_mean = slippage_mean
         self._slippage_stdev = slippage_stdev
+        self.limit_fill_model = limit_fill_model if limit_fill_model is not None else SimulatedLimitFillModel()
+        self.market_fill_models = market_fill_models if market_fill_models is not None else [SlippageMarketFillModel()]
+
+        # Fill price, order price and fill volume of the market orders evaluated at market_fills_time
+        self.market_fills: Dict[int, Tuple[float, float, float]] = dict()
+        self.market_fills_time = None
+
+        # Fill price of the limit orders evaluated at limit_fills_time, NaN for the orders that are not filled
+        self.limit_fills: Dict[int, float] = dict()
+        self.limit_fills_time = None
+        self.reseed(seed)
+
+    def reseed(self, seed: Optional[int] = None) -> None:
+        """
+        Seeds the random generators of the broker, one for the intrabar prices and one for the slippages, which are
+        spawned from the seed. A random seed is drawn if seed is None
+        """
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy)
+        intrabar_seed, slippage_seed = np.random.SeedSequence(self.seed).spawn(2)
+        self.rng = np.random.default_rng(intrabar_seed)
+        self.slippages = SlippageGenerator(mean=self._slippage_mean, stdev=self._slippage_stdev,
+                                           rng=np.random.default_rng(slippage_seed), enabled=self.slippage)
 
     def place_order(self, new_order: ANY_ORDER_TYPE):
 
@@ -62,9 +144,13 @@ class BacktestBroker:
         filled and the price is calculated from the self.get_market_order_price method. If the order is a limit order,
         then the order limit price is checked against the prices in the current bar to see if the limit price is reached within the bar.
 
-        If so, then the intrabar prices are simulated using the simulate_intrabar_data method. 
+        If so, then the limit fill model of the broker decides if and at what price the order is filled. The default
+        model simulates the intrabar prices:
             If the order is a buy order, the order will be filled at the price that is first equal to or below the order limit price. 
             If it is a sell order, then it will be filled at the price that is first equal to or above the order limit price.
+        The limit orders woken by the order book in a time step are evaluated together by evaluate_limit_orders, and
+        the fill prices are kept in self.limit_fills. Other limit orders, e.g. orders placed in the current time step,
+        are evaluated alone.
 
         :param order_id: ID of the order to check
         :return: OrderFilledEvent
@@ -73,50 +159,97 @@ class BacktestBroker:
         order = self.order_book.get_by_id(order_id)
         event = None
 
-        # If MarketOrder then fill immediately with the price from the get_market_order_price
+        # If MarketOrder then fill with the price and volume from the market fill models
         if isinstance(order, orders_module.MarketBuyOrder) or isinstance(order, orders_module.MarketSellOrder):
-            price = self.get_market_order_price(order=order)
-            slippage = self.get_market_order_slippage(order=order)
-
-            # The final order price is the open price of the bar + the slippage in %
-            # For buy order, slippage is positive
-            # For sell order, slippage is negative
-            slipped_price = price * slippage
-            new_price = price + slipped_price
-            self.total_slippage += abs(slipped_price * order.volume)
-            event = self.fill_order(order=order, fill_price=new_price, order_price=price)
-
-        # If LimitOrder, then check whether or not the limit is reached, and if so simulate the price action.
+            event = self.fill_market_order(order=order)
+
+        # If LimitOrder, then fill at the price from the limit fill model if the limit is reached within the bar
         elif isinstance(order, orders_module.LimitBuyOrder) or isinstance(order, orders_module.LimitSellOrder):
-            if self.is_order_within_bar(order):
-                bars = order.asset.bars
-                bar = bars[0]
-
-                # total_t = (bar.time - previous_bar.time).days
-                # Total_t = 1 means that bar duration is normalized
-                # and the price simulation will then generate 1 / dt price points per bar.
-
-                total_t = 1.
-                intra_bar_prices = simulate_intrabar_data(bar, total_t, 0.01)
-
-                # Finding fill price for BuyOrder
-                if isinstance(order, orders_module.LimitBuyOrder):
-                    for price in intra_bar_prices:
-                        if price <= order.order_limit_price:
-                            event = self.fill_order(order=order, fill_price=price, order_price=price)
-                            break
-
-                # Finding fill price for SellOrder
-                elif isinstance(order, orders_module.LimitSellOrder):
-                    for price in intra_bar_prices:
-                        if price >= order.order_limit_price:
-                            event = self.fill_order(order=order, fill_price=price, order_price=price)
-                            break
+            if self.limit_fills_time != self.context.time_ns or order.id not in self.limit_fills:
+                self.evaluate_limit_orders(limit_orders=[order])
+
+            price = self.limit_fills.pop(order.id)
+            is_buy = isinstance(order, orders_module.LimitBuyOrder)
+            volume = order.volume if is_buy else min(order.volume, self.sellable_volume(order))
+            if not np.isnan(price) and volume > 0:
+                event = self.fill_order(order=order, fill_price=price, order_price=price, volume=volume)
 
         return event
 
-    @staticmethod
-    def is_order_within_bar(order: Union[orders_module.LimitBuyOrder, orders_module.LimitSellOrder]) -> bool:
+    def evaluate_limit_orders(self, limit_orders: List[Union[orders_module.LimitBuyOrder, orders_module.LimitSellOrder]]) -> None:
+        """
+        Applies the limit fill model to limit orders in one call and saves their fill prices in self.limit_fills.
+        Orders with a limit price outside the latest bar of their asset are not filled and get a NaN fill price.
+        Called by the order book with the limit orders it wakes up in a time step
+        """
+        if self.limit_fills_time != self.context.time_ns:
+            self.limit_fills.clear()
+            self.limit_fills_time = self.context.time_ns
+
+        bars = dict()
+        for order in limit_orders:
+            if order.asset not in bars:
+                bars[order.asset] = tuple(self.latest_bar_value(asset=order.asset, field=field)
+                                          for field in ('open', 'high', 'low', 'close'))
+
+        opens, highs, lows, closes = (np.array(field, dtype=float)
+                                      for field in zip(*(bars[order.asset] for order in limit_orders)))
+        limit_prices = np.array([order.order_limit_price for order in limit_orders], dtype=float)
+        is_buy = np.array([isinstance(order, orders_module.LimitBuyOrder) for order in limit_orders])
+
+        prices = np.full(len(limit_orders), np.nan)
+        within = (lows <= limit_prices) & (limit_prices <= highs)
+        if within.any():
+            prices[within] = self.limit_fill_model.fill_prices(opens[within], highs[within], lows[within],
+                                                               closes[within], limit_prices[within], is_buy[within],
+                                                               self.rng)
+
+        for order, price in zip(limit_orders, prices.tolist()):
+            self.limit_fills[order.id] = price
+
+    def sellable_volume(self, order: Union[orders_module.MarketSellOrder, orders_module.LimitSellOrder]) -> float:
+        """
+        The volume of a sell order that can be filled: the balance of the asset in the account less the volume of the
+        pending sell orders of the asset placed before the order. Sell fills are capped to it before they are booked
+        by the order book, so the orders of an asset never sell more than the account holds
+        """
+        earlier = sum(o.volume for o in self.order_book.get_pending(asset=order.asset, side=OrderSide.SELL)
+                      if o.id < order.id)
+        return max(self.context.account.balances[order.asset].balance - earlier, 0.)
+
+    def latest_bar_value(self, asset: Asset, field: str) -> float:
+        """
+        Returns a field (open, high, low, close, volume) of the latest retrieved bar of an asset. Read from the
+        context's BarPanel if there is one and it has a bar of the asset, otherwise from the asset bars
+        """
+        panel = self.context.panel
+        if panel is not None and asset.ticker in panel.columns:
+            value = panel.latest_value(ticker=asset.ticker, field=field)
+            if not np.isnan(value):
+                return value
+        return getattr(asset.bars, field)[0]
+
+    def latest_prices(self, field: str = 'close') -> np.ndarray:
+        """
+        Returns a field of the latest retrieved bar of all assets as a vector in the order of context.assets.
+        Requires a BarPanel on the context. Assets the panel has no bar of, e.g. streamed assets, are read from the
+        asset bars and are NaN only if they have no bars at all
+        """
+        if self.context.panel is None:
+            raise AttributeError('The context does not have a BarPanel')
+
+        prices = self.context.panel.latest(field)
+        assets = list(self.context.assets.values())
+        if len(prices) < len(assets):
+            prices = np.concatenate([prices, np.full(len(assets) - len(prices), np.nan)])
+
+        for j in np.flatnonzero(np.isnan(prices)):
+            bars = assets[j].bars
+            if len(bars):
+                prices[j] = getattr(bars, field)[0]
+        return prices
+
+    def is_order_within_bar(self, order: Union[orders_module.LimitBuyOrder, orders_module.LimitSellOrder]) -> bool:
 
         """
         Method that checks whether or not the limit order price is within the latest retrieved bar for a given asset.
@@ -126,40 +259,97 @@ class BacktestBroker:
         :return: True/False
         """
 
-        bar = order.asset.bars[0]
-        return bar.low <= order.order_limit_price <= bar.high
+        low = self.latest_bar_value(asset=order.asset, field='low')
+        high = self.latest_bar_value(asset=order.asset, field='high')
+        return low <= order.order_limit_price <= high
+
+    def fill_market_order(self, order: Union[orders_module.MarketBuyOrder, orders_module.MarketSellOrder]) -> Union[None, OrderFilledEvent]:
+
+        """
+        Fills a market order with the fill price and volume from the market fill models. The first market order of an
+        asset that is checked in a time step evaluates all the market orders of the asset placed before the current
+        time in one call of each model, and the results are kept in self.market_fills for the other orders.
+
+        The volume of a sell order is capped to sellable_volume before the models are applied. If less than the
+        volume of the order is filled, the order is partially filled and the rest stays pending. Returns None if no
+        volume is filled
+        """
+
+        if self.market_fills_time != self.context.time_ns:
+            self.market_fills.clear()
+            self.market_fills_time = self.context.time_ns
+        if order.id not in self.market_fills:
+            self.evaluate_market_orders(asset=order.asset, order=order)
+
+        fill_price, order_price, volume = self.market_fills.pop(order.id)
+        if volume <= 0:
+            return None
+
+        self.total_slippage += abs((fill_price - order_price) * volume)
+        return self.fill_order(order=order, fill_price=fill_price, order_price=order_price, volume=volume)
+
+    def evaluate_market_orders(self, asset: Asset, order: Union[orders_module.MarketBuyOrder, orders_module.MarketSellOrder]) -> None:
+        """
+        Applies the market fill models to the market orders of an asset that were placed before the current time, and
+        to order, and saves their fill price, order price and fill volume in self.market_fills
+        """
+        market_orders = [o for o in self.order_book.get_pending(asset=asset) if isinstance(o, orders_module.MarketOrder)
+                         and (o.time < self.context.time_ns or o is order)]
+
+        fills = MarketFills(asset=asset, bar_time=int(asset.bars.time[0]),
+                            opn=self.get_market_order_price(order=order),
+                            high=self.latest_bar_value(asset=asset, field='high'),
+                            low=self.latest_bar_value(asset=asset, field='low'),
+                            close=self.latest_bar_value(asset=asset, field='close'),
+                            volume=self.latest_bar_value(asset=asset, field='volume'),
+                            order_volumes=np.array([o.volume if isinstance(o, orders_module.BuyOrder)
+                                                    else min(o.volume, self.sellable_volume(o))
+                                                    for o in market_orders], dtype=float),
+                            is_buy=np.array([isinstance(o, orders_module.BuyOrder) for o in market_orders]))
+
+        for model in self.market_fill_models:
+            model.apply(fills, self)
+
+        for o, fill_price, volume in zip(market_orders, fills.prices.tolist(), fills.fill_volumes.tolist()):
+            self.market_fills[o.id] = (fill_price, fills.open, volume)
 
-    def fill_order(self, order: ANY_ORDER_TYPE, fill_price: float, order_price: float) -> OrderFilledEvent:
+    def fill_order(self, order: ANY_ORDER_TYPE, fill_price: float, order_price: float,
+                   volume: Optional[Union[int, float]] = None) -> OrderFilledEvent:
 
         """
         Method that fills an order at a given price.
-            The order size is calculate: order.volume * price
+            The order size is calculate: volume * price
             Commission is calculated from the calculate_commission() method from the order size
 
         The order_book.fill_order is called with the order.ID, size and commission and returns a OrderFilledEvent
         :param order: The order object that was filled
         :param fill_price: The price the order was filled at
         :param order_price: The price that the order was sent to the market at
+        :param volume: The volume filled. The order is partially filled if it is less than the order volume. Defaults
+        to the order volume
         """
 
-        order_size = order.volume * fill_price
+        if volume is None:
+            volume = order.volume
+        order_size = volume * fill_price
         commission = self.calculate_commission(order_size=order_size)
         order_filled_event = self.order_book.fill_order(pending_order_id=order.id,
                                                         filled_price=fill_price,
                                                         order_price=order_price,
                                                         size=order_size,
-                                                        commission=commission)
+                                                        commission=commission,
+                                                        volume=volume)
         return order_filled_event
 
     def get_market_order_slippage(self, order: Union[orders_module.MarketBuyOrder, orders_module.MarketSellOrder]) -> float:
         """
-        Returns a slippage factor from the slippage factors that have been saved
+        Returns the next slippage factor of the slippage generator
 
         If the order is a buy order, the slippage is positive to make the order price larger than the bar price
         If the order is a sell order, the slippage is negative to make the order price smaller than the bar price
         """
 
-        slippage = self.slippages.pop(0)
+        slippage = self.slippages.next()
         if isinstance(order, orders_module.SellOrder):
             slippage *= -1
 
@@ -174,7 +364,7 @@ class BacktestBroker:
         Returns: the market order price (float) for the order
         """
 
-        return order.asset.bars[0].open
+        return self.latest_bar_value(asset=order.asset, field='open')
 
     def calculate_commission(self, order_size: float) -> float:
         """
@@ -190,6 +380,10 @@ class BacktestBroker:
         data = {
             'name': self.name,
             'fee': self.fee,
+            'seed': self.seed,
+            'slippages_drawn': self.slippages.drawn,
+            'limit_fill_model': self.limit_fill_model.name,
+            'market_fill_models': [model.name for model in self.market_fill_models],
             'total_commission': self.total_commission,
             'total_slippage': self.total_slippage,
             'order_book': self.order_book.report()
@@ -2,19 +2,27 @@ from __future__ import annotations
 import copy
 from shinywaffle.common.assets import Asset
 from collections import defaultdict
-from typing import TYPE_CHECKING
+from shinywaffle.utils.misc import datetime_to_ns, ns_to_datetime
+from typing import List, Optional, Union, TYPE_CHECKING
 from datetime import datetime
 
 if TYPE_CHECKING:
     from shinywaffle.data.time_series_data import TimeSeries, TimeSeriesType
     from shinywaffle.common.broker import BacktestBroker
     from shinywaffle.common.account import Account
+    from shinywaffle.data.panel import BarPanel
+    from shinywaffle.data.as_of import AsOfJoin
+    from shinywaffle.data.resample import Resampler
+    from shinywaffle.data.streaming import ChunkSource
 
 
 class Context:
 
     """
     Context class representing a holder for assets, broker and account. This object will be
+
+    The clock of the context is kept as integer nanoseconds from epoch in time_ns and times_ns. time and times
+    return the same as datetime objects for strategies and other code that works with datetimes.
     """
 
     def __init__(self, start_time: datetime):
@@ -24,9 +32,14 @@ class Context:
         self.broker = None
         self.account = None
         self.risk_manager = None
+        self.panel: Optional[BarPanel] = None
+        self.as_of: Optional[AsOfJoin] = None
+        self.resamplers: List[Resampler] = list()
         self.time_series = defaultdict(lambda: TimeSeriesContainer())
-        self.time = start_time
-        self.times = list()
+        self.time_series_streams = defaultdict(list)
+        self.time_ns = datetime_to_ns(start_time)
+        self._time = start_time
+        self.times_ns: List[int] = list()
 
     def set_broker(self, broker: BacktestBroker) -> None:
         self.broker = broker
@@ -35,20 +48,59 @@ class Context:
         self.account = account
         self.risk_manager = account.risk_manager
 
-    def update_time(self, time: datetime) -> None:
-        """ Saves the current time to the list of datetimes and changes self.time to the newly provided timestamp"""
-        self.times.append(self.time)
-        self.time = time
+    @property
+    def time(self) -> datetime:
+        """ The current time as a datetime object, converted from time_ns when first read after the time changed """
+        if self._time is None:
+            self._time = ns_to_datetime(self.time_ns)
+        return self._time
+
+    @property
+    def times(self) -> List[datetime]:
+        """ The previous times as datetime objects """
+        return [ns_to_datetime(t) for t in self.times_ns]
+
+    def update_time(self, time: Union[int, datetime]) -> None:
+        """
+        Saves the current time to the list of times and changes the current time to the newly provided timestamp
+        :param time: The new time as integer nanoseconds from epoch or as a datetime object
+        """
+        self.times_ns.append(self.time_ns)
+        self.time_ns = datetime_to_ns(time)
+        self._time = None
 
     def copy(self) -> Context:
-        return copy.deepcopy(self)
+        """
+        Returns a deep copy of the context that shares the market data with this context. The time series saved with
+        save_time_series and the sources saved with save_time_series_stream are never changed by a backtest, so they
+        are put in the deepcopy memo and referenced by the copy instead of being copied. Everything else, e.g. the
+        account, broker, strategies and the asset series extended during a backtest, is copied.
+        """
+        memo = dict()
+        for container in self.time_series.values():
+            for series in container:
+                memo[id(series)] = series
+        for streams in self.time_series_streams.values():
+            for source, _ in streams:
+                memo[id(source)] = source
+        return copy.deepcopy(self, memo)
 
     def save_time_series(self, asset: Asset, time_series: TimeSeries, series_type: TimeSeriesType) -> None:
         """
         Save the time series to the context on the asset ticker key.
         Also save the same TimeSeries object in the asset's TimeSeriesContainer
         """
-        from shinywaffle.data.time_series_data import TimeSeries
         self.time_series[asset.ticker].add(time_series=time_series, series_type=series_type)
-        new_time_series = TimeSeries(id=time_series.uuid)
+        new_time_series = type(time_series)(id=time_series.uuid)
+        asset.data.add(time_series=new_time_series, series_type=series_type)
+
+    def save_time_series_stream(self, asset: Asset, source: ChunkSource, series_type: TimeSeriesType) -> None:
+        """
+        Save a ChunkSource to the context on the asset ticker key, to be streamed during the backtest instead of
+        saving a full TimeSeries. An empty BarSeries is saved in the asset's TimeSeriesContainer, which the
+        streamed bars are appended to
+        """
+        from shinywaffle.data.time_series_data import BarSeries
+        new_time_series = BarSeries()
+        self.time_series_streams[asset.ticker].append((source, new_time_series.uuid))
         asset.data.add(time_series=new_time_series, series_type=series_type)
@@ -5,11 +5,29 @@ import shinywaffle.data.data_provider
 import time
 from shinywaffle.common.context import Context
 from shinywaffle.backtesting.orders import EmptyOrderError
+from shinywaffle.strategy.strategy import CrossSectionalStrategy
+from shinywaffle.utils.instrumentation import Instrumentation
+from collections import defaultdict
+from typing import Callable, Optional
 
 
 class EventHandler:
 
-    def __init__(self, context: Context, data_provider: shinywaffle.data.data_provider.BacktestDataProvider):
+    """
+    Runs the event loop of a backtest. Each event popped from the event stack is passed to the handler registered for
+    its type in self.handlers. Events without a handler are ignored
+
+    Strategies are called per asset through the TimeSeriesEvents, only for the assets they apply to. Cross-sectional
+    strategies are instead called once per time step with all the assets that have new data
+
+    If an Instrumentation object is given, the handlers are timed per event type in its 'events' section, the
+    strategies per strategy name in 'strategies' and the data provider, broker, account, order book and progress bar
+    in 'subsystems'. The timing is added by wrapping the callables once before the loop starts, so the loop itself
+    is the same with and without instrumentation
+    """
+
+    def __init__(self, context: Context, data_provider: shinywaffle.data.data_provider.BacktestDataProvider,
+                 instrumentation: Optional[Instrumentation] = None):
 
         self.context = context
         self.account = context.account
@@ -18,15 +36,55 @@ class EventHandler:
         self.data_provider = data_provider
         self.event_stack = EventStack()
         self.post_event_stack = PostEventStack()
+        self.instrumentation = instrumentation
+        handlers = {
+            events.TimeSeriesEvent: self.handle_time_series_events,
+            events.SignalEventMarketBuy: self.handle_buy_signal_event,
+            events.SignalEventLimitBuy: self.handle_buy_signal_event,
+            events.SignalEventMarketSell: self.handle_sell_signal_event,
+            events.SignalEventLimitSell: self.handle_sell_signal_event,
+            events.PendingOrderEvent: self.handle_pending_order_event,
+            events.OrderFilledEvent: self.handle_order_filled_event
+        }
+        self.handlers = {event_type: self.timed('events', event_type.__name__, handler)
+                         for event_type, handler in handlers.items()}
+
+        # Signal generating methods of the strategies. generate_signal of the per-asset strategies by ticker and
+        # generate_signals of the cross-sectional strategies
+        self.asset_strategies = defaultdict(list)
+        self.cross_sectional_strategies = list()
+        for strategy in self.context.strategies.values():
+            if isinstance(strategy, CrossSectionalStrategy):
+                self.cross_sectional_strategies.append(self.timed('strategies', strategy.name,
+                                                                  strategy.generate_signals))
+            else:
+                generate_signal = self.timed('strategies', strategy.name, strategy.generate_signal)
+                for ticker in strategy.assets.keys():
+                    self.asset_strategies[ticker].append(generate_signal)
+
+        self.place_buy_order = self.timed('subsystems', 'account orders', self.account.place_buy_order)
+        self.place_sell_order = self.timed('subsystems', 'account orders', self.account.place_sell_order)
+        self.complete_order = self.timed('subsystems', 'account orders', self.account.complete_order)
+        self.check_for_order_fill = self.timed('subsystems', 'broker', self.broker.check_for_order_fill)
+        retrieve_time_series_data = self.timed('subsystems', 'data', self.data_provider.retrieve_time_series_data)
+        update_account = self.timed('subsystems', 'account update', self.account.update)
+        update_order_book = self.timed('subsystems', 'order book', self.broker.order_book.update_post_event_stack)
+        progress_bar = getattr(self.context, 'progress_bar', None)
+        update_progress_bar = self.timed('subsystems', 'progress bar', progress_bar.update) if progress_bar else None
 
         while True:
             try:
                 # Detecting any new events and getting the latest time series data
-                new_events = self.data_provider.retrieve_time_series_data()
+                new_events = retrieve_time_series_data()
             except shinywaffle.data.data_provider.BacktestCompleteException:
                 break
             else:
+                # The pending orders that can be filled in the new bars are handled before the time series events
+                pending_order_events = update_order_book([event.asset for event in new_events if event.new_bars])
+                self.event_stack.add(pending_order_events)
                 self.event_stack.add(new_events)
+                if self.cross_sectional_strategies and new_events:
+                    self.handle_cross_sectional_strategies(new_events)
 
             # Looping over events in event stack and handling them accordingly
             while True:
@@ -34,81 +92,64 @@ class EventHandler:
                     event = self.event_stack.get()
                     self.handle_event(event)
                 except EventStackEmptyError:
-                    self.event_stack.events += self.post_event_stack.dump()
+                    self.event_stack.events.extend(self.post_event_stack.dump())
                     break
 
-            self.account.update()
+            update_account()
             if not self.event_stack.events and not self.post_event_stack.events:
                 try:
                     print("Sleeping {} seconds".format(data_provider.sleep_time))
                     time.sleep(data_provider.sleep_time)
                 except AttributeError:
                     pass
-                finally:
-                    pending_order_events = self.broker.order_book.update_post_event_stack()
-                    self.event_stack.add(pending_order_events)
 
-            try:
-                self.context.progress_bar.update()
-            except AttributeError:
-                pass
+            if update_progress_bar is not None:
+                update_progress_bar()
 
-    def handle_event(self, event):
-        if type(event) == events.TimeSeriesEvent:
-            self.handle_time_series_events(event)
+    def timed(self, section: str, key: str, func: Callable) -> Callable:
+        """ func wrapped to be timed under the key in the section of the instrumentation, or func itself if the
+        event handler is not instrumented """
+        if self.instrumentation is None:
+            return func
+        return self.instrumentation.wrap(section, key, func)
 
-        elif type(event) == events.SignalEventMarketBuy:
-            try:
-                new_event = self.account.place_buy_order(event)
-                if new_event is not None:
-                    self.post_event_stack.add(new_event)
-            except EmptyOrderError:
-                pass
-
-        elif type(event) == events.SignalEventLimitBuy:
-            try:
-                new_event = self.account.place_buy_order(event)
-                if new_event is not None:
-                    self.post_event_stack.add(new_event)
-            except EmptyOrderError:
-                pass
-
-        elif type(event) == events.SignalEventMarketSell:
-            try:
-                new_event = self.account.place_sell_order(event)
-                if new_event is not None:
-                    self.post_event_stack.add(new_event)
-            except EmptyOrderError:
-                pass
-
-        elif type(event) == events.SignalEventLimitSell:
-            try:
-                new_event = self.account.place_sell_order(event)
-                if new_event is not None:
-                    self.post_event_stack.add(new_event)
-            except EmptyOrderError:
-                pass
-
-        elif type(event) == events.StopLossEvent:
+    def handle_event(self, event):
+        handler = self.handlers.get(type(event))
+        if handler is not None:
+            handler(event)
+
+    def handle_buy_signal_event(self, event):
+        try:
+            new_event = self.place_buy_order(event)
+            if new_event is not None:
+                self.post_event_stack.add(new_event)
+        except EmptyOrderError:
             pass
 
-        elif type(event) == events.TrailingStopEvent:
+    def handle_sell_signal_event(self, event):
+        try:
+            new_event = self.place_sell_order(event)
+            if new_event is not None:
+                self.post_event_stack.add(new_event)
+        except EmptyOrderError:
             pass
 
-        elif type(event) == events.PendingOrderEvent:
-            new_event = self.broker.check_for_order_fill(event.order_id)
-            self.event_stack.add(new_event)
+    def handle_pending_order_event(self, event):
+        # A fill is booked by the account before the next pending order is checked, so the broker caps the next sell
+        # fill against the balance after it
+        new_event = self.check_for_order_fill(event.order_id)
+        self.event_stack.add_next(new_event)
 
-        elif type(event) == events.OrderFilledEvent:
-            self.account.complete_order(event)
+    def handle_order_filled_event(self, event):
+        self.complete_order(event)
 
     def handle_time_series_events(self, event):
-        # Create list of strategy objects that are linked to the asset that have generated the events (same ticker)
-        # Loop over the strategies with the generated events and call generate_signal method
-        generated_events = []
-        for strategy in self.context.strategies.values():
-            new_events = strategy.generate_signal(event.asset)
-            generated_events += new_events
-
-        self.event_stack.add(generated_events)
-
+        # Loop over the strategies linked to the asset that generated the event and add the events they generate
+        for generate_signal in self.asset_strategies.get(event.asset.ticker, ()):
+            self.event_stack.add(generate_signal(event.asset))
+
+    def handle_cross_sectional_strategies(self, time_series_events: list):
+        # Call each cross-sectional strategy once with all the assets that have new time series data
+        updated_assets = [event.asset for event in time_series_events]
+        for generate_signals in self.cross_sectional_strategies:
+            self.event_stack.add(generate_signals(updated_assets))
@@ -1,4 +1,6 @@
+from collections import deque
 from shinywaffle.common.event import events
+from shinywaffle.backtesting import OrderSide, OrderType
 
 
 class EventStack:
@@ -6,8 +8,30 @@ class EventStack:
     """
         Container class for holding event objects
 
+        The events are held in a deque so both adding and getting an event is O(1). The count of each event type in
+        past_events is looked up in the counted_events table by the type of the event.
+
     """
 
+    # Key in past_events that is incremented when an event of the type is popped from the stack
+    counted_events = {
+        events.TimeSeriesEvent: 'time series',
+        events.SignalEventMarketBuy: 'market buy signal',
+        events.SignalEventMarketSell: 'market sell signal',
+        events.SignalEventLimitBuy: 'limit buy signal',
+        events.SignalEventLimitSell: 'limit sell signal',
+        events.StopLossEvent: 'stop loss',
+        events.TrailingStopEvent: 'trailing stop'
+    }
+
+    # Filled orders are counted by order type and side in addition to the total
+    counted_filled_events = {
+        (OrderType.MARKET, OrderSide.BUY): 'market buy filled',
+        (OrderType.MARKET, OrderSide.SELL): 'market sell filled',
+        (OrderType.LIMIT, OrderSide.BUY): 'limit buy filled',
+        (OrderType.LIMIT, OrderSide.SELL): 'limit sell filled'
+    }
+
     def __init__(self):
 
         """
@@ -16,7 +40,7 @@ class EventStack:
         analysis later
         """
 
-        self.events = list()
+        self.events = deque()
         self.past_events = {
             'time series': 0,
             'market buy signal': 0,
@@ -40,17 +64,17 @@ class EventStack:
         :return: N/A
         """
         if isinstance(event, events.Event) or isinstance(event, events.PendingOrderEvent):
-            if event is not None:
-                self.events.append(event)
-            else:
-                pass
+            self.events.append(event)
 
         elif isinstance(event, list):
-            for e in event:
-                if e is not None:
-                    self.events.append(e)
-                else:
-                    continue
+            self.events.extend(e for e in event if e is not None)
+
+    def add_next(self, event):
+        """
+        Adds an event to the front of the EventStack, so it is the next event to be returned by get(). None is ignored
+        """
+        if event is not None:
+            self.events.appendleft(event)
 
     def get(self):
         """
@@ -61,40 +85,21 @@ class EventStack:
         :return: event. If there are no more events in the even stack, return None and False
         """
         try:
-            event = self.events.pop(0)
-
-            if type(event) == events.TimeSeriesEvent:
-                self.past_events['time series'] += 1
-            elif type(event) == events.SignalEventMarketBuy:
-                self.past_events['market buy signal'] += 1
-            elif type(event) == events.SignalEventMarketSell:
-                self.past_events['market sell signal'] += 1
-            elif type(event) == events.SignalEventLimitBuy:
-                self.past_events['limit buy signal'] += 1
-            elif type(event) == events.SignalEventLimitSell:
-                self.past_events['limit sell signal'] += 1
-            elif type(event) == events.OrderFilledEvent:
-                if event.type == 'market':
-                    if event.side == 'sell':
-                        self.past_events['market sell filled'] += 1
-                    elif event.side == 'buy':
-                        self.past_events['market buy filled'] += 1
-                elif event.type == 'limit':
-                    if event.side == 'sell':
-                        self.past_events['limit sell filled'] += 1
-                    elif event.side == 'buy':
-                        self.past_events['limit buy filled'] += 1
-            elif type(event) == events.StopLossEvent:
-                self.past_events['stop loss'] += 1
-            elif type(event) == events.TrailingStopEvent:
-                self.past_events['trailing stop'] += 1
-            elif type(event) == events.OrderFilledEvent:
-                self.past_events['total filled'] += 1
-
-            return event
+            event = self.events.popleft()
         except IndexError:
             raise EventStackEmptyError
 
+        key = self.counted_events.get(type(event))
+        if key is not None:
+            self.past_events[key] += 1
+        elif type(event) == events.OrderFilledEvent:
+            key = self.counted_filled_events.get((event.type, event.side))
+            if key is not None:
+                self.past_events[key] += 1
+            self.past_events['total filled'] += 1
+
+        return event
+
     def report(self):
         return self.past_events
 
@@ -106,7 +111,7 @@ class PostEventStack(EventStack):
 
     def dump(self):
         events = self.events
-        self.events = []
+        self.events = deque()
         return events
 
 
@@ -10,8 +10,13 @@ class Event(ABC):
     """
     Event base class is used as super for all other classes
     Classes for the different types of events
+
+    The events use __slots__ and set all their member variables in one constructor. The side and type of signal
+    events are class attributes of the BuyEvent, SellEvent, MarketEvent and LimitEvent mixins
     """
 
+    __slots__ = ('asset',)
+
     def __init__(self, asset):
         assert isinstance(asset, assets.Asset)
         self.asset = asset
@@ -21,82 +26,111 @@ class Event(ABC):
 
 
 class BuyEvent:
-    def __init__(self, expires_at: datetime):
-        self.side = OrderSide.BUY
-        self.expires_at = expires_at
+    __slots__ = ()
+    side = OrderSide.BUY
 
 
 class SellEvent:
-    def __init__(self, expires_at: datetime):
-        self.side = OrderSide.SELL
-        self.expires_at = expires_at
+    __slots__ = ()
+    side = OrderSide.SELL
 
 
 class MarketEvent:
-    def __init__(self):
-        self.type = OrderType.MARKET
+    __slots__ = ()
+    type = OrderType.MARKET
 
 
 class LimitEvent:
-    def __init__(self, limit_price):
-        self.type = OrderType.LIMIT
-        self.order_limit_price = limit_price
+    __slots__ = ()
+    type = OrderType.LIMIT
 
 
 class TimeSeriesEvent(Event):
-    def __init__(self, asset):
+
+    """
+    Signals new time series data for the asset. The data provider creates one per asset and reuses it. new_bars is
+    True if the new data includes new asset bars and False if only other series of the asset, e.g. associated
+    series, have new data
+    """
+
+    __slots__ = ('new_bars',)
+
+    def __init__(self, asset, new_bars: bool = True):
         super().__init__(asset)
+        self.new_bars = new_bars
 
 
 class SignalEventMarketBuy(Event, MarketEvent, BuyEvent):
+    __slots__ = ('expires_at',)
+
     def __init__(self, asset, expires_at: Optional[datetime] = None):
-        Event.__init__(self, asset)
-        MarketEvent.__init__(self)
-        BuyEvent.__init__(self, expires_at=expires_at)
+        assert isinstance(asset, assets.Asset)
+        self.asset = asset
+        self.expires_at = expires_at
 
 
 class SignalEventLimitBuy(Event, LimitEvent, BuyEvent):
+    __slots__ = ('order_limit_price', 'expires_at')
+
     def __init__(self, asset, order_limit_price, expires_at: Optional[datetime] = None):
-        Event.__init__(self, asset)
-        LimitEvent.__init__(self, order_limit_price)
-        BuyEvent.__init__(self, expires_at=expires_at)
+        assert isinstance(asset, assets.Asset)
+        self.asset = asset
+        self.order_limit_price = order_limit_price
+        self.expires_at = expires_at
 
 
 class SignalEventMarketSell(Event, MarketEvent, SellEvent):
+    __slots__ = ('expires_at',)
+
     def __init__(self, asset, expires_at: Optional[datetime] = None):
-        Event.__init__(self, asset)
-        MarketEvent.__init__(self)
-        SellEvent.__init__(self, expires_at=expires_at)
+        assert isinstance(asset, assets.Asset)
+        self.asset = asset
+        self.expires_at = expires_at
 
 
 class SignalEventLimitSell(Event, LimitEvent, SellEvent):
+    __slots__ = ('order_limit_price', 'expires_at')
+
     def __init__(self, asset, order_limit_price, expires_at: Optional[datetime] = None):
-        Event.__init__(self, asset)
-        LimitEvent.__init__(self, order_limit_price)
-        SellEvent.__init__(self, expires_at=expires_at)
+        assert isinstance(asset, assets.Asset)
+        self.asset = asset
+        self.order_limit_price = order_limit_price
+        self.expires_at = expires_at
 
 
 class StopLossEvent(Event):
+    __slots__ = ('order_size',)
+
     def __init__(self, asset, order_size):
         super().__init__(asset)
         self.order_size = order_size
 
 
 class TrailingStopEvent(Event):
+    __slots__ = ('order_size',)
+
     def __init__(self, asset, order_size):
         super().__init__(asset)
         self.order_size = order_size
 
 
 class PendingOrderEvent:
-    def __init__(self, order_id: int, expires_at: Optional[datetime] = None):
+
+    """ Signals an order waiting to be filled. Each order creates one when it is placed and reuses it """
+
+    __slots__ = ('order_id', 'expires_at')
+
+    def __init__(self, order_id: int, expires_at: Optional[int] = None):
         self.order_id = order_id
         self.expires_at = expires_at
 
 
 class OrderFilledEvent(Event):
-    def __init__(self, asset, filled_price, order_price, size, volume, order_type, side, commission, time):
-        super().__init__(asset)
+    __slots__ = ('filled_price', 'order_price', 'order_size', 'type', 'side', 'order_volume', 'commission', 'time')
+
+    def __init__(self, asset, filled_price, order_price, size, volume, order_type, side, commission, time: int):
+        assert isinstance(asset, assets.Asset)
+        self.asset = asset
         self.filled_price = filled_price
         self.order_price = order_price
         self.order_size = size
@@ -105,4 +139,3 @@ class OrderFilledEvent(Event):
         self.order_volume = volume
         self.commission = commission
         self.time = time
-
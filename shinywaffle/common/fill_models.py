@@ -0,0 +1,236 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from shinywaffle.data.intrabar_simulation import simulate_intrabar_paths
+
+
+class LimitFillModel(ABC):
+
+    """
+    Base class for the models deciding if and at what price limit orders are filled within a bar.
+
+    The model evaluates a batch of orders at once. The bar fields are arrays with one entry per order, so orders on
+    different assets or bars can be evaluated together. The broker only passes orders with a limit price within the
+    low and high of the bar.
+    """
+
+    name = None
+
+    @abstractmethod
+    def fill_prices(self, opens: np.ndarray, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                    limit_prices: np.ndarray, is_buy: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """
+        :param opens: Open of the bar of each order. Likewise for highs, lows and closes
+        :param limit_prices: Limit price of each order
+        :param is_buy: True for buy orders and False for sell orders
+        :param rng: Random generator of the broker
+        :return: The fill price of each order, NaN for the orders that are not filled
+        """
+        pass
+
+
+class SimulatedLimitFillModel(LimitFillModel):
+
+    """
+    Simulates an intrabar price path for each order and fills it at the first price at or below the limit for buy
+    orders and at or above the limit for sell orders. See simulate_intrabar_paths
+    """
+
+    name = 'simulated'
+
+    def __init__(self, steps: int = 300, stdev_dampening: float = 20):
+        self.steps = steps
+        self.stdev_dampening = stdev_dampening
+
+    def fill_prices(self, opens, highs, lows, closes, limit_prices, is_buy, rng):
+        paths = simulate_intrabar_paths(opens, highs, lows, closes, steps=self.steps,
+                                        stdev_dampening=self.stdev_dampening, rng=rng)
+        limit_prices = np.asarray(limit_prices, dtype=float)[:, None]
+        crossed = np.where(np.asarray(is_buy)[:, None], paths <= limit_prices, paths >= limit_prices)
+        first = np.argmax(crossed, axis=1)
+        prices = paths[np.arange(len(paths)), first]
+        return np.where(crossed.any(axis=1), prices, np.nan)
+
+
+class TouchLimitFillModel(LimitFillModel):
+
+    """
+    Closed-form fills from the OHLC of the bar without a price path. A price path from the open to the close that
+    reaches the low and the high touches every price in between, so a limit order within the bar is always filled:
+    at the open if the bar opens through the limit, i.e. at or below the limit of a buy order or at or above the
+    limit of a sell order, and at the limit price otherwise
+    """
+
+    name = 'touch'
+
+    def fill_prices(self, opens, highs, lows, closes, limit_prices, is_buy, rng):
+        opens = np.asarray(opens, dtype=float)
+        limit_prices = np.asarray(limit_prices, dtype=float)
+        return np.where(is_buy, np.minimum(opens, limit_prices), np.maximum(opens, limit_prices))
+
+
+class BrownianBridgeLimitFillModel(LimitFillModel):
+
+    """
+    Closed-form fills with one random draw per order. The price between the open and the close is modelled as a
+    Brownian bridge in log price, with the variance over the bar estimated from the high and the low with the
+    Parkinson estimator, (ln(high / low)) ** 2 / (4 ln 2). A limit between the open and the close is always reached.
+    A limit beyond both of them is reached with the first-passage probability of the bridge,
+    exp(-2 ln(open / limit) ln(close / limit) / variance).
+
+    Unlike TouchLimitFillModel, the high and the low only set the volatility and do not have to be traded, so limit
+    orders near the extremes of the bar are filled less often. Orders are filled at the open if the bar opens through
+    the limit and at the limit price otherwise
+    """
+
+    name = 'brownian bridge'
+
+    def fill_prices(self, opens, highs, lows, closes, limit_prices, is_buy, rng):
+        opens, highs, lows, closes, limit_prices = (np.asarray(a, dtype=float)
+                                                    for a in (opens, highs, lows, closes, limit_prices))
+        variance = np.log(highs / lows) ** 2 / (4 * np.log(2))
+        distance_open = np.log(opens / limit_prices)
+        distance_close = np.log(closes / limit_prices)
+
+        # The distances are positive when the limit is beyond the open and the close, below them for a buy order and
+        # above them for a sell order
+        sign = np.where(is_buy, 1., -1.)
+        beyond = (sign * distance_open > 0) & (sign * distance_close > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            probability = np.where(beyond, np.exp(-2 * distance_open * distance_close / variance), 1.)
+
+        filled = rng.random(len(opens)) < np.nan_to_num(probability)
+        prices = np.where(is_buy, np.minimum(opens, limit_prices), np.maximum(opens, limit_prices))
+        return np.where(filled, prices, np.nan)
+
+
+class MarketFills:
+
+    """
+    The market orders pending on an asset that are filled in the current bar, evaluated together by the market fill
+    models of the broker. The bar fields are the latest bar of the asset. prices starts at the open of the bar and
+    fill_volumes at the volumes of the orders, and each model adjusts them in turn. The orders are in the order they
+    were placed
+    """
+
+    __slots__ = ('asset', 'bar_time', 'open', 'high', 'low', 'close', 'volume', 'order_volumes', 'is_buy', 'prices',
+                 'fill_volumes')
+
+    def __init__(self, asset, bar_time: int, opn: float, high: float, low: float, close: float, volume: float,
+                 order_volumes: np.ndarray, is_buy: np.ndarray):
+        self.asset = asset
+        self.bar_time = bar_time
+        self.open = opn
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.order_volumes = order_volumes
+        self.is_buy = is_buy
+        self.prices = np.full(len(order_volumes), opn, dtype=float)
+        self.fill_volumes = np.array(order_volumes, dtype=float)
+
+    @property
+    def sign(self) -> np.ndarray:
+        """ 1 for buy orders and -1 for sell orders, the direction that makes a price worse for the order """
+        return np.where(self.is_buy, 1., -1.)
+
+
+class MarketFillModel(ABC):
+
+    """
+    Base class for the models of how market orders are filled. The broker applies its market fill models in order to
+    a MarketFills of all the market orders pending on an asset, so every model is one vectorized call per asset and
+    bar regardless of the number of orders
+    """
+
+    name = None
+
+    @abstractmethod
+    def apply(self, fills: MarketFills, broker) -> None:
+        """ Adjusts fills.prices and/or fills.fill_volumes in place """
+        pass
+
+
+class SlippageMarketFillModel(MarketFillModel):
+
+    """
+    Random slippage drawn from the slippage generator of the broker. Buy orders are filled slippage percent above the
+    price and sell orders slippage percent below it
+    """
+
+    name = 'slippage'
+
+    def apply(self, fills, broker):
+        fills.prices += fills.prices * fills.sign * broker.slippages.take(len(fills.prices))
+
+
+class SpreadMarketFillModel(MarketFillModel):
+
+    """
+    Buy orders are filled half the spread above the price and sell orders half the spread below it. The spread is a
+    fraction of the price if relative is True and an absolute price difference otherwise
+    """
+
+    name = 'spread'
+
+    def __init__(self, spread: float, relative: bool = True):
+        self.spread = spread
+        self.relative = relative
+
+    def apply(self, fills, broker):
+        half_spread = self.spread / 2 * (fills.prices if self.relative else 1.)
+        fills.prices += fills.sign * half_spread
+
+
+class SquareRootImpactMarketFillModel(MarketFillModel):
+
+    """
+    Square-root market impact: the price moves against an order by coefficient * volatility * sqrt(fill volume / bar
+    volume). The volatility of the bar is estimated as (high - low) / open. Orders on bars without volume have no
+    impact
+    """
+
+    name = 'square root impact'
+
+    def __init__(self, coefficient: float = 1.):
+        self.coefficient = coefficient
+
+    def apply(self, fills, broker):
+        if not fills.volume > 0:
+            return
+        volatility = (fills.high - fills.low) / fills.open
+        impact = self.coefficient * volatility * np.sqrt(fills.fill_volumes / fills.volume)
+        fills.prices *= 1 + fills.sign * impact
+
+
+class VolumeParticipationMarketFillModel(MarketFillModel):
+
+    """
+    Caps the volume filled on an asset in a bar to max_participation of the volume of the bar. The volume is
+    allocated to the orders in the order they were placed, and the rest of an order stays pending to be filled in the
+    following bars. The volume already filled in a bar is remembered, so a bar that is evaluated again, e.g. when no
+    new bar has arrived, only fills what is left of the cap. Should be applied before the models that depend on the
+    fill volume
+    """
+
+    name = 'volume participation'
+
+    def __init__(self, max_participation: float = 0.1):
+        self.max_participation = max_participation
+        self.filled_volume = dict()
+
+    def apply(self, fills, broker):
+        ticker = fills.asset.ticker
+        bar_time, filled = self.filled_volume.get(ticker, (None, 0.))
+        if bar_time != fills.bar_time:
+            filled = 0.
+
+        capacity = max(np.nan_to_num(self.max_participation * fills.volume) - filled, 0.)
+        before = np.cumsum(fills.fill_volumes) - fills.fill_volumes
+        volumes = np.clip(capacity - before, 0., fills.fill_volumes)
+        # Capped volumes are rounded down to the decimal points of the asset. Uncapped orders keep their full volume,
+        # so no remainder smaller than the decimal points is left pending
+        multiplier = 10 ** fills.asset.num_decimal_points
+        fills.fill_volumes = np.where(volumes < fills.fill_volumes, np.floor(volumes * multiplier) / multiplier,
+                                      fills.fill_volumes)
+        self.filled_volume[ticker] = (fills.bar_time, filled + float(np.sum(fills.fill_volumes)))
@@ -1,8 +1,8 @@
-from datetime import datetime
 from shinywaffle.common.context import Context
 from shinywaffle.common.assets import Asset
 from shinywaffle.backtesting.orders import OrderSide
 from shinywaffle.backtesting import DATETIME_FORMAT
+from shinywaffle.utils.misc import ns_to_strings, NS_PER_DAY, NS_PER_HOUR, NS_PER_MINUTE
 from typing import Union, Tuple, List
 from shinywaffle.common.metrics import drawdown
 
@@ -39,17 +39,23 @@ class SharesCounter:
 
 
 class Transaction:
-    def __init__(self, volume: Union[float, int], price: float, side: OrderSide, time: datetime):
-        """ A transaction on a position"""
+    def __init__(self, volume: Union[float, int], price: float, side: OrderSide, time: int):
+        """ A transaction on a position. The time is integer nanoseconds from epoch"""
         self.volume = volume
         self.price = price
         self.size = volume * price
         self.side = side
-        self.time = time.strftime(DATETIME_FORMAT)
+        self.time = time
 
 
 class Position:
-    def __init__(self, time_opened: datetime, volume: float, size: float, price: float,
+
+    """
+    A position in an asset. All times (opened, closed, the times of the time series and the transactions) are integer
+    nanoseconds from epoch and are only formatted as strings in the report
+    """
+
+    def __init__(self, time_opened: int, volume: float, size: float, price: float,
                  position_container: 'PositionContainer', id: int):
         self.opened_time = time_opened
         self.position_container = position_container
@@ -78,7 +84,7 @@ class Position:
         self.shares = SharesCounter()
         self.shares.add_share_count(ShareCount(num_shares=volume, price=price))
 
-    def sell_off(self, order_volume: float, order_price: float, time: datetime) -> Tuple[bool, float, Union[int, float]]:
+    def sell_off(self, order_volume: float, order_price: float, time: int) -> Tuple[bool, float, Union[int, float]]:
 
         """
         Method to partially close a position. Incrementing the partial return member variable by the order size.
@@ -111,14 +117,14 @@ class Position:
 
         return self.is_active, filled_order_volume, remaining_order_volume
 
-    def increase(self, order_volume: float, order_price: float, time: datetime) -> None:
+    def increase(self, order_volume: float, order_price: float, time: int) -> None:
         self.volume += order_volume
         self.shares.add_share_count(share_count=ShareCount(num_shares=order_volume, price=order_price))
 
         transaction = Transaction(volume=order_volume, price=order_price, side=OrderSide.BUY, time=time)
         self.transactions.append(transaction)
 
-    def close_out(self, time: datetime):
+    def close_out(self, time: int):
         """ Function to close out position. First updates time series
          and then calculate metrics on exit."""
         self.update()
@@ -142,7 +148,7 @@ class Position:
 
     @property
     def value(self) -> float:
-        return self.volume * self.position_container.asset.bars[0].close
+        return self.volume * self.position_container.asset.bars.close[0]
 
     @property
     def current_return(self) -> float:
@@ -159,29 +165,34 @@ class Position:
         by the event handler
         """
 
-        current_time = self.position_container.context.time
+        current_time = self.position_container.context.time_ns
 
         self.time_series['value'].append(self.value)
         self.time_series['volume'].append(self.volume)
         self.time_series['return'].append(self.current_return)
         self.time_series['return_percent'].append(self.current_return_percent)
         self.time_series['closed_amount'].append(self.closed_amount)
-        self.time_series['times'].append(current_time.strftime(DATETIME_FORMAT))
+        self.time_series['times'].append(current_time)
         self.time_in_trade = (current_time - self.opened_time)
 
     def __repr__(self):
         return 'id: {} - volume: {}'.format(self.id, self.volume)
 
     def report(self):
-        try:
-            closed_time = self.closed_time.strftime(DATETIME_FORMAT)
-        except AttributeError:
-            closed_time = None
+        # All times of the position are formatted in one call
+        transaction_times = [t.time for t in self.transactions]
+        closed_times = [self.closed_time] if self.closed_time is not None else []
+        strings = ns_to_strings([self.opened_time] + closed_times + transaction_times + self.time_series['times'],
+                                DATETIME_FORMAT)
+        opened_time = strings[0]
+        closed_time = strings[1] if closed_times else None
+        transaction_strings = strings[1 + len(closed_times):1 + len(closed_times) + len(transaction_times)]
+        times = strings[1 + len(closed_times) + len(transaction_times):]
 
         # TODO Find a way to get the base asset in here as well
         data = {
             'id': self.id,
-            'opened_time': self.opened_time.strftime(DATETIME_FORMAT),
+            'opened_time': opened_time,
             'closed_time': closed_time,
             'enter_price': self.enter_price,
             'avg_close_price': self.avg_close_price,
@@ -193,12 +204,12 @@ class Position:
             'returns': self.time_series['return'],
             'maximum_drawdown': drawdown(self.time_series['value']),
             'return_percent': self.time_series['return_percent'],
-            'days_in_trade': self.time_in_trade.days,
-            'hours_in_trade': self.time_in_trade.total_seconds()/(60*60),
-            'minutes_in_trade': self.time_in_trade.total_seconds()/60,
-            'times': self.time_series['times'],
+            'days_in_trade': self.time_in_trade // NS_PER_DAY,
+            'hours_in_trade': self.time_in_trade / NS_PER_HOUR,
+            'minutes_in_trade': self.time_in_trade / NS_PER_MINUTE,
+            'times': times,
             'volumes': self.time_series['volume'],
-            'transactions': [t.__dict__ for t in self.transactions],
+            'transactions': [dict(t.__dict__, time=s) for t, s in zip(self.transactions, transaction_strings)],
             'num_transactions': {
                 OrderSide.BUY.value: sum([1 for t in self.transactions if t.side == OrderSide.BUY]),
                 OrderSide.SELL.value: sum([1 for t in self.transactions if t.side == OrderSide.SELL]),
@@ -206,10 +217,7 @@ class Position:
 
         }
 
-        try:
-            data['closed'] = self.closed_time.strftime(DATETIME_FORMAT)
-        except AttributeError:
-            data['closed'] = "Position not closed"
+        data['closed'] = closed_time if closed_time is not None else "Position not closed"
 
         return data
 
@@ -267,7 +275,7 @@ class PositionContainer:
         """ Returns the total losing position returns"""
         return sum([p.total_return for p in self.losing_positions])
 
-    def enter_position(self, time: datetime, volume: Union[int, float], size: float, price: float) -> None:
+    def enter_position(self, time: int, volume: Union[int, float], size: float, price: float) -> None:
         """
         Enters a position. If an open position exists on the asset, increase the position with the new order.
         If no open position exists on the asset, open a new one.
@@ -284,7 +292,7 @@ class PositionContainer:
             self.latest_active_id += 1
             self.position = position
 
-    def sell_off(self, volume: Union[int, float], price: float, time: datetime) -> None:
+    def sell_off(self, volume: Union[int, float], price: float, time: int) -> None:
 
         """
         Method that sells of "size" amount of the oldest position of asset "ticker" at the price "price" at the
@@ -0,0 +1,89 @@
+from __future__ import annotations
+import copy
+import numpy as np
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
+from shinywaffle.data.time_series_data import TimeSeriesType
+
+if TYPE_CHECKING:
+    import uuid
+    from shinywaffle.common.assets import Asset
+    from shinywaffle.common.context import Context
+    from shinywaffle.data.time_series_data import TimeSeries
+
+
+class AsOfJoin:
+
+    """
+    As-of alignment of the associated time series in a context (TimeSeriesType.TYPE_ASSOCIATED, e.g. sentiment or
+    earnings) to the time steps of a backtest.
+
+    For every associated series the chronological position of the latest data point at or before each backtest time
+    is found once, with a single searchsorted over the whole time axis. During the backtest the data provider moves
+    self.step along with the backtest time, so reading the value of a series as of the current time is a lookup in
+    a precomputed array instead of a scan of the series.
+
+    The backtest data provider assigns the AsOfJoin for its time steps to context.as_of. The precomputed positions
+    are read-only and are shared with copies made by Context.copy.
+    """
+
+    def __init__(self, context: Context, times: np.ndarray):
+        """
+        :param context: Context with the associated time series saved
+        :param times: The time steps of the backtest as an int64 array of nanoseconds from epoch
+        """
+        self.times = np.asarray(times, dtype=np.int64)
+        self.step = -1
+        self._rows: Dict[uuid.UUID, np.ndarray] = dict()
+        self._series: Dict[str, Tuple[TimeSeries, ...]] = dict()
+
+        for ticker, container in list(context.time_series.items()):
+            series = container.get(series_type=TimeSeriesType.TYPE_ASSOCIATED)
+            self._series[ticker] = series
+            for s in series:
+                self._rows[s.uuid] = np.searchsorted(s.time_index(), self.times, side='right') - 1
+                self._rows[s.uuid].setflags(write=False)
+
+    def __deepcopy__(self, memo):
+        new = copy.copy(self)
+        memo[id(self)] = new
+        return new
+
+    def _find_series(self, asset: Asset or str, id: Optional[uuid.UUID]) -> TimeSeries:
+        ticker = asset if isinstance(asset, str) else asset.ticker
+        series = self._series.get(ticker, ())
+        if id is not None:
+            for s in series:
+                if s.uuid == id:
+                    return s
+            raise ValueError(f'No associated time series with id {id} for {ticker}')
+
+        if len(series) != 1:
+            raise ValueError(f'{ticker} has {len(series)} associated time series, the id of the series is required')
+        return series[0]
+
+    def rows(self, asset: Asset or str, id: Optional[uuid.UUID] = None) -> np.ndarray:
+        """
+        Returns the chronological position of the latest data point of the series at or before each backtest time.
+        Positions are -1 where the series has no data point yet
+        """
+        return self._rows[self._find_series(asset, id).uuid]
+
+    def get(self, asset: Asset or str, attribute: Optional[str] = None, id: Optional[uuid.UUID] = None):
+        """
+        Returns the latest data point of an associated series as of the current backtest time, or the attribute of
+        it if attribute is given. Returns None if the series has no data point at or before the current time.
+
+        :param asset: The asset or ticker the series is associated with
+        :param attribute: Attribute of the data point to return
+        :param id: uuid of the series. Required if the asset has more than one associated series
+        """
+        series = self._find_series(asset, id)
+        if self.step < 0:
+            return None
+
+        row = self._rows[series.uuid][self.step]
+        if row < 0:
+            return None
+
+        data_point = series[len(series) - 1 - row]
+        return getattr(data_point, attribute) if attribute is not None else data_point
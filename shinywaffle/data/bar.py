@@ -1,35 +1,24 @@
 from datetime import datetime
+from typing import Union
 
+from shinywaffle.utils.misc import datetime_to_ns, ns_to_datetime
 
-class Bar:
 
-    """
-    Representing each bar in the candlestick plot
-
-    Member variables:
-        - Timestamp: Timestamp of bar as datetime object
-        - Open: Open price of the bar
-        - Close: Closing price of the bar
-        - High: High price of the bar
-        - Low: Low price of the bar
-        - Volume: Volume traded of the bar
+class _BarBase:
 
     """
+    Methods shared by Bar and BarView. Arithmetic always returns a new Bar, whichever of the two the operands are
+    """
 
-    def __init__(self,
-                 timestamp: datetime, opn: float or str, close: float or str,
-                 high: float or str, low: float or str, volume: float or str):
+    __slots__ = ()
 
-        super().__init__()
-        self.time = timestamp
-        self.open = float(opn)
-        self.close = float(close)
-        self.high = float(high)
-        self.low = float(low)
-        self.volume = int(volume)
+    @property
+    def datetime(self) -> datetime:
+        """ The time of the bar as a datetime object """
+        return ns_to_datetime(self.time)
 
     def __str__(self):
-        return f'Bar(time open={self.time}, open={self.open}, close={self.close}, high={self.high}, low={self.low}, volume={self.volume})'
+        return f'Bar(time open={self.datetime}, open={self.open}, close={self.close}, high={self.high}, low={self.low}, volume={self.volume})'
 
     def __repr__(self):
         return self.__str__()
@@ -51,3 +40,87 @@ class Bar:
     def __mul__(self, f):
         assert isinstance(f, int) or isinstance(f, float)
         return Bar(self.time, self.open * f, self.close * f, self.high * f, self.low * f, self.volume * f)
+
+
+class Bar(_BarBase):
+
+    """
+    Representing each bar in the candlestick plot
+
+    Member variables:
+        - Timestamp: Timestamp of bar as integer nanoseconds from epoch. A datetime object is converted when the bar
+          is created and bar.datetime converts it back
+        - Open: Open price of the bar
+        - Close: Closing price of the bar
+        - High: High price of the bar
+        - Low: Low price of the bar
+        - Volume: Volume traded of the bar
+
+    The member variables are slots, so a Bar has no per instance __dict__
+
+    """
+
+    __slots__ = ('time', 'open', 'close', 'high', 'low', 'volume')
+
+    def __init__(self,
+                 timestamp: Union[datetime, int], opn: float or str, close: float or str,
+                 high: float or str, low: float or str, volume: float or str):
+
+        self.time = datetime_to_ns(timestamp)
+        self.open = float(opn)
+        self.close = float(close)
+        self.high = float(high)
+        self.low = float(low)
+        self.volume = float(volume)
+
+
+class BarView(_BarBase):
+
+    """
+    Read only view of one row of the columns of a BarSeries. It has the same member variables and arithmetic as Bar,
+    but the values are read from the columns when they are accessed instead of being stored on the object.
+
+    Copying or pickling a BarView gives a Bar with the values of the row, so the columns are never copied with it
+
+    """
+
+    __slots__ = ('_columns', '_position')
+
+    def __init__(self, columns: dict, position: int):
+        """
+        :param columns: Dictionary of column arrays with the fields time (int64 ns), open, high, low, close, volume
+        :param position: Chronological position of the row in the columns
+        """
+        self._columns = columns
+        self._position = position
+
+    @property
+    def time(self) -> int:
+        return int(self._columns['time'][self._position])
+
+    @property
+    def open(self) -> float:
+        return float(self._columns['open'][self._position])
+
+    @property
+    def close(self) -> float:
+        return float(self._columns['close'][self._position])
+
+    @property
+    def high(self) -> float:
+        return float(self._columns['high'][self._position])
+
+    @property
+    def low(self) -> float:
+        return float(self._columns['low'][self._position])
+
+    @property
+    def volume(self) -> float:
+        return float(self._columns['volume'][self._position])
+
+    def to_bar(self) -> Bar:
+        """ Returns the row as a Bar that does not refer to the columns """
+        return Bar(self.time, self.open, self.close, self.high, self.low, self.volume)
+
+    def __reduce__(self):
+        return Bar, (self.time, self.open, self.close, self.high, self.low, self.volume)
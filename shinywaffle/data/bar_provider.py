@@ -1,32 +1,97 @@
+import glob
+import hashlib
+import os
+import numpy as np
 import pandas as pd
-from shinywaffle.data.bar import Bar
-from shinywaffle.data.time_series_data import TimeSeries
-from datetime import datetime
+from typing import Optional
+from shinywaffle.data.time_series_data import BarSeries
+from shinywaffle.data.bar_store import write_bar_store, open_bar_store, BarStoreError
+
+
+# Directory of the bar store cache files, so that nothing is written next to the csv files
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                 'shinywaffle')
 
 
 class BarProvider:
 
-    def __new__(cls, path: str, date_string_format: str) -> TimeSeries:
-        bars = list()
-        df = pd.read_csv(path)
+    """
+    Reads bars from a csv file with the columns Open, Close, High, Low, Volume and either Date or Time open.
+
+    The file is parsed column-wise with pandas. Unless cache=False, the parsed bars are saved in a bar store file in
+    cache_dir, DEFAULT_CACHE_DIR by default, keyed by the path, modification time and date format of the csv file.
+    Loading the same csv file again opens the bar store instead of parsing the file. The cache is an optimisation
+    only: if the cache directory cannot be written, the csv file is parsed on every load.
+    """
+
+    def __new__(cls, path: str, date_string_format: str, cache: bool = True,
+                cache_dir: Optional[str] = None) -> BarSeries:
+        cache_path = cls.cache_path(path, date_string_format, cache_dir=cache_dir)
+        if cache and os.path.exists(cache_path):
+            try:
+                return open_bar_store(cache_path)
+            except BarStoreError:
+                pass
+
+        bars = cls.parse(path, date_string_format)
+
+        if cache:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                write_bar_store(cache_path, bars, symbol=os.path.splitext(os.path.basename(path))[0])
+                cls.remove_stale_caches(cache_path)
+            except OSError:
+                pass
 
-        assert 'Open' in df.columns 
+        return bars
+
+    @staticmethod
+    def remove_stale_caches(cache_path: str) -> None:
+        """ Removes the cache files of earlier versions of the csv file of cache_path """
+        prefix = cache_path.rsplit('.', 2)[0]
+        for stale_path in glob.glob(glob.escape(prefix) + '.*.bars'):
+            if stale_path != cache_path:
+                try:
+                    os.remove(stale_path)
+                except FileNotFoundError:
+                    # Removed by another process loading the same csv file
+                    pass
+
+    @staticmethod
+    def parse(path: str, date_string_format: str) -> BarSeries:
+        """ Parses the csv file into a BarSeries using vectorized conversions of each column """
+        return BarProvider.from_frame(pd.read_csv(path), date_string_format)
+
+    @staticmethod
+    def from_frame(df: pd.DataFrame, date_string_format: str) -> BarSeries:
+        """ Converts a DataFrame read from a bar csv file into a BarSeries """
+        assert 'Open' in df.columns
         assert 'Close' in df.columns
         assert 'High' in df.columns
         assert 'Low' in df.columns
         assert 'Volume' in df.columns
         assert 'Date' in df.columns or 'Time open' in df.columns
 
-        for _, row in df.iterrows():
-            bar = Bar(datetime.strptime(row['Time open'], date_string_format),
-                      row['Open'],
-                      row['Close'],
-                      row['High'],
-                      row['Low'],
-                      row['Volume'])
-            bars.append(bar)
-
-        bars.sort(key=lambda b: b.time, reverse=True)
-        time_series = TimeSeries()
-        time_series.set(bars)
-        return time_series
+        time_column = 'Time open' if 'Time open' in df.columns else 'Date'
+        times = pd.to_datetime(df[time_column], format=date_string_format).to_numpy(dtype='datetime64[ns]')
+
+        return BarSeries.from_arrays(time=times.view(np.int64),
+                                     open=df['Open'].to_numpy(dtype=np.float64),
+                                     high=df['High'].to_numpy(dtype=np.float64),
+                                     low=df['Low'].to_numpy(dtype=np.float64),
+                                     close=df['Close'].to_numpy(dtype=np.float64),
+                                     volume=df['Volume'].to_numpy(dtype=np.float64))
+
+    @staticmethod
+    def cache_path(path: str, date_string_format: str, cache_dir: Optional[str] = None) -> str:
+        """
+        Path of the bar store cache file for a csv file in its current version. The name is the name of the csv file,
+        a hash of its absolute path and a hash of its version, so files with the same name in different directories
+        do not share cache files
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        path_key = hashlib.sha1(path.encode()).hexdigest()[:8]
+        version_key = f'{stat.st_mtime_ns}|{stat.st_size}|{date_string_format}'
+        version_key = hashlib.sha1(version_key.encode()).hexdigest()[:16]
+        return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f'{os.path.basename(path)}.{path_key}.{version_key}.bars')
@@ -0,0 +1,171 @@
+"""
+Binary on-disk format for bar series.
+
+A bar store file consists of a fixed size header followed by one fixed width record per bar, sorted by time:
+
+    header:  magic, version, record size, number of bars, first and last bar time, symbol and interval
+    records: time (int64 nanoseconds from epoch), open, high, low, close, volume (float64), little endian
+
+The records are opened with numpy.memmap, so opening a store is independent of its length and only the pages that
+are actually read are loaded from disk. Processes that open the same store share the operating system page cache
+instead of each holding a private copy of the data.
+"""
+from __future__ import annotations
+import os
+import uuid
+import numpy as np
+from datetime import datetime
+from typing import Optional
+from shinywaffle.data.time_series_data import BarSeries
+from shinywaffle.utils.misc import ns_to_datetime
+
+MAGIC = b'SWBARS'
+VERSION = 1
+
+RECORD_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8')
+])
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('record_size', '<u4'),
+    ('count', '<u8'),
+    ('time_from', '<i8'),
+    ('time_to', '<i8'),
+    ('symbol', 'S32'),
+    ('interval', 'S16'),
+    ('reserved', 'V32')
+])
+
+
+class BarStoreHeader:
+
+    def __init__(self, symbol: str, interval: str, count: int, time_from: int, time_to: int):
+        """
+        Header of a bar store file
+
+        :param symbol: Symbol of the bars
+        :param interval: Bar interval, e.g. '1m' or '1d'
+        :param count: Number of bars in the store
+        :param time_from: Time of the first bar in nanoseconds from epoch
+        :param time_to: Time of the last bar in nanoseconds from epoch
+        """
+        self.symbol = symbol
+        self.interval = interval
+        self.count = count
+        self.time_from = time_from
+        self.time_to = time_to
+
+    @property
+    def datetime_from(self) -> datetime:
+        return ns_to_datetime(self.time_from)
+
+    @property
+    def datetime_to(self) -> datetime:
+        return ns_to_datetime(self.time_to)
+
+    def __repr__(self):
+        return f'BarStoreHeader(symbol={self.symbol}, interval={self.interval}, count={self.count}, ' \
+               f'from={self.datetime_from}, to={self.datetime_to})'
+
+
+class BarStoreError(Exception):
+    pass
+
+
+def write_bar_store(path: str, series: BarSeries, symbol: str = '', interval: str = '') -> BarStoreHeader:
+    """
+    Writes a BarSeries to a bar store file. The file is written next to the target and then moved in place, so
+    processes that have the old file open keep a consistent view of it.
+
+    :param path: Path of the bar store file
+    :param series: The bars to write
+    :param symbol: Symbol saved in the header
+    :param interval: Interval saved in the header
+    :return: The header that was written
+    """
+    times = series.time_index()
+    count = len(times)
+
+    records = np.empty(count, dtype=RECORD_DTYPE)
+    for field in RECORD_DTYPE.names:
+        records[field] = series.get(field)[::-1]
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['record_size'] = RECORD_DTYPE.itemsize
+    header['count'] = count
+    header['time_from'] = times[0] if count else 0
+    header['time_to'] = times[-1] if count else 0
+    header['symbol'] = symbol.encode()
+    header['interval'] = interval.encode()
+
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            header.tofile(f)
+            records.tofile(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return _parse_header(header[0])
+
+
+def _parse_header(header: np.void) -> BarStoreHeader:
+    return BarStoreHeader(symbol=header['symbol'].decode(),
+                          interval=header['interval'].decode(),
+                          count=int(header['count']),
+                          time_from=int(header['time_from']),
+                          time_to=int(header['time_to']))
+
+
+def read_bar_store_header(path: str) -> BarStoreHeader:
+    """
+    Reads and validates the header of a bar store file.
+    Raises BarStoreError if the file is not a bar store of a supported version or is truncated
+    """
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header[0]['magic'] != MAGIC:
+        raise BarStoreError(f'{path} is not a bar store file')
+
+    if header[0]['version'] != VERSION or header[0]['record_size'] != RECORD_DTYPE.itemsize:
+        raise BarStoreError(f'Unsupported bar store version {header[0]["version"]} in {path}')
+
+    parsed = _parse_header(header[0])
+    expected_size = HEADER_DTYPE.itemsize + parsed.count * RECORD_DTYPE.itemsize
+    if os.path.getsize(path) < expected_size:
+        raise BarStoreError(f'Bar store {path} is truncated')
+
+    return parsed
+
+
+def open_bar_store(path: str, id: Optional[uuid.UUID] = None) -> BarSeries:
+    """
+    Opens a bar store file as a read-only BarSeries backed by numpy.memmap. Nothing but the header is read when the
+    store is opened; the bar columns are strided views into the mapped records.
+
+    :param path: Path of the bar store file
+    :param id: uuid of the returned BarSeries
+    """
+    header = read_bar_store_header(path)
+    if header.count == 0:
+        return BarSeries(id=id)
+
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_DTYPE.itemsize, shape=(header.count,))
+    return BarSeries.from_arrays(time=records['time'],
+                                 open=records['open'],
+                                 high=records['high'],
+                                 low=records['low'],
+                                 close=records['close'],
+                                 volume=records['volume'],
+                                 id=id,
+                                 assume_sorted=True)
@@ -1,12 +1,59 @@
 from __future__ import annotations
 from shinywaffle.tools.api_link import APILink
 from shinywaffle.common.event.events import TimeSeriesEvent
+from shinywaffle.data.as_of import AsOfJoin
+from shinywaffle.data.streaming import StreamCursor
+from shinywaffle.data.time_series_data import TimeSeriesType
 from datetime import datetime
-from typing import List, TYPE_CHECKING
+from typing import List, Optional, Tuple, TYPE_CHECKING
 from abc import ABC, abstractmethod
+import numpy as np
 
 if TYPE_CHECKING:
     from shinywaffle.data.time_series_data import TimeSeries
+    from shinywaffle.common.assets import Asset
+
+
+class ReplayCursor:
+
+    """
+    Read cursor into a source TimeSeries used to replay the series incrementally.
+
+    The cursor holds the sorted time index of the series and the chronological position of the first data point
+    that has not been replayed yet. Advancing the cursor to a new time returns only the newly visible data points,
+    so the cost of each step does not grow with the length of the history.
+    """
+
+    # The replayed series are held in full, so the asset series are never trimmed
+    lookback = None
+
+    def __init__(self, series: TimeSeries, start_time_ns: int):
+        """
+        :param series: The source TimeSeries to replay
+        :param start_time_ns: Data points at or before the start time (nanoseconds from epoch) are never replayed
+        """
+        self.series = series
+        self.times = series.time_index()
+        self.position = int(np.searchsorted(self.times, start_time_ns, side='right'))
+
+    def advance(self, to_time_ns: int):
+        """
+        Moves the cursor past all data points with a time up to and including to_time_ns (nanoseconds from epoch).
+
+        :return: The data points between the previous and the new position in the same format as
+        TimeSeries.retrieve. Empty if no new data points are visible
+        """
+        start = self.position
+        if start == len(self.times) or self.times[start] > to_time_ns:
+            return []
+
+        stop = int(np.searchsorted(self.times, to_time_ns, side='right'))
+        self.position = stop
+        return self.series.between(start, stop)
+
+    def close(self) -> None:
+        """ Nothing to release, the replayed series is held by the context """
+        pass
 
 
 class DataProvider(ABC):
@@ -22,56 +69,118 @@ class DataProvider(ABC):
 
 class BacktestDataProvider(DataProvider):
 
-    def __init__(self, context, times: List[datetime]):
+    def __init__(self, context, times: np.ndarray):
+        """
+        :param times: The time steps of the backtest as int64 nanoseconds from epoch
+        """
         super().__init__(context)
         self.times = times
+        self.step = 0
+        self.replay = None
+        self.bar_series_ids = set()
         assert isinstance(self.assets, dict)
 
+    def make_replay(self) -> List[Tuple[TimeSeriesEvent, List[Tuple[ReplayCursor, TimeSeries]]]]:
+        """
+        Creates a ReplayCursor for every time series saved in the context and a StreamCursor for every time series
+        stream, paired with the asset's own TimeSeries object which is extended with the replayed data. The cursors
+        of each asset are grouped with the TimeSeriesEvent of the asset, which is reused every time step. The ids of
+        the asset bar series are kept in self.bar_series_ids to tell the events with new bars apart.
+        """
+        replay = []
+        for asset in self.assets.values():
+            bars = asset.data.get(series_type=TimeSeriesType.TYPE_ASSET_BARS)
+            self.bar_series_ids.update(series.uuid for series in bars)
+            series_cursors = [(ReplayCursor(series=series, start_time_ns=self.context.time_ns), asset.data.get(id=series.uuid))
+                              for series in self.context.time_series[asset.ticker].get()]
+            series_cursors += [(StreamCursor(source=source, start_time_ns=self.context.time_ns, lookback=self.lookback(asset)),
+                                asset.data.get(id=series_id))
+                               for source, series_id in self.context.time_series_streams[asset.ticker]]
+            replay.append((TimeSeriesEvent(asset), series_cursors))
+        return replay
+
+    def close(self) -> None:
+        """ Closes the cursors of the replay, which stops the prefetching of the time series streams """
+        if self.replay is not None:
+            for _, series_cursors in self.replay:
+                for cursor, _ in series_cursors:
+                    cursor.close()
+
+    def lookback(self, asset: Asset) -> Optional[int]:
+        """ The largest lookback of the strategies trading the asset, or None if any of them keeps all history """
+        lookbacks = [s.lookback for s in self.context.strategies.values() if asset.ticker in s.assets]
+        if not lookbacks or None in lookbacks:
+            return None
+        return max(lookbacks)
+
     def retrieve_time_series_data(self):
         """
-        Gathering a dictionary of the time series data for all the assets in the backtester "times" stores the 
-        historical report steps generated in the backtester. Every time this method is called, the first item is 
-        popped to advance the historical time. When all the items are popped, then the backtest stops.
+        Gathering the time series data for all the assets in the backtester. "times" stores the historical report
+        steps generated in the backtester. Every time this method is called, the next item is read to advance the
+        historical time. When all the items are read, then the backtest stops.
 
-        Creates a dict (time_series_data) which holds the keys 'current time' (popped time) and keys for each ticker
-        of the active assets. Each ticker key is a new dict with the time series data under each key.
+        Each time series is replayed through a ReplayCursor, so only the data points after the previous time and up
+        to and including the new time are read and appended to the asset's TimeSeries.
 
-        :return: dict with TimeSeriesEvents for each asset that has seen a new event
+        :return: list with TimeSeriesEvents for each asset that has seen a new event. The new_bars of an event is True
+        if the asset bars are among the new data
         """
 
         time_series_events = []
+        trimmed_series = []
 
-        try:
-            new_time = self.times.pop(0)
-        except IndexError:
+        if self.step == len(self.times):
+            self.close()
             raise BacktestCompleteException
-        else:
-            for asset in self.assets.values():
 
-                time_series: List[TimeSeries] = self.context.time_series[asset.ticker].get()
+        new_time = int(self.times[self.step])
+        self.step += 1
 
-                # Aggregating time series data to be used in event handler
-                # Retrieve method is called on the time series data which gets the time series data after
-                # the previous time and up to and including the latest
-                # popped time (new_time)
+        if self.replay is None:
+            self.replay = self.make_replay()
+            # An AsOfJoin shared from the context this context was copied from is only reused if it was made for
+            # the same time steps
+            if self.context.as_of is None or not np.array_equal(self.context.as_of.times, self.times):
+                self.context.as_of = AsOfJoin(self.context, self.times)
 
-                new_time_series_event = False
-                for series in time_series:
-                    retrieved_data = series.retrieve(self.context.time, new_time)
-                    asset_series: TimeSeries = asset.data.get(id=series.uuid)
-                    asset_series.extend(other=retrieved_data)
+        self.context.as_of.step = self.step - 1
+
+        if self.context.panel is not None:
+            self.context.panel.advance(to_time_ns=new_time)
 
-                    if retrieved_data:
-                        new_time_series_event = True
+        for time_series_event, series_cursors in self.replay:
 
-                # If there are any items in a list consisting of data series elements between the previous time and
-                # the new current time, then add a TimeSeriesEvent and break the loop for that asset, signaling that there is new time series data for the asset
-                # and trigger an event to evaluate the time series data in any trading strategy
-                if new_time_series_event:
-                    time_series_events.append(TimeSeriesEvent(asset))
+            # Aggregating time series data to be used in event handler
+            # The cursor of each series returns the time series data after the previous time and up to and
+            # including the new time
 
-            self.context.update_time(time=new_time)
-            return time_series_events
+            new_time_series_event = False
+            new_bars = False
+            for cursor, asset_series in series_cursors:
+                retrieved_data = cursor.advance(to_time_ns=new_time)
+                if retrieved_data:
+                    asset_series.extend(other=retrieved_data)
+                    if cursor.lookback is not None:
+                        trimmed_series.append((asset_series, cursor.lookback))
+                    new_time_series_event = True
+                    new_bars = new_bars or asset_series.uuid in self.bar_series_ids
+
+            # If there are any items in a list consisting of data series elements between the previous time and
+            # the new current time, then add a TimeSeriesEvent and break the loop for that asset, signaling that there is new time series data for the asset
+            # and trigger an event to evaluate the time series data in any trading strategy
+            if new_time_series_event:
+                time_series_event.new_bars = new_bars
+                time_series_events.append(time_series_event)
+
+        # The series are trimmed after the resamplers are updated, so no bar is dropped before it is resampled
+        for resampler in self.context.resamplers:
+            resampler.update()
+
+        for asset_series, lookback in trimmed_series:
+            asset_series.trim(lookback)
+
+        self.context.update_time(time=new_time)
+        return time_series_events
 
 
 class LiveDataProvider(DataProvider):
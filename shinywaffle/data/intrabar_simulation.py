@@ -1,89 +1,76 @@
-import random
 import numpy as np
-import math as m
+from typing import Optional, Union
 
 
-def generate_high_low_times(dt: float, total_t: float) -> tuple:
+def simulate_intrabar_paths(opens: Union[np.ndarray, float], highs: Union[np.ndarray, float],
+                            lows: Union[np.ndarray, float], closes: Union[np.ndarray, float], steps: int = 300,
+                            stdev_dampening: float = 20, sigma: Optional[Union[np.ndarray, float]] = None,
+                            rng: Optional[np.random.Generator] = None) -> np.ndarray:
     """
-    Function that generates normalized timestamps for when the bar high and low price point occurs within the bar.
-    0 = at the start
-    1 = at the end.
-
-    The function first determines whether or not the high or the low came first (random draw) and then generates the placement of the points accordingly.
-    The parameter boundary_distance determines the minimum normalized distance between the high and the low point.
+    Simulates a price path through each of a batch of bars in a few array operations.
+
+    Every path starts at the open, passes through the high and the low in a random order and ends at the close. The
+    times of the high and the low are two random, sorted steps strictly inside the bar. Between these four points the
+    path is a linear drift plus cumulative normal noise, pinned to zero at the points (a Brownian bridge), and the
+    result is clipped to [low, high].
+
+    :param opens: Open prices of the bars, a float or array of shape (m,). Likewise for highs, lows and closes
+    :param steps: Number of time steps of each path. The paths have steps + 1 prices
+    :param stdev_dampening: If sigma is not given, the standard deviation of the noise per step is the standard
+    deviation of open, high, low and close divided by stdev_dampening
+    :param sigma: Standard deviation of the noise per step, a float or array of shape (m,)
+    :param rng: numpy Generator used for all random draws. Pass a seeded Generator for reproducible paths
+    :return: Array of shape (m, steps + 1) with the simulated prices
     """
-    n = round(total_t/dt)
-    boundary_distance = 0.2
-    if 0 <= random.random() < 0.5:
-        # Bar low point comes before high point
-        low_t = min(n * boundary_distance, m.floor((n-1) * random.random()))
-        n -= low_t
-        high_t = low_t + min(n * (1-boundary_distance), m.floor((n-1) * random.random()))
-
-    else:
-        # High comes before high
-        high_t = min(n * boundary_distance, m.floor((n-1) * random.random()))
-        n -= high_t
-        low_t = high_t + min(n * (1-boundary_distance), m.floor((n-1) * random.random()))
-
-    low_t = low_t / round(total_t/dt)
-    high_t = high_t / round(total_t/dt)
-    return high_t, low_t
-
-
-def interp_price_with_noise(s_start, s_end, dt, total_t, sigma, constraints):
-    s = []
-    n = round(total_t/dt)
-    noise = np.random.normal(0., sigma, int(n))
-
-    min_constraint = min(constraints)
-    max_constraint = max(constraints)
-
-    for i in range(n):
-        if i == 0:
-            s_new = s_start
-        else:
-            s_new = s[-1] + (s_end - s_start) / n
-
-            if s_new + noise[i] > max_constraint:
-                s_new -= abs(noise[i])
-            elif s_new + noise[i] < min_constraint:
-                s_new += abs(noise[i])
-            else:
-                s_new += noise[i]
-        s.append(s_new)
-    return s
-
-
-def simulate_intrabar_data(bar, total_t, dt=0.01, stdev_dampening=20, sigma=None):
-
-    class PricePoint:
-        def __init__(self, value, T):
-            self.value = value
-            self.T = T
-
-        def __repr__(self):
-            return '{} at {}/1'.format(self.value, self.T)
-
-    if not sigma:
-        sigma = np.std([bar.low, bar.high, bar.close, bar.open]) / stdev_dampening
-
-    close_t = 1
-    open_t = 0
-    high_t, low_t = generate_high_low_times(dt, total_t)
-    price_points = sorted([PricePoint(bar.high, high_t),
-                           PricePoint(bar.low, low_t),
-                           PricePoint(bar.open, open_t),
-                           PricePoint(bar.close, close_t)
-                           ], key=lambda b: b.T)
-
-    s = []
-    for i in range(len(price_points)-1):
-        s_start = price_points[i].value
-        s_end = price_points[i+1].value
-        constraints = [bar.high, bar.low]
-
-        s += interp_price_with_noise(s_start, s_end, dt, total_t, sigma, constraints)
-
-    s.append(bar.close)
-    return s
\ No newline at end of file
+    if rng is None:
+        rng = np.random.default_rng()
+    if steps < 3:
+        raise ValueError('An intrabar path needs at least 3 steps')
+
+    opens, highs, lows, closes = (np.atleast_1d(np.asarray(a, dtype=float)) for a in (opens, highs, lows, closes))
+    m = len(opens)
+    if sigma is None:
+        sigma = np.std(np.stack([lows, highs, closes, opens]), axis=0) / stdev_dampening
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), (m,))
+
+    # Steps of the first and second extreme, 1 <= first < second <= steps - 1, and whether the low comes first
+    u = np.sort(rng.random((m, 2)), axis=1)
+    first = 1 + np.floor(u[:, 0] * (steps - 2)).astype(np.int64)
+    second = np.maximum(first + 1, 1 + np.floor(u[:, 1] * (steps - 1)).astype(np.int64))
+    low_first = rng.random(m) < 0.5
+    first_value = np.where(low_first, lows, highs)
+    second_value = np.where(low_first, highs, lows)
+
+    # Cumulative noise starting at 0 in the open
+    noise = rng.standard_normal((m, steps)) * sigma[:, None]
+    walk = np.zeros((m, steps + 1))
+    np.cumsum(noise, axis=1, out=walk[:, 1:])
+
+    # Segment of each step between the knots at 0, first, second and steps, and the fraction of the segment covered.
+    # left and right index the knots of each step in the flattened (m, 4) knot arrays
+    knots = np.stack([np.zeros(m, dtype=np.int64), first, second, np.full(m, steps)], axis=1)
+    k = np.arange(steps + 1)
+    left = (k > first[:, None]).astype(np.int64) + (k > second[:, None]) + 4 * np.arange(m)[:, None]
+    right = left + 1
+    flat_knots = knots.ravel()
+    fraction = (k - flat_knots[left]) / (flat_knots[right] - flat_knots[left])
+
+    def piecewise_linear(values: np.ndarray) -> np.ndarray:
+        """ Linear interpolation per row through the (m, 4) values at the knots """
+        values = values.ravel()
+        return values[left] + (values[right] - values[left]) * fraction
+
+    drift = piecewise_linear(np.stack([opens, first_value, second_value, closes], axis=1))
+    bridge = walk - piecewise_linear(walk[np.arange(m)[:, None], knots])
+    return np.clip(drift + bridge, lows[:, None], highs[:, None])
+
+
+def simulate_intrabar_data(bar, total_t, dt=0.01, stdev_dampening=20, sigma=None,
+                           rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Simulates the price path through a single bar, see simulate_intrabar_paths. The path has round(total_t / dt)
+    steps for each of the three segments between the open, the two extremes and the close
+    """
+    steps = 3 * round(total_t / dt)
+    return simulate_intrabar_paths(bar.open, bar.high, bar.low, bar.close, steps=steps,
+                                   stdev_dampening=stdev_dampening, sigma=sigma, rng=rng)[0]
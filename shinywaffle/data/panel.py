@@ -0,0 +1,140 @@
+from __future__ import annotations
+import copy
+import numpy as np
+from typing import Dict, List, TYPE_CHECKING
+from shinywaffle.data.time_series_data import BarSeries, TimeSeriesType
+
+if TYPE_CHECKING:
+    from shinywaffle.common.context import Context
+
+
+class BarPanel:
+
+    """
+    Aligned (time x asset) panel of the asset bars of all the assets in a context.
+
+    The panel has one shared, sorted time axis (int64 nanoseconds from epoch) and a 2-D float64 array of shape
+    (time, asset) for each of the fields open, high, low, close and volume. The asset columns are in the order of
+    context.assets. Entries where an asset has no bar at a time are NaN and False in self.valid.
+
+    The panel holds the same data the backtest replays, i.e. the bars after the context start time. During a backtest
+    the data provider moves self.position to the last row at or before the current time, so the whole universe
+    advances with one index increment per step. Strategies, the account and the broker read the current cross
+    section as vectors with current() and latest().
+
+    Creating a BarPanel registers it on the context. The panel arrays are read-only and are shared with copies of
+    the panel made by Context.copy.
+    """
+
+    fields = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, context: Context):
+        self.context = context
+        self.tickers: List[str] = list(context.assets.keys())
+        self.columns: Dict[str, int] = {ticker: j for j, ticker in enumerate(self.tickers)}
+
+        start = context.time_ns
+        asset_series = list()
+        for ticker in self.tickers:
+            series = context.time_series[ticker].get(series_type=TimeSeriesType.TYPE_ASSET_BARS)
+            if series and not isinstance(series[0], BarSeries):
+                raise TypeError(f'The asset bars of {ticker} must be a BarSeries to be added to a BarPanel')
+
+            if series:
+                times = series[0].time_index()
+                visible = slice(np.searchsorted(times, start, side='right'), len(times))
+                asset_series.append((times[visible], {f: series[0].get(f)[::-1][visible] for f in self.fields}))
+            else:
+                asset_series.append((np.empty(0, dtype=np.int64), None))
+
+        self.times = np.unique(np.concatenate([times for times, _ in asset_series] + [np.empty(0, dtype=np.int64)]))
+        shape = (len(self.times), len(self.tickers))
+        self.valid = np.zeros(shape, dtype=bool)
+        self._values = {field: np.full(shape, np.nan) for field in self.fields}
+
+        for j, (times, columns) in enumerate(asset_series):
+            if columns is None:
+                continue
+            rows = np.searchsorted(self.times, times)
+            self.valid[rows, j] = True
+            for field in self.fields:
+                self._values[field][rows, j] = columns[field]
+
+        # Row of the latest valid bar at or before each row for each asset, -1 before an asset's first bar
+        last_valid = np.where(self.valid, np.arange(len(self.times))[:, None], -1)
+        self._last_valid = np.maximum.accumulate(last_valid, axis=0) if len(self.times) else last_valid
+        self._asset_range = np.arange(len(self.tickers))
+
+        for array in (self.times, self.valid, self._last_valid, *self._values.values()):
+            array.setflags(write=False)
+
+        self.position = -1
+        context.panel = self
+
+    def __deepcopy__(self, memo):
+        new = copy.copy(self)
+        memo[id(self)] = new
+        new.context = copy.deepcopy(self.context, memo)
+        return new
+
+    def __len__(self):
+        return len(self.times)
+
+    def advance(self, to_time_ns: int) -> int:
+        """
+        Moves the panel position to the last row with a time at or before to_time_ns (nanoseconds from epoch).
+        :return: The number of rows the position moved
+        """
+        previous = self.position
+        n = len(self.times)
+        if previous + 1 == n or self.times[previous + 1] > to_time_ns:
+            return 0
+
+        if previous + 2 == n or self.times[previous + 2] > to_time_ns:
+            self.position = previous + 1
+        else:
+            self.position = int(np.searchsorted(self.times, to_time_ns, side='right')) - 1
+
+        return self.position - previous
+
+    def get(self, field: str) -> np.ndarray:
+        """ The full (time, asset) array of a field """
+        return self._values[field]
+
+    def current(self, field: str) -> np.ndarray:
+        """
+        Zero-copy view of the field for all assets at the current position. Assets without a bar at the current
+        time are NaN, see current_valid()
+        """
+        if self.position < 0:
+            return np.full(len(self.tickers), np.nan)
+        return self._values[field][self.position]
+
+    def current_valid(self) -> np.ndarray:
+        """ Boolean vector of the assets that have a bar at the current position """
+        if self.position < 0:
+            return np.zeros(len(self.tickers), dtype=bool)
+        return self.valid[self.position]
+
+    def latest(self, field: str) -> np.ndarray:
+        """
+        The field of the latest bar at or before the current position for all assets, i.e. the cross section of
+        asset.bars[0]. NaN for assets that have not had a bar yet
+        """
+        if self.position < 0:
+            return np.full(len(self.tickers), np.nan)
+        rows = self._last_valid[self.position]
+        return np.where(rows >= 0, self._values[field][rows, self._asset_range], np.nan)
+
+    def latest_value(self, ticker: str, field: str) -> float:
+        """ The field of the latest bar at or before the current position for a single asset """
+        j = self.columns[ticker]
+        row = self._last_valid[self.position, j] if self.position >= 0 else -1
+        return self._values[field][row, j] if row >= 0 else np.nan
+
+    def history(self, field: str, window: int) -> np.ndarray:
+        """
+        Zero-copy view of the last window rows of the field up to and including the current position, oldest first.
+        Fewer rows are returned if the backtest has not advanced window rows yet
+        """
+        return self._values[field][max(self.position + 1 - window, 0):self.position + 1]
@@ -0,0 +1,159 @@
+"""
+Resampling of bars to a longer interval, e.g. 1 minute bars to 15 minute, 1 hour or 4 hour bars.
+
+The bars of the base series are grouped in buckets of the new interval, counted from an origin time. By default the
+origin is epoch, except for intervals of whole weeks, which are counted from the first Monday after epoch so that
+weeks run from Monday to Sunday. Each bucket becomes one bar with the open of the first bar, the highest high, the
+lowest low, the close of the last bar and the summed volume. The time of the new bar is the start of its bucket, so
+bar times stay the opening times of the bars.
+
+resample() converts a whole BarSeries at once. A Resampler keeps a resampled series up to date while bars are
+appended to the base series during a backtest, so one loaded series can feed several timeframes.
+"""
+from __future__ import annotations
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, Optional, TYPE_CHECKING
+from shinywaffle.data.time_series_data import BarSeries
+from shinywaffle.utils.misc import EPOCH, datetime_to_ns
+
+if TYPE_CHECKING:
+    from shinywaffle.common.context import Context
+
+
+# Epoch is a Thursday. Buckets of whole weeks are counted from the Monday after it
+WEEK_ORIGIN = datetime(1970, 1, 5)
+
+
+def _to_ns(interval: timedelta) -> int:
+    ns = (interval.days * 86400 + interval.seconds) * 10 ** 9 + interval.microseconds * 1000
+    if ns <= 0:
+        raise ValueError('The resampling interval must be positive')
+    return ns
+
+
+def resample_columns(columns: Dict[str, np.ndarray], interval_ns: int, origin_ns: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Reduces chronological bar columns to one row per bucket of interval_ns nanoseconds counted from origin_ns.
+
+    :param columns: Dictionary with the columns time (int64 ns), open, high, low, close and volume, oldest first
+    :param interval_ns: Length of the buckets in nanoseconds
+    :param origin_ns: Time in nanoseconds from epoch where the first bucket starts
+    :return: Dictionary with the same columns, one row per bucket that has bars, oldest first
+    """
+    times = columns['time']
+    if len(times) == 0:
+        return {field: np.asarray(column)[:0] for field, column in columns.items()}
+
+    buckets = (times - origin_ns) // interval_ns
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.append(starts[1:], len(times)) - 1
+
+    return {
+        'time': buckets[starts] * interval_ns + origin_ns,
+        'open': columns['open'][starts],
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'close': columns['close'][ends],
+        'volume': np.add.reduceat(columns['volume'], starts),
+    }
+
+
+def _default_origin(interval: timedelta) -> datetime:
+    return WEEK_ORIGIN if interval % timedelta(weeks=1) == timedelta(0) else EPOCH
+
+
+def resample(series: BarSeries, interval: timedelta, origin: Optional[datetime] = None) -> BarSeries:
+    """
+    Resamples a BarSeries to bars of a longer interval. The last bar covers whatever base bars its bucket has, even
+    if the bucket is not complete.
+
+    :param series: The base BarSeries
+    :param interval: Interval of the resampled bars
+    :param origin: Time where the buckets are counted from. The default, epoch, puts the buckets on whole hours
+    and days in UTC. Intervals of whole weeks default to WEEK_ORIGIN, a Monday
+    :return: New BarSeries with the resampled bars
+    """
+    if origin is None:
+        origin = _default_origin(interval)
+    columns = {field: series.get(field)[::-1] for field in BarSeries.fields}
+    resampled = resample_columns(columns, _to_ns(interval), datetime_to_ns(origin))
+    return BarSeries.from_arrays(**resampled, assume_sorted=True)
+
+
+class Resampler:
+
+    """
+    Keeps a resampled BarSeries up to date with a base BarSeries that is appended to, e.g. the bars of an asset
+    during a backtest.
+
+    Every call to update() only reduces the base bars appended since the previous call together with the bars of
+    the bucket that was not complete yet. A resampled bar is appended to self.series when its bucket is complete,
+    which is when a base bar in a later bucket arrives, or when base_interval is given and the last base bar ends at
+    or after the end of the bucket. The resampled series therefore never holds a bar that changes later.
+
+    If a context is given, the Resampler registers itself on the context and the backtest data provider updates it
+    every time step after the asset series are extended.
+
+    The base series may be trimmed between updates. If the trimmed bars include bars of the bucket that was not
+    complete yet, that bucket is resampled from the bars that are left.
+    """
+
+    def __init__(self, source: BarSeries, interval: timedelta, base_interval: Optional[timedelta] = None,
+                 origin: Optional[datetime] = None, context: Optional[Context] = None):
+        """
+        :param source: The base BarSeries
+        :param interval: Interval of the resampled bars
+        :param base_interval: Interval of the base bars. Lets a bucket be completed by its own last bar
+        :param origin: Time where the buckets are counted from. Defaults as in resample()
+        :param context: Context to register the Resampler on
+        """
+        self.source = source
+        self.interval = interval
+        self.interval_ns = _to_ns(interval)
+        self.base_interval_ns = _to_ns(base_interval) if base_interval is not None else None
+        self.origin_ns = datetime_to_ns(origin if origin is not None else _default_origin(interval))
+        self.series = BarSeries()
+
+        # Number of bars appended to the source, including the bars trimmed from it since, before the first bar that
+        # is not part of a completed resampled bar
+        self.position = 0
+
+        if context is not None:
+            context.resamplers.append(self)
+
+        self.update()
+
+    def update(self) -> int:
+        """
+        Resamples the base bars appended since the last update.
+        :return: The number of resampled bars appended to self.series
+        """
+        n = len(self.source)
+        start = max(self.position - self.source.trimmed, 0)
+        if start == n:
+            return 0
+
+        visible = slice(start, n)
+        columns = {field: self.source.get(field)[::-1][visible] for field in BarSeries.fields}
+        resampled = resample_columns(columns, self.interval_ns, self.origin_ns)
+
+        # The last bucket is complete only if the last base bar reaches the end of it
+        complete = len(resampled['time']) - 1
+        if self.base_interval_ns is not None and \
+                columns['time'][-1] + self.base_interval_ns >= resampled['time'][-1] + self.interval_ns:
+            complete += 1
+
+        if complete == 0:
+            return 0
+
+        if complete == len(resampled['time']):
+            self.position = self.source.trimmed + n
+        else:
+            first_pending = resampled['time'][-1]
+            self.position = self.source.trimmed + start + int(np.searchsorted(columns['time'], first_pending,
+                                                                                side='left'))
+
+        self.series.extend(BarSeries.from_arrays(**{field: column[:complete] for field, column in resampled.items()},
+                                                 assume_sorted=True))
+        return complete
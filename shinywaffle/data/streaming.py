@@ -0,0 +1,237 @@
+"""
+Streaming of bar data that is read in chunks instead of being loaded in full.
+
+A ChunkSource reads a bar history as consecutive BarSeries chunks, oldest first, e.g. one month of minute bars at a
+time. Saving a source on the context with Context.save_time_series_stream lets the backtest data provider replay it
+through a StreamCursor. The cursor replays one chunk while the next one is read on a background thread, and the
+asset's series is trimmed to the lookback declared by the strategies trading the asset. The memory used is then
+bounded by the chunk size and the lookback instead of the length of the history.
+"""
+from __future__ import annotations
+import queue
+import threading
+import numpy as np
+import pandas as pd
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional
+from shinywaffle.data.bar_provider import BarProvider
+from shinywaffle.data.bar_store import open_bar_store
+from shinywaffle.data.time_series_data import BarSeries
+
+
+class ChunkSource(ABC):
+
+    """
+    Base class for sources of bar data read in chunks. Implementations yield the bars after a start time as
+    BarSeries chunks in chronological order, each chunk newer than the previous one
+    """
+
+    @abstractmethod
+    def chunks(self, start_time_ns: int) -> Iterator[BarSeries]:
+        """
+        :param start_time_ns: Bars at or before the start time (nanoseconds from epoch) are skipped
+        :return: Iterator over the chunks of the bars after start_time
+        """
+        pass
+
+
+class BarStoreChunkSource(ChunkSource):
+
+    """
+    Reads a bar store file (see shinywaffle.data.bar_store) in chunks of chunk_size bars. The store is memory-mapped
+    and each chunk is copied out of the mapping, so the disk is read when the chunk is fetched and not while it is
+    replayed
+    """
+
+    def __init__(self, path: str, chunk_size: int = 100_000):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    def chunks(self, start_time_ns: int) -> Iterator[BarSeries]:
+        store = open_bar_store(self.path)
+        start = int(np.searchsorted(store.time_index(), start_time_ns, side='right'))
+        for position in range(start, len(store), self.chunk_size):
+            chunk = store.between(position, min(position + self.chunk_size, len(store)))
+            yield BarSeries.from_arrays(**{field: np.array(chunk.get(field)[::-1]) for field in BarSeries.fields},
+                                        assume_sorted=True)
+
+
+class CsvChunkSource(ChunkSource):
+
+    """
+    Reads a bar csv file with the same columns as BarProvider in chunks of chunk_size rows. The rows of the file
+    must be in chronological order
+    """
+
+    def __init__(self, path: str, date_string_format: str, chunk_size: int = 100_000):
+        self.path = path
+        self.date_string_format = date_string_format
+        self.chunk_size = chunk_size
+
+    def chunks(self, start_time_ns: int) -> Iterator[BarSeries]:
+        start = start_time_ns
+        previous = None
+        for df in pd.read_csv(self.path, chunksize=self.chunk_size):
+            chunk = BarProvider.from_frame(df, self.date_string_format)
+            times = chunk.time_index()
+            if previous is not None and len(times) and times[0] <= previous:
+                raise ValueError(f'The rows of {self.path} must be in chronological order to be read in chunks')
+            if len(times):
+                previous = times[-1]
+
+            visible = int(np.searchsorted(times, start, side='right'))
+            if visible < len(times):
+                yield chunk.between(visible, len(times))
+
+
+class Prefetcher:
+
+    """
+    Iterates over an iterator on a background thread, keeping up to size items read ahead in a queue. Exceptions
+    raised by the iterator are raised again from the thread iterating over the Prefetcher, after which the Prefetcher
+    is exhausted.
+
+    close() stops the thread before the iterator is exhausted, e.g. when a backtest ends before its stream does. It
+    drops the items read ahead, closes the iterator and joins the thread, so no thread or item is left behind.
+    """
+
+    _done = object()
+
+    # Seconds the thread waits to put an item in a full queue before it checks again whether it has been closed
+    _put_timeout = 0.1
+
+    def __init__(self, iterator: Iterator, size: int = 1):
+        self._queue = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(iterator,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        """ Puts an item in the queue unless the Prefetcher is closed first. Returns False if it is closed """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=self._put_timeout)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self, iterator: Iterator) -> None:
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    break
+            else:
+                self._put(self._done)
+        except BaseException as e:
+            self._put(e)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    def close(self) -> None:
+        """ Stops the thread, drops the items read ahead and waits for the thread to finish """
+        self._stop.set()
+        while self._thread.is_alive():
+            self._drain()
+            self._thread.join(timeout=self._put_timeout)
+        self._drain()
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._stop.is_set():
+            raise StopIteration
+
+        item = self._queue.get()
+        if item is self._done:
+            self._queue.put(item)
+            raise StopIteration
+        if isinstance(item, BaseException):
+            self._queue.put(self._done)
+            raise item
+        return item
+
+
+class StreamCursor:
+
+    """
+    Read cursor into a ChunkSource with the same interface as ReplayCursor.
+
+    Besides the asset series, up to three chunks are held while the cursor is replaying: the chunk being replayed,
+    the chunk read ahead in the queue of the Prefetcher and the chunk the Prefetcher is reading or waiting to queue.
+    close() releases the chunks and stops the Prefetcher. It is called when the cursor is exhausted and by the
+    backtest data provider when the backtest ends.
+
+    :param lookback: If not None, the asset series is trimmed to the last lookback bars after it is extended
+    """
+
+    def __init__(self, source: ChunkSource, start_time_ns: int, lookback: Optional[int] = None,
+                 prefetch: bool = True):
+        chunks = source.chunks(start_time_ns)
+        self.chunks = Prefetcher(chunks) if prefetch else iter(chunks)
+        self.lookback = lookback
+        self.chunk = BarSeries()
+        self.times = self.chunk.time_index()
+        self.position = 0
+        self.exhausted = False
+
+    def close(self) -> None:
+        """ Stops reading the source and releases the chunks """
+        if isinstance(self.chunks, Prefetcher):
+            self.chunks.close()
+        else:
+            close = getattr(self.chunks, 'close', None)
+            if close is not None:
+                close()
+        self.chunk = BarSeries()
+        self.times = self.chunk.time_index()
+        self.position = 0
+        self.exhausted = True
+
+    def _next_chunk(self) -> bool:
+        for chunk in self.chunks:
+            if len(chunk):
+                self.chunk = chunk
+                self.times = chunk.time_index()
+                self.position = 0
+                return True
+        self.close()
+        return False
+
+    def advance(self, to_time_ns: int):
+        """
+        Moves the cursor past all bars with a time up to and including to_time_ns (nanoseconds from epoch), reading
+        new chunks as needed.
+
+        :return: The bars between the previous and the new position as a BarSeries. Empty if no new bars are visible
+        """
+        pieces: List[BarSeries] = []
+        while not self.exhausted:
+            if self.position == len(self.times) and not self._next_chunk():
+                break
+            if self.times[self.position] > to_time_ns:
+                break
+
+            stop = int(np.searchsorted(self.times, to_time_ns, side='right'))
+            pieces.append(self.chunk.between(self.position, stop))
+            self.position = stop
+
+        if not pieces:
+            return []
+        if len(pieces) == 1:
+            return pieces[0]
+
+        retrieved = BarSeries()
+        for piece in pieces:
+            retrieved.extend(piece)
+        return retrieved
@@ -1,9 +1,13 @@
 from __future__ import annotations
 from datetime import datetime
 from shinywaffle.common.context import Context
+from shinywaffle.data.bar import Bar, BarView
+from shinywaffle.utils.misc import datetime_to_ns, datetimes_to_ns
 from collections import defaultdict
-from typing import List, Optional
+from collections.abc import Sequence
+from typing import List, Optional, Tuple, Union
 from enum import Enum
+import numpy as np
 import uuid
 
 
@@ -22,69 +26,392 @@ class TimeSeriesType(Enum):
     TYPE_ASSOCIATED = 'associated'
 
 
+class RecentFirstView(Sequence):
+
+    """
+    Read-only view of a chronologically ordered list that is indexed with the most recent item at index 0.
+    The view follows the list as it grows, so it never has to be rebuilt when data is appended.
+    """
+
+    __slots__ = ('_items',)
+
+    def __init__(self, items: list):
+        self._items = items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, i):
+        n = len(self._items)
+        if isinstance(i, slice):
+            return [self._items[p] for p in range(n - 1, -1, -1)[i]]
+
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('TimeSeries index out of range')
+        return self._items[n - 1 - i]
+
+    def __repr__(self):
+        return repr(self[:])
+
+
 class TimeSeries:
 
     """
     A container class for time series data.
 
-    Calling the ordinary list methods on self returns the methods called on the data in self.data
+    The data points are stored in chronological order in an append-only list, but the series is indexed with the
+    most recent data point at index 0. Calling the ordinary list methods on self returns the methods called on the
+    data in that order.
+
+    Reading an attribute of the data points from the series, e.g. series.close, returns a view of that attribute for
+    all data points, most recent first. The view is built the first time the attribute is read and is then cached
+    and extended as data is appended, so only the attributes that are actually read cost anything.
 
     """
 
     def __init__(self, id: Optional[uuid.UUID] = None):
-        self.data = list()
+        self._data = list()
+        self._attributes = dict()
         if id is not None:
             self.uuid = id
         else:
             self.uuid = uuid.uuid4()
 
     def __len__(self):
-        return len(self.data)
+        return len(self._data)
 
     def __getitem__(self, i):
-        return self.data[i]
+        n = len(self._data)
+        if isinstance(i, slice):
+            return [self._data[p] for p in range(n - 1, -1, -1)[i]]
+
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('TimeSeries index out of range')
+        return self._data[n - 1 - i]
 
     def __iter__(self):
-        for d in self.data:
+        for d in reversed(self._data):
             yield d
 
-    def extend(self, other):
-        if type(other) == list:
-            other.reverse()
-            for data_point in other:
-                self.data.insert(0, data_point)
-        if other:
-            self.update_attributes(other[0])
+    def __getattr__(self, name):
+        # Only called when the attribute is not found on the object, i.e. the first time a data point attribute is
+        # read. The view is saved on the object so later reads do not come through here
+        if name.startswith('_') or not self.__dict__.get('_data'):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        if not hasattr(self._data[-1], name):
+            raise AttributeError(f"'{type(self).__name__}' object and its data points have no attribute '{name}'")
+
+        values = [getattr(d, name) for d in self._data]
+        self._attributes[name] = values
+        view = RecentFirstView(values)
+        setattr(self, name, view)
+        return view
+
+    @property
+    def data(self) -> list:
+        """ The data points of the series as a new list, most recent first """
+        return self._data[::-1]
+
+    def extend(self, other: list):
+        """
+        Appends data points that are newer than the data already in the series. other is ordered most recent first,
+        as returned by retrieve. The cost is proportional to the number of appended data points only.
+        """
+        if not other:
+            return
+
+        new_data = other[::-1]
+        self._data.extend(new_data)
+        for attrib, values in self._attributes.items():
+            values.extend(getattr(d, attrib) for d in new_data)
 
     def retrieve(self, from_time: datetime, to_time: datetime) -> list:
-        return [d for d in self.data if from_time < d.time <= to_time]
+        from_time_ns, to_time_ns = datetime_to_ns(from_time), datetime_to_ns(to_time)
+        return [d for d in reversed(self._data) if from_time_ns < datetime_to_ns(d.time) <= to_time_ns]
+
+    def time_index(self) -> np.ndarray:
+        """
+        Returns the time of each data point as int64 nanoseconds from epoch, oldest first.
+        Raises ValueError if the data is not ordered with the most recent data point first
+        """
+        times = datetimes_to_ns(d.time for d in self._data)
+        if np.any(times[1:] < times[:-1]):
+            raise ValueError('TimeSeries data must be ordered with the most recent data point first')
+        return times
+
+    def between(self, start: int, stop: int) -> list:
+        """
+        Returns the data points from chronological position start up to, but not including, stop (positions are
+        counted from the oldest data point as in time_index). The data points are returned most recent first.
+        """
+        return self._data[start:stop][::-1]
 
     def set(self, data: list) -> None:
 
         """
-        Setting self.data equals to the data argument.
-        In addition this method creates attributes for the attributes for the items in the data list
-        :param data: List of data points (not necessarily the class below)
+        Setting the data of the series equal to the data argument.
+        Any attribute views built for the previous data are discarded and built again when they are read
+        :param data: List of data points (not necessarily the class below), most recent first
         """
-        self.data = data
-        self.update_attributes(self.data[0])
+        self._data = data[::-1]
+        for attrib in self._attributes.keys():
+            self.__dict__.pop(attrib, None)
+        self._attributes = dict()
 
     def update_attributes(self, data_point):
-        """ Sets member variables on the TimeSeries object for each of the member variables of the member variables
-        in the TimeSeries data objects. The member variables on the TimeSeries object returns the list of all the
-        data object's same member variables"""
+        """ Builds the attribute views on the TimeSeries object for each of the member variables of data_point up
+        front instead of when they are first read"""
         attributes = [a for a in dir(data_point) if not a.startswith("_")
                       and a not in dir("__builtins__")]
 
         for attrib in attributes:
-            setattr(self, attrib, [getattr(d, attrib) for d in self.data])
+            getattr(self, attrib)
 
     def get(self, attrib_name) -> list:
         """
         :param attrib_name: name of the parameter to be fetched
-        :return: returns a list of the data parameter for all objects in self.data
+        :return: returns a list of the data parameter for all data points, most recent first
         """
-        return [getattr(i, attrib_name) for i in self.data]
+        return [getattr(d, attrib_name) for d in reversed(self._data)]
+
+
+def _column_view(field: str) -> property:
+    """
+    Property returning a zero-copy view of a BarSeries column with the most recent value at index 0. The view is
+    created when it is first read and cached until the columns change
+    """
+    def view(self) -> np.ndarray:
+        try:
+            return self._views[field]
+        except KeyError:
+            column_view = self._views[field] = self._columns[field][::-1]
+            return column_view
+
+    return property(view, doc=f'{field} of all bars in the series, most recent first')
+
+
+class BarSeries(TimeSeries):
+
+    """
+    Columnar container class for bar data.
+
+    Each bar field is stored in its own typed numpy array in chronological order: time as int64 nanoseconds from
+    epoch and open, high, low, close and volume as float64. The field attributes (series.close, series.time etc.)
+    are zero-copy views of these arrays with the most recent value at index 0, the same ordering as TimeSeries.
+    Indexing and iterating the series returns Bar objects so that existing strategies keep working.
+
+    The arrays are append-only buffers with spare capacity that is doubled when it runs out, so extending the
+    series costs amortised O(1) per appended bar.
+    """
+
+    fields = {
+        'time': np.int64,
+        'open': np.float64,
+        'high': np.float64,
+        'low': np.float64,
+        'close': np.float64,
+        'volume': np.float64
+    }
+
+    min_capacity = 256
+
+    time = _column_view('time')
+    open = _column_view('open')
+    high = _column_view('high')
+    low = _column_view('low')
+    close = _column_view('close')
+    volume = _column_view('volume')
+
+    def __init__(self, id: Optional[uuid.UUID] = None):
+        if id is not None:
+            self.uuid = id
+        else:
+            self.uuid = uuid.uuid4()
+        self._buffers = {field: np.empty(0, dtype=dtype) for field, dtype in self.fields.items()}
+        self._length = 0
+        self._columns = dict(self._buffers)
+        self._views = dict()
+
+        # Number of bars dropped from the start of the series by trim()
+        self.trimmed = 0
+
+    @classmethod
+    def from_arrays(cls, time: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                    volume: np.ndarray, id: Optional[uuid.UUID] = None, assume_sorted: bool = False) -> BarSeries:
+        """
+        Creates a BarSeries from one array per bar field. The arrays must be of equal length and time must be given
+        as nanoseconds from epoch. Arrays that already have the field dtype are used without copying.
+
+        :param assume_sorted: Skip checking that the arrays are in chronological order. This avoids reading the
+        whole time array, which matters for memory-mapped data
+        """
+        series = cls(id=id)
+        columns = {'time': time, 'open': open, 'high': high, 'low': low, 'close': close, 'volume': volume}
+        series._set_columns(columns, assume_sorted=assume_sorted)
+        return series
+
+    @classmethod
+    def from_bar_store(cls, path: str, id: Optional[uuid.UUID] = None) -> BarSeries:
+        """ Opens a binary bar store file as a read-only, memory-mapped BarSeries. See shinywaffle.data.bar_store """
+        from shinywaffle.data.bar_store import open_bar_store
+        return open_bar_store(path=path, id=id)
+
+    @classmethod
+    def from_bars(cls, bars: List[Bar], id: Optional[uuid.UUID] = None) -> BarSeries:
+        """ Creates a BarSeries from a list of Bar objects in any order """
+        series = cls(id=id)
+        series.set(bars)
+        return series
+
+    @staticmethod
+    def _bars_to_columns(bars: List[Bar]) -> dict:
+        return {
+            'time': datetimes_to_ns(b.time for b in bars),
+            'open': np.array([b.open for b in bars], dtype=np.float64),
+            'high': np.array([b.high for b in bars], dtype=np.float64),
+            'low': np.array([b.low for b in bars], dtype=np.float64),
+            'close': np.array([b.close for b in bars], dtype=np.float64),
+            'volume': np.array([b.volume for b in bars], dtype=np.float64)
+        }
+
+    @staticmethod
+    def _sort_columns(columns: dict) -> dict:
+        """ Sorts the columns chronologically if they are not already sorted """
+        if np.any(columns['time'][1:] < columns['time'][:-1]):
+            order = np.argsort(columns['time'], kind='stable')
+            columns = {field: column[order] for field, column in columns.items()}
+        return columns
+
+    def _set_columns(self, columns: dict, assume_sorted: bool = False) -> None:
+        """ Sets the columns of the series, casting to the field dtypes and sorting chronologically if needed """
+        columns = {field: np.asarray(columns[field], dtype=dtype) for field, dtype in self.fields.items()}
+        if any(c.shape != columns['time'].shape for c in columns.values()):
+            raise ValueError('All bar fields must be arrays of equal length')
+
+        self._buffers = columns if assume_sorted else self._sort_columns(columns)
+        self._length = len(self._buffers['time'])
+        self._columns = dict(self._buffers)
+        self._views = dict()
+        self.trimmed = 0
+
+    def _row(self, position: int) -> BarView:
+        """ Returns a BarView of the chronological position in the columns """
+        return BarView(self._columns, position)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        n = self._length
+        if isinstance(i, slice):
+            return [self._row(p) for p in range(n - 1, -1, -1)[i]]
+
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('BarSeries index out of range')
+        return self._row(n - 1 - i)
+
+    def __iter__(self):
+        for position in range(self._length - 1, -1, -1):
+            yield self._row(position)
+
+    @property
+    def data(self) -> List[BarView]:
+        """ The bars of the series as a list of Bar objects, most recent first """
+        return list(self)
+
+    def extend(self, other: Union[BarSeries, List[Bar]]):
+        """
+        Appends bars that are newer than the bars already in the series. If the buffers are full, they are
+        reallocated with double the capacity.
+        """
+        if isinstance(other, BarSeries):
+            columns = other._columns
+        elif other:
+            columns = self._sort_columns(self._bars_to_columns(other))
+        else:
+            return
+
+        n = self._length
+        k = len(columns['time'])
+        capacity = len(self._buffers['time'])
+        if n + k > capacity:
+            capacity = max(2 * capacity, n + k, self.min_capacity)
+            for field, dtype in self.fields.items():
+                buffer = np.empty(capacity, dtype=dtype)
+                buffer[:n] = self._buffers[field][:n]
+                self._buffers[field] = buffer
+
+        for field in self.fields.keys():
+            self._buffers[field][n:n + k] = columns[field]
+
+        self._length = n + k
+        self._columns = {field: buffer[:n + k] for field, buffer in self._buffers.items()}
+        self._views = dict()
+
+    def trim(self, length: int) -> None:
+        """
+        Drops the oldest bars of the series, keeping at least the last length bars. The bars are only moved once
+        more than twice length bars are held, so the cost of trimming after every extend is amortised O(1) per bar.
+        The kept bars are copied to new buffers, so views and BarViews handed out earlier stay valid. The number of
+        dropped bars is added to self.trimmed, so positions counted from the start of the series can be converted to
+        positions in the kept bars.
+        """
+        n = self._length
+        if n <= 2 * length:
+            return
+
+        capacity = max(2 * length, self.min_capacity)
+        for field, dtype in self.fields.items():
+            buffer = np.empty(capacity, dtype=dtype)
+            buffer[:length] = self._buffers[field][n - length:n]
+            self._buffers[field] = buffer
+
+        self._length = length
+        self.trimmed += n - length
+        self._columns = {field: buffer[:length] for field, buffer in self._buffers.items()}
+        self._views = dict()
+
+    def retrieve(self, from_time: datetime, to_time: datetime) -> List[BarView]:
+        """ Returns the bars with from_time < bar.time <= to_time, most recent first """
+        times = self._columns['time']
+        start = np.searchsorted(times, datetime_to_ns(from_time), side='right')
+        stop = np.searchsorted(times, datetime_to_ns(to_time), side='right')
+        return [self._row(p) for p in range(stop - 1, start - 1, -1)]
+
+    def time_index(self) -> np.ndarray:
+        """ Returns a view of the time column as int64 nanoseconds from epoch, oldest first """
+        return self._columns['time']
+
+    def between(self, start: int, stop: int) -> BarSeries:
+        """
+        Returns a BarSeries with zero-copy views of the bars from chronological position start up to, but not
+        including, stop
+        """
+        series = BarSeries(id=self.uuid)
+        series._set_columns({field: column[start:stop] for field, column in self._columns.items()}, assume_sorted=True)
+        return series
+
+    def set(self, data: List[Bar]) -> None:
+        """ Setting the columns of the series from a list of Bar objects in any order """
+        self._set_columns(self._bars_to_columns(data))
+
+    def update_attributes(self, data_point=None):
+        """ The field attributes are views of the columns and are always up to date """
+        pass
+
+    def get(self, attrib_name) -> np.ndarray:
+        """
+        :param attrib_name: name of the bar field to be fetched
+        :return: returns a view of the field for all bars in the series, most recent first
+        """
+        return getattr(self, attrib_name)
 
 
 class TimeSeriesContainer:
@@ -112,11 +439,17 @@ class TimeSeriesContainer:
         """
         Class can either be initialized with or without a list of TimeSeries objects
 
-        self._time_series is a dict with the keys equal to the TimeSeriesType enum types and values are a list
-        of TimeSeries
+        self._time_series is a dict with the keys equal to the TimeSeriesType enum types and values are a tuple
+        of TimeSeries. The tuples are replaced, not mutated, when a series is added.
+        self._by_id maps the uuid of each TimeSeries to the series and its type
+        self._all is a tuple of all TimeSeries grouped by type
 
+        The lookups are done on every step of a backtest, so they are kept O(1) and without allocations by building
+        the indexes in add.
         """
-        self._time_series = defaultdict(lambda: list())
+        self._time_series = dict()
+        self._by_id = dict()
+        self._all = tuple()
 
     def add(self, time_series: TimeSeries, series_type: TimeSeriesType):
         """ Adds a named TimeSeries object to the DataSeriesContainer object"""
@@ -129,33 +462,36 @@ class TimeSeriesContainer:
         if series_type == TimeSeriesType.TYPE_ASSET_BARS and self.get(series_type=TimeSeriesType.TYPE_ASSET_BARS):
             raise AttributeError('Time series of type TimeSeriesType.TYPE_ASSET_BARS already exists in the asset.')
 
-        self._time_series[series_type].append(time_series)
+        self._time_series[series_type] = self._time_series.get(series_type, tuple()) + (time_series,)
+        self._by_id[time_series.uuid] = (time_series, series_type)
+        self._all = tuple(s for saved_series in self._time_series.values() for s in saved_series)
 
-    def get(self, series_type: Optional[TimeSeriesType] = None, id: uuid.UUID = None) -> List[TimeSeries]:
-        """
-        :return: A list of tuples of the name of the attribute and the attribute object, for all attributes of type
-        TimeSeries
+    def get(self, series_type: Optional[TimeSeriesType] = None,
+            id: uuid.UUID = None) -> Union[Tuple[TimeSeries, ...], TimeSeries]:
         """
-        #return [getattr(self, s) for s in dir(self) if isinstance(getattr(self, s), TimeSeries)]
+        :return: The TimeSeries with the given id if id is provided. Otherwise a tuple of all the TimeSeries of the
+        given type, or of all types if no type is provided
 
-        series = list()
-        if series_type is not None:
-            series = self._time_series[series_type]
-        else:
-            for saved_series in self._time_series.values():
-                series.extend(saved_series)
+        Raises ValueError if no TimeSeries with the given id (and type) exists
+        """
 
         if id is not None:
-            for s in series:
-                if s.uuid == id:
-                    return s
-            raise ValueError(f'No TimeSeries object exists with id: {id}')
+            try:
+                time_series, saved_type = self._by_id[id]
+            except KeyError:
+                raise ValueError(f'No TimeSeries object exists with id: {id}')
 
+            if series_type is not None and saved_type != series_type:
+                raise ValueError(f'No TimeSeries object exists with id: {id}')
+            return time_series
+
+        if series_type is not None:
+            return self._time_series.get(series_type, tuple())
         else:
-            return series
+            return self._all
 
     def __iter__(self):
-        for t in self.get():
+        for t in self._all:
             yield t
 
 
@@ -59,7 +59,7 @@ class BaseRiskManager(RiskManager):
         For now only returns 10 % of available cash
         :return: desired position volume
         """
-        last_observed_close = asset.bars[0].close
+        last_observed_close = asset.bars.close[0]
         position_size = self.context.account.base_balance.balance * 0.10
         volume = round_down(position_size / last_observed_close, asset.num_decimal_points)
         return volume
@@ -0,0 +1,46 @@
+from shinywaffle.strategy.strategy import CrossSectionalStrategy
+from shinywaffle.common.event import events
+import numpy as np
+
+
+class MomentumRotation(CrossSectionalStrategy):
+
+    """
+    Sample code for a cross-sectional strategy.
+    Every time step the assets with new data are ranked by their return over the last window bars, and the strategy
+    holds the top_n of them. Requires a BarPanel in the context
+    """
+
+    def __init__(self, context, window, top_n):
+        super().__init__(context, 'Momentum rotation')
+        self.window = window
+        self.top_n = top_n
+        self.lookback = window + 1
+
+    def cross_sectional_logic(self, assets, columns) -> list:
+        """
+        :param assets: Assets of the strategy with new data in the current time step
+        :param columns: Columns of the assets in the BarPanel
+        :return: Market buy signals for the assets that enter the top_n and market sell signals for the held assets
+        that leave it
+        """
+        closes = self.context.panel.history('close', self.window + 1)[:, columns]
+        if len(closes) < self.window + 1:
+            return []
+
+        momentum = closes[-1] / closes[0] - 1
+        ranked = np.argsort(-np.where(np.isnan(momentum), -np.inf, momentum), kind='stable')
+        top = set(ranked[:self.top_n].tolist())
+
+        signals = []
+        order_book = self.context.broker.order_book
+        for i, asset in enumerate(assets):
+            # Assets with an order that has not been filled yet are left alone until the order is filled
+            if order_book.has_pending(asset):
+                continue
+            held = self.context.account.balances[asset].balance > 0
+            if i in top and not held and not np.isnan(momentum[i]):
+                signals.append(events.SignalEventMarketBuy(asset))
+            elif i not in top and held:
+                signals.append(events.SignalEventMarketSell(asset))
+        return signals
@@ -15,6 +15,7 @@ class AverageCrossOver(TradingStrategy):
         super().__init__(context, 'Simple moving average crossover')
         self.short = short
         self.long = long
+        self.lookback = max(short, long) + 1
 
     def trading_logic(self, asset) -> list:
 
@@ -34,11 +35,10 @@ class AverageCrossOver(TradingStrategy):
 
         if short_current > long_current and short_previous < long_previous:
             limit_price = bars[0].close * 0.98
-            time_in_force = timedelta(hours=4)
+            time_in_force = timedelta(days=5)
             return [events.SignalEventLimitBuy(asset, limit_price, expires_at=self.context.time+time_in_force)]
         elif short_current < long_current and short_previous > long_previous:
-            order_volume = self.context.account.balances[asset].balance
-            return [events.SignalEventMarketSell(asset, order_volume)]
+            return [events.SignalEventMarketSell(asset)]
         else:
             return []
 
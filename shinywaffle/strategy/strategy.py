@@ -3,7 +3,8 @@ from shinywaffle.common.event import events
 from shinywaffle.common.assets import Asset
 from shinywaffle.backtesting.orders import ANY_ORDER_TYPE
 from abc import ABC, abstractmethod
-from typing import List, Union
+from typing import List, Optional, Union
+import numpy as np
 
 
 class TradingStrategy(ABC):
@@ -20,6 +21,10 @@ class TradingStrategy(ABC):
 
 """
 
+    # Number of most recent bars the trading logic reads. Streamed asset series are trimmed to the largest lookback
+    # of the strategies trading the asset. None means the whole history is kept
+    lookback: Optional[int] = None
+
     def __init__(self, context: Context, name):
         self.name = name
         self.assets = {}
@@ -43,22 +48,26 @@ class TradingStrategy(ABC):
         """
         if asset.ticker in self.assets.keys():
             signals = self.trading_logic(asset=asset)
-            if not isinstance(signals, list):
-                raise TypeError('Generated signals from trading strategy must be returned in the form of a list')
-
-            for signal in signals:
-                if not isinstance(signal, events.SignalEventMarketBuy) and \
-                        not isinstance(signal, events.SignalEventMarketSell) and \
-                        not isinstance(signal, events.SignalEventLimitSell) and \
-                        not isinstance(signal, events.SignalEventLimitBuy):
-                    raise TypeError('Generated event needs to be of the type SignalEventMarketBuy, ' \
-                                    'SignalEventMarketSell, SignalEventLimitBuy or ' \
-                                    f'SignalEventLimitSell. The signal was of type {type(signal)}')
-
+            self.check_signals(signals)
             return signals
         else:
             return []
 
+    @staticmethod
+    def check_signals(signals: list) -> None:
+        """ Raises TypeError if the signals are not a list of SignalEvents """
+        if not isinstance(signals, list):
+            raise TypeError('Generated signals from trading strategy must be returned in the form of a list')
+
+        for signal in signals:
+            if not isinstance(signal, events.SignalEventMarketBuy) and \
+                    not isinstance(signal, events.SignalEventMarketSell) and \
+                    not isinstance(signal, events.SignalEventLimitSell) and \
+                    not isinstance(signal, events.SignalEventLimitBuy):
+                raise TypeError('Generated event needs to be of the type SignalEventMarketBuy, ' \
+                                'SignalEventMarketSell, SignalEventLimitBuy or ' \
+                                f'SignalEventLimitSell. The signal was of type {type(signal)}')
+
     @abstractmethod
     def trading_logic(self, asset: Asset) -> List[ANY_ORDER_TYPE]:
         """
@@ -90,4 +99,49 @@ class TradingStrategy(ABC):
         return data
 
 
+class CrossSectionalStrategy(TradingStrategy):
+
+    """
+    Base class for strategies that evaluate all of their assets at once, e.g. ranking, rebalancing or pairs
+    strategies.
+
+    Instead of generate_signal being called for every asset with new data, the event handler calls generate_signals
+    once per time step with all the assets that have new data. cross_sectional_logic then receives the assets of the
+    strategy among those, and, if the context has a BarPanel, their columns in the panel, so that the logic can work
+    on cross sections such as self.context.panel.latest('close')[columns].
+    """
+
+    def generate_signals(self, assets: List[Asset]) -> List[ANY_ORDER_TYPE]:
+        """
+        :param assets: The assets with new time series data in the current time step
+        :return: A list of events to be handled by the event handler
+        """
+        assets = [asset for asset in assets if asset.ticker in self.assets]
+        if not assets:
+            return []
+
+        signals = self.cross_sectional_logic(assets=assets, columns=self.panel_columns(assets))
+        self.check_signals(signals)
+        return signals
+
+    def panel_columns(self, assets: List[Asset]) -> Optional[np.ndarray]:
+        """ The columns of the assets in the BarPanel of the context, or None if the context has no panel """
+        panel = self.context.panel
+        if panel is None:
+            return None
+        return np.array([panel.columns[asset.ticker] for asset in assets], dtype=np.intp)
+
+    def trading_logic(self, asset: Asset) -> List[ANY_ORDER_TYPE]:
+        """ Evaluates a single asset as a cross section of one asset """
+        return self.cross_sectional_logic(assets=[asset], columns=self.panel_columns([asset]))
+
+    @abstractmethod
+    def cross_sectional_logic(self, assets: List[Asset], columns: Optional[np.ndarray]) -> List[ANY_ORDER_TYPE]:
+        """
+        This method needs to be overridden to include the logic behind the signal generation for all the assets
+        with new data at once.
 
+        :param assets: The assets of the strategy with new time series data in the current time step
+        :param columns: The columns of the assets in the BarPanel of the context, None if there is no panel
+        """
+        pass
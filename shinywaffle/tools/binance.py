@@ -1,7 +1,7 @@
 from shinywaffle.tools.rest_api import API
 from shinywaffle.tools.api_link import BinancePublicLink
 from shinywaffle.data.bar import Bar
-from shinywaffle.data.time_series_data import TimeSeries, TimeSeriesType
+from shinywaffle.data.time_series_data import BarSeries
 from datetime import datetime
 from shinywaffle.utils.misc import datetime_to_epoch
 from shinywaffle.utils.misc import epoch_to_datetime
@@ -101,10 +101,7 @@ class BinancePublic(API):
                 query_url = query_string(url, param_dict)
                 response += self.query(query_url)
 
-            response.reverse()
-            bar_container = TimeSeries()
-            bar_container.set(response)
-            return bar_container
+            return BarSeries.from_bars(response)
         else:
             return BinancePublicLink(url, interval)
 
@@ -0,0 +1,75 @@
+import time
+from typing import Callable, Dict
+
+
+class Timer:
+
+    """
+    Accumulates the number of calls, the total and maximum duration and a histogram of the durations of one
+    instrumented key. Durations are integer nanoseconds from time.perf_counter_ns. The histogram has power of two
+    buckets: bucket k counts the durations d with 2 ** (k - 1) <= d < 2 ** k nanoseconds, i.e. k = d.bit_length()
+    """
+
+    __slots__ = ('calls', 'total_ns', 'max_ns', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = [0] * 65
+
+    def add(self, duration_ns: int) -> None:
+        self.calls += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+        self.histogram[duration_ns.bit_length()] += 1
+
+    def report(self) -> dict:
+        return {
+            'calls': self.calls,
+            'total_ns': self.total_ns,
+            'mean_ns': self.total_ns / self.calls if self.calls else 0.,
+            'max_ns': self.max_ns,
+            'histogram': {f'<{2 ** k} ns': count for k, count in enumerate(self.histogram) if count}
+        }
+
+
+class Instrumentation:
+
+    """
+    Optional timing and counting of the event loop of a backtest.
+
+    Code is instrumented by wrapping a callable with wrap(), which records every call of the callable in the Timer of
+    the key. The keys are grouped in sections, e.g. 'events' with a key per event type and 'subsystems' with a key for
+    the data provider, strategies, broker, account and progress bar. Nothing is wrapped unless a Backtester is made
+    with instrument=True, so an uninstrumented backtest has no overhead.
+    """
+
+    def __init__(self):
+        self.timers: Dict[str, Dict[str, Timer]] = dict()
+
+    def timer(self, section: str, key: str) -> Timer:
+        """ The Timer of the key in the section, created on first use """
+        timers = self.timers.setdefault(section, dict())
+        if key not in timers:
+            timers[key] = Timer()
+        return timers[key]
+
+    def wrap(self, section: str, key: str, func: Callable) -> Callable:
+        """ Returns a callable that calls func and records the duration of the call in the Timer of the key """
+        add = self.timer(section, key).add
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add(perf_counter_ns() - start)
+
+        return timed
+
+    def report(self) -> dict:
+        return {section: {key: timer.report() for key, timer in timers.items()}
+                for section, timers in self.timers.items()}
@@ -1,6 +1,8 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import math
+import numpy as np
 from enum import Enum
+from typing import List
 
 INTRADAY_INTERVALS = (
     "1min",
@@ -15,6 +17,11 @@ INTRADAY_INTERVALS = (
     "8h"
     )
 DAILY_DATETIME_FORMAT = "%Y-%m-%d"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+NS_PER_DAY = 24 * 60 * 60 * 10 ** 9
+NS_PER_HOUR = 60 * 60 * 10 ** 9
+NS_PER_MINUTE = 60 * 10 ** 9
 
 
 class IntradayInterval(Enum):
@@ -148,6 +155,82 @@ def epoch_to_datetime(timestamp: int, ms: bool = False) -> datetime:
     return datetime.fromtimestamp(timestamp)
 
 
+def datetime_to_ns(timestamp: datetime) -> int:
+    """
+    Method that converts a naive datetime object to integer nanoseconds from epoch. Unlike datetime_to_epoch, the
+    timestamp is not shifted by the local timezone, so the conversion is exactly reversible with ns_to_datetime.
+    Integers are taken to be nanoseconds from epoch already and are returned as they are
+    :param timestamp: datetime object with the timestamp
+    :return: integer with the nanoseconds from epoch
+    """
+
+    # Checked first and returned unconverted, as bars read in bulk are given their times in nanoseconds
+    if type(timestamp) is int:
+        return timestamp
+    if isinstance(timestamp, np.integer):
+        return int(timestamp)
+    return (timestamp - EPOCH) // MICROSECOND * 1000
+
+
+def ns_to_datetime(timestamp: int) -> datetime:
+    """
+    Method that converts integer nanoseconds from epoch to a naive datetime object
+    :param timestamp: nanoseconds from epoch
+    :return: datetime object
+    """
+
+    return EPOCH + timedelta(microseconds=int(timestamp) // 1000)
+
+
+def datetimes_to_ns(timestamps) -> np.ndarray:
+    """
+    Vectorized version of datetime_to_ns
+    :param timestamps: iterable of datetime objects or integer nanoseconds from epoch
+    :return: int64 numpy array with the nanoseconds from epoch
+    """
+
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind in 'iu':
+        return timestamps.astype(np.int64)
+    return np.array(list(timestamps), dtype='datetime64[ns]').view(np.int64)
+
+
+# Formats that are a prefix of the ISO 8601 format numpy writes datetime64 values in, by datetime64 unit
+ISO_DATETIME_FORMATS = {
+    '%Y-%m-%d': 'D',
+    '%Y-%m-%d %H:%M': 'm',
+    '%Y-%m-%d %H:%M:%S': 's'
+}
+
+
+def ns_to_strings(timestamps, datetime_format: str) -> List[str]:
+    """
+    Formats integer nanoseconds from epoch as strings. The formats in ISO_DATETIME_FORMATS are formatted vectorized
+    by numpy, any other format with datetime.strftime
+    :param timestamps: iterable or array of integer nanoseconds from epoch
+    :param datetime_format: datetime.strftime format string
+    :return: list of strings
+    """
+
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    unit = ISO_DATETIME_FORMATS.get(datetime_format)
+    if unit is None:
+        return [ns_to_datetime(t).strftime(datetime_format) for t in timestamps]
+
+    strings = np.datetime_as_string(timestamps.view('datetime64[ns]').astype(f'datetime64[{unit}]'))
+    return np.char.replace(strings, 'T', ' ').tolist()
+
+
+def get_backtest_step_ns(interval: str) -> int:
+    """
+    The time increment of get_backtest_dt as integer nanoseconds, so that a grid of backtest times can be built
+    without accumulating floating point error
+    :param interval: string with the time interval used in the backtesting
+    :return: integer with the time increment in nanoseconds
+    """
+
+    return round(get_backtest_dt(interval) * 24 * 60 * 60) * 10 ** 9
+
+
 def query_string(base_url: str, params: dict) -> str:
     """
     Method that takes a base url and assembles query parameters from a params dict
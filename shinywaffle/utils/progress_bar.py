@@ -13,6 +13,8 @@ class ProgressBar:
 
     @property
     def percentage_complete(self):
+        if self.steps == 0:
+            return 100
         return math.floor(100 * self.counter / self.steps)
 
     def update(self):
@@ -0,0 +1,79 @@
+"""
+Compares memory per bar and construction throughput of the bar representations.
+
+    - dict bar: the previous Bar class with a per instance __dict__, reproduced here for reference
+    - Bar: the slotted Bar, created from datetime objects and from integer nanoseconds as read in bulk
+    - BarView: row view over the columns of a BarSeries
+    - BarSeries: the columns themselves
+
+Run with: python tests/bar_benchmark.py [number of bars]
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from shinywaffle.data.bar import Bar, BarView
+from shinywaffle.data.time_series_data import BarSeries
+
+
+class DictBar:
+
+    def __init__(self, timestamp, opn, close, high, low, volume):
+        self.time = timestamp
+        self.open = float(opn)
+        self.close = float(close)
+        self.high = float(high)
+        self.low = float(low)
+        self.volume = int(volume)
+
+
+def make_columns(n):
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return {
+        'time': np.arange(n, dtype=np.int64) * 60 * 10 ** 9,
+        'open': close + rng.normal(0, 0.1, n),
+        'high': close + 1.,
+        'low': close - 1.,
+        'close': close,
+        'volume': rng.integers(1, 10 ** 6, n).astype(np.float64),
+    }
+
+
+def measure(name, n, build):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    bars = build()
+    elapsed = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<12} {size / n:>10.1f} bytes/bar {n / elapsed:>14,.0f} bars/s')
+    return bars
+
+
+def main(n=1_000_000):
+    columns = make_columns(n)
+    start = datetime(2000, 1, 1)
+    rows = list(zip((start + timedelta(minutes=i) for i in range(n)), columns['open'].tolist(),
+                    columns['close'].tolist(), columns['high'].tolist(), columns['low'].tolist(),
+                    columns['volume'].tolist()))
+
+    print(f'{n:,} bars')
+    measure('dict bar', n, lambda: [DictBar(*r) for r in rows])
+    measure('Bar', n, lambda: [Bar(*r) for r in rows])
+    ns_rows = [(t,) + r[1:] for t, r in zip(columns['time'].tolist(), rows)]
+    measure('Bar (ns)', n, lambda: [Bar(*r) for r in ns_rows])
+    series = measure('BarSeries', n, lambda: BarSeries.from_arrays(**{k: v.copy() for k, v in columns.items()},
+                                                                   assume_sorted=True))
+    measure('BarView', n, lambda: [BarView(series._columns, p) for p in range(n)])
+
+    t0 = time.perf_counter()
+    total = sum(bar.close for bar in series)
+    print(f'iterate BarSeries close {n / (time.perf_counter() - t0):,.0f} bars/s (sum {total:.1f})')
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:]))
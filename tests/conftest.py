@@ -0,0 +1,99 @@
+"""
+Shared builders of the pytest tests: daily bar series, chunk sources replaying them and contexts with a broker and an
+account. The builders are handed out by fixtures of the same name
+"""
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pytest
+
+from shinywaffle.common import assets
+from shinywaffle.common.account import Account
+from shinywaffle.common.broker import BacktestBroker
+from shinywaffle.common.context import Context
+from shinywaffle.data.streaming import ChunkSource
+from shinywaffle.data.time_series_data import BarSeries, TimeSeries, TimeSeriesType
+from shinywaffle.risk.risk_management import BaseRiskManager
+from shinywaffle.utils.misc import datetime_to_ns, NS_PER_DAY
+
+START = datetime(2015, 1, 1)
+
+
+class ArrayChunkSource(ChunkSource):
+
+    """ Replays a BarSeries in chunks of chunk_size bars """
+
+    def __init__(self, bars: BarSeries, chunk_size: int):
+        self.bars = bars
+        self.chunk_size = chunk_size
+
+    def chunks(self, start_time_ns):
+        start = int(np.searchsorted(self.bars.time_index(), start_time_ns, side='right'))
+        for position in range(start, len(self.bars), self.chunk_size):
+            yield self.bars.between(position, min(position + self.chunk_size, len(self.bars)))
+
+
+def daily_bars(n: int, start: datetime = START, close: Optional[np.ndarray] = None, spread: float = 1.,
+               volume: Optional[np.ndarray] = None, seed: int = 0) -> BarSeries:
+    """
+    n daily bars from start. The close is a random walk from 100 unless given, the open is the close plus noise and
+    the high and the low are spread above and below the close
+    """
+    rng = np.random.default_rng(seed)
+    if close is None:
+        close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return BarSeries.from_arrays(time=datetime_to_ns(start) + np.arange(n, dtype=np.int64) * NS_PER_DAY,
+                                 open=close + rng.normal(0, 0.2, n), high=close + spread, low=close - spread,
+                                 close=close, volume=rng.random(n) if volume is None else volume)
+
+
+def backtest_context(bars: Optional[Dict[str, BarSeries]] = None, streams: Optional[Dict[str, ChunkSource]] = None,
+                     associated: Optional[Dict[str, TimeSeries]] = None, strategy: Optional[Callable] = None,
+                     start_time: datetime = START, asset_type=assets.Stock, initial_balance: float = 10000.,
+                     **broker_kwargs) -> Context:
+    """
+    Context with an asset per ticker of bars and streams, a BacktestBroker with seed 0 and fee 0.001 unless given in
+    broker_kwargs and an Account with initial_balance USD.
+
+    :param bars: BarSeries saved as the bars of the asset of each ticker
+    :param streams: ChunkSources saved as the streamed bars of the asset of each ticker
+    :param associated: TimeSeries saved as associated series of the asset of each ticker
+    :param strategy: Called with the context to make the strategy that is applied to all the assets
+    """
+    context = Context(start_time=start_time)
+    trading_strategy = strategy(context) if strategy is not None else None
+
+    for ticker, series in (bars or {}).items():
+        asset = context.assets.get(ticker) or asset_type(context, ticker, ticker)
+        context.save_time_series(asset=asset, time_series=series, series_type=TimeSeriesType.TYPE_ASSET_BARS)
+    for ticker, source in (streams or {}).items():
+        asset = context.assets.get(ticker) or asset_type(context, ticker, ticker)
+        context.save_time_series_stream(asset=asset, source=source, series_type=TimeSeriesType.TYPE_ASSET_BARS)
+    for ticker, series in (associated or {}).items():
+        context.save_time_series(asset=context.assets[ticker], time_series=series,
+                                 series_type=TimeSeriesType.TYPE_ASSOCIATED)
+
+    if trading_strategy is not None:
+        trading_strategy.apply_to_asset(*context.assets.values())
+
+    broker_kwargs = {'fee': 0.001, 'seed': 0, **broker_kwargs}
+    context.set_broker(BacktestBroker(context=context, **broker_kwargs))
+    context.set_account(Account(context=context, base_asset=assets.USD(initial_balance=initial_balance),
+                                risk_manager=BaseRiskManager(context=context)))
+    return context
+
+
+@pytest.fixture
+def make_bars():
+    return daily_bars
+
+
+@pytest.fixture
+def make_chunk_source():
+    return ArrayChunkSource
+
+
+@pytest.fixture
+def make_context():
+    return backtest_context
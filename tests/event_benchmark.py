@@ -0,0 +1,129 @@
+"""
+Measures the per-event overhead of the event loop: adding events to the EventStack, getting them with the event type
+counting and dispatching them through the EventHandler handler table, against the previous list based stack with
+pop(0) and chains of type comparisons.
+
+The event mix imitates an event-heavy strategy: for every time series event a signal is generated, which places an
+order that is checked and filled. The stack is filled with a whole backtest of events before it is drained, as
+happens when many assets update at once.
+
+Run with: python tests/event_benchmark.py [number of time steps]
+"""
+import sys
+import time
+from datetime import datetime
+
+from shinywaffle.backtesting import OrderSide, OrderType
+from shinywaffle.common.assets import Stock
+from shinywaffle.common.context import Context
+from shinywaffle.common.event import events
+from shinywaffle.common.event.event_handler import EventHandler
+from shinywaffle.common.event.event_stack import EventStack, EventStackEmptyError
+
+
+class ListEventStack:
+
+    """ The previous EventStack: a list with pop(0) and a chain of type comparisons for the counting """
+
+    def __init__(self):
+        self.events = list()
+        self.past_events = dict.fromkeys(EventStack().past_events, 0)
+
+    def add(self, event):
+        if isinstance(event, list):
+            for e in event:
+                if e is not None:
+                    self.events.append(e)
+        elif event is not None:
+            self.events.append(event)
+
+    def get(self):
+        try:
+            event = self.events.pop(0)
+            if type(event) == events.TimeSeriesEvent:
+                self.past_events['time series'] += 1
+            elif type(event) == events.SignalEventMarketBuy:
+                self.past_events['market buy signal'] += 1
+            elif type(event) == events.SignalEventMarketSell:
+                self.past_events['market sell signal'] += 1
+            elif type(event) == events.SignalEventLimitBuy:
+                self.past_events['limit buy signal'] += 1
+            elif type(event) == events.SignalEventLimitSell:
+                self.past_events['limit sell signal'] += 1
+            elif type(event) == events.OrderFilledEvent:
+                if event.type == 'market':
+                    if event.side == 'sell':
+                        self.past_events['market sell filled'] += 1
+                    elif event.side == 'buy':
+                        self.past_events['market buy filled'] += 1
+            return event
+        except IndexError:
+            raise EventStackEmptyError
+
+
+def chain_dispatch(event, handled):
+    """ The previous EventHandler.handle_event with no-op handlers """
+    if type(event) == events.TimeSeriesEvent:
+        handled[0] += 1
+    elif type(event) == events.SignalEventMarketBuy:
+        handled[0] += 1
+    elif type(event) == events.SignalEventLimitBuy:
+        handled[0] += 1
+    elif type(event) == events.SignalEventMarketSell:
+        handled[0] += 1
+    elif type(event) == events.SignalEventLimitSell:
+        handled[0] += 1
+    elif type(event) == events.StopLossEvent:
+        pass
+    elif type(event) == events.TrailingStopEvent:
+        pass
+    elif type(event) == events.PendingOrderEvent:
+        handled[0] += 1
+    elif type(event) == events.OrderFilledEvent:
+        handled[0] += 1
+
+
+def make_events(steps):
+    context = Context(start_time=datetime(2020, 1, 1))
+    asset = Stock(context, 'A', 'A')
+    step = [events.TimeSeriesEvent(asset),
+            events.SignalEventMarketBuy(asset),
+            events.PendingOrderEvent(order_id=1),
+            events.OrderFilledEvent(asset, 1., 1., 1., 1., OrderType.MARKET, OrderSide.BUY, 0., 0),
+            events.SignalEventMarketSell(asset),
+            events.PendingOrderEvent(order_id=2),
+            events.OrderFilledEvent(asset, 1., 1., 1., 1., OrderType.MARKET, OrderSide.SELL, 0., 0)]
+    return step * steps
+
+
+def drain(stack, dispatch, all_events):
+    stack.add(list(all_events))
+    t0 = time.perf_counter()
+    while True:
+        try:
+            dispatch(stack.get())
+        except EventStackEmptyError:
+            break
+    return time.perf_counter() - t0
+
+
+def main(steps=20_000):
+    all_events = make_events(steps)
+    n = len(all_events)
+
+    handled = [0]
+    elapsed = drain(ListEventStack(), lambda e: chain_dispatch(e, handled), all_events)
+    print(f'list + if chain  {elapsed / n * 1e9:>10.0f} ns/event ({n:,} events)')
+
+    handler = EventHandler.__new__(EventHandler)
+    noop = lambda e: None
+    handler.handlers = {t: noop for t in (events.TimeSeriesEvent, events.SignalEventMarketBuy,
+                                          events.SignalEventLimitBuy, events.SignalEventMarketSell,
+                                          events.SignalEventLimitSell, events.PendingOrderEvent,
+                                          events.OrderFilledEvent)}
+    elapsed = drain(EventStack(), handler.handle_event, all_events)
+    print(f'deque + tables   {elapsed / n * 1e9:>10.0f} ns/event ({n:,} events)')
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:]))
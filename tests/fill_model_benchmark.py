@@ -0,0 +1,55 @@
+"""
+Compares the limit fill models of the broker on random bars with a limit price within the range of each bar.
+
+For every model the throughput is measured both one order at a time, as the broker calls the model, and as one
+batched call. The fill statistics are the fraction of orders filled and the mean distance of the fill price from the
+limit price relative to the bar range, positive when the fill is better than the limit.
+
+Run with: python tests/fill_model_benchmark.py [number of orders]
+"""
+import sys
+import time
+
+import numpy as np
+
+from shinywaffle.common.fill_models import SimulatedLimitFillModel, TouchLimitFillModel, \
+    BrownianBridgeLimitFillModel
+
+
+def make_orders(n):
+    rng = np.random.default_rng(0)
+    opens = 100 * np.exp(rng.normal(0, 0.1, n))
+    closes = opens * np.exp(rng.normal(0, 0.02, n))
+    highs = np.maximum(opens, closes) * np.exp(np.abs(rng.normal(0, 0.01, n)))
+    lows = np.minimum(opens, closes) * np.exp(-np.abs(rng.normal(0, 0.01, n)))
+    limit_prices = lows + (highs - lows) * rng.random(n)
+    is_buy = rng.random(n) < 0.5
+    return opens, highs, lows, closes, limit_prices, is_buy
+
+
+def main(n=10_000):
+    orders = make_orders(n)
+    opens, highs, lows, closes, limit_prices, is_buy = orders
+    print(f'{n:,} limit orders')
+    print(f'{"model":<16} {"single orders/s":>16} {"batched orders/s":>17} {"filled":>8} {"improvement":>12}')
+
+    for model in (SimulatedLimitFillModel(), TouchLimitFillModel(), BrownianBridgeLimitFillModel()):
+        rng = np.random.default_rng(0)
+        single = min(n, 2_000)
+        t0 = time.perf_counter()
+        for i in range(single):
+            model.fill_prices(*(a[i:i + 1] for a in orders), rng)
+        single_rate = single / (time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        prices = model.fill_prices(*orders, rng)
+        batched_rate = n / (time.perf_counter() - t0)
+
+        filled = ~np.isnan(prices)
+        improvement = np.where(is_buy, limit_prices - prices, prices - limit_prices) / (highs - lows)
+        print(f'{model.name:<16} {single_rate:>16,.0f} {batched_rate:>17,.0f} {filled.mean():>8.3f} '
+              f'{np.mean(improvement[filled]):>12.4f}')
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from shinywaffle.backtesting import OrderSide
+from shinywaffle.backtesting.orders import EmptyOrderError, LimitSellOrder, MarketSellOrder
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.common import assets
+from shinywaffle.common.event import events
+from shinywaffle.common.fill_models import VolumeParticipationMarketFillModel, SlippageMarketFillModel
+from shinywaffle.strategy import sma_crossover
+
+
+def make_backtest(make_bars, make_context, tmp_path, max_participation):
+    """ AverageCrossOver on a cycling price with little volume, so market sells are only partially filled per bar """
+    n = 400
+    close = 100 + 10 * np.sin(np.arange(n) / 6) + np.random.default_rng(1).normal(0, 0.5, n)
+    context = make_context(bars={'COIN': make_bars(n, close=close, spread=3., volume=np.ones(n))},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10),
+                           asset_type=assets.Cryptocurrency,
+                           market_fill_models=[VolumeParticipationMarketFillModel(max_participation),
+                                               SlippageMarketFillModel()])
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2016, 1, 1), path=str(tmp_path), filename='account')
+    return backtester, context.assets['COIN']
+
+
+def test_partially_filled_sells_do_not_sell_more_than_held(make_bars, make_context, tmp_path):
+    # At most 0.05 units are sold per bar, so the rest of a sell order is still pending when the next sell signal
+    # arrives, and together the sell orders exceed the holding
+    backtester, asset = make_backtest(make_bars, make_context, tmp_path, max_participation=0.05)
+    backtester.run()
+
+    account = backtester.account
+    assert account.balances[asset].balance >= 0
+    assert backtester.report()['events']['market sell filled'] > backtester.report()['broker']['order_book'][
+        'filled_orders']['MarketSellOrder']
+
+    sold = sum(t.volume for t in account.trade_log.all_trades if t.trade_side == OrderSide.SELL)
+    bought = sum(t.volume for t in account.trade_log.all_trades if t.trade_side == OrderSide.BUY)
+    assert sold <= bought + 1e-9
+    assert np.isclose(account.balances[asset].balance, bought - sold)
+
+    pending = backtester.context.broker.order_book.get_pending(asset=asset, side=OrderSide.SELL)
+    assert sum(o.volume for o in pending) <= account.balances[asset].balance + 1e-9
+
+
+def test_sell_order_is_capped_to_volume_not_pending(make_bars, make_context, tmp_path):
+    backtester, asset = make_backtest(make_bars, make_context, tmp_path, max_participation=0.05)
+    context = backtester.context
+    context.account.balances[asset].balance = 10.
+    context.broker.place_order(MarketSellOrder(asset=asset, volume=6., time=context.time_ns, expires_at=None))
+
+    order = context.account.handle_sell_order_event(events.SignalEventMarketSell(asset))
+    assert order.volume == 4.
+
+    context.broker.place_order(order)
+    with pytest.raises(EmptyOrderError):
+        context.account.handle_sell_order_event(events.SignalEventMarketSell(asset))
+
+
+@pytest.mark.parametrize('order_type', [MarketSellOrder, LimitSellOrder])
+def test_sell_fill_is_capped_to_balance_by_the_broker(make_bars, make_context, order_type):
+    context = make_context(bars={'COIN': make_bars(10)}, asset_type=assets.Cryptocurrency, slippage=False)
+    asset = context.assets['COIN']
+    asset.bars.extend(context.time_series[asset.ticker].get()[0].between(0, 1))
+    context.account.positions[asset].enter_position(time=context.time_ns, volume=3., size=300., price=100.)
+    context.account.balances[asset].balance = 3.
+
+    # Placed on the broker directly, so the account does not cap the volume
+    kwargs = {'limit_price': float(asset.bars.close[0])} if order_type is LimitSellOrder else {}
+    order = order_type(asset=asset, volume=5., time=context.time_ns, expires_at=None, **kwargs)
+    context.broker.place_order(order)
+
+    fill = context.broker.check_for_order_fill(order.id)
+    assert fill.order_volume == 3.
+    assert order.volume == 2.
+    assert context.broker.total_commission == pytest.approx(fill.commission)
+
+    context.account.complete_order(fill)
+    assert context.account.balances[asset].balance == 0.
+    assert context.account.trade_log.all_trades[-1].volume == 3.
+
+    # Nothing is held anymore, so the rest of the order is not filled
+    assert context.broker.check_for_order_fill(order.id) is None
+    assert context.broker.total_commission == pytest.approx(fill.commission)
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.data.time_series_data import TimeSeries
+from shinywaffle.utils.misc import datetime_to_ns, NS_PER_DAY
+
+
+class Sentiment:
+
+    def __init__(self, time: datetime, value: float):
+        self.time = time
+        self.value = value
+
+
+def weekly_sentiment(weeks: int) -> TimeSeries:
+    sentiment = TimeSeries()
+    sentiment.set([Sentiment(datetime(2015, 1, 1) + timedelta(days=7 * i), float(i)) for i in range(weeks)][::-1])
+    return sentiment
+
+
+def test_copied_context_gets_as_of_join_for_its_own_times(make_bars, make_context, tmp_path):
+    context = make_context(bars={'STK': make_bars(200)}, associated={'STK': weekly_sentiment(28)})
+    first = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                       run_to=datetime(2015, 3, 1), path=str(tmp_path), filename='first')
+    first.run()
+    assert np.array_equal(context.as_of.times, first.times)
+
+    copied = context.copy()
+    second = Backtester(context=copied, time_increment='daily', run_from=datetime(2015, 3, 1),
+                        run_to=datetime(2015, 6, 1), path=str(tmp_path), filename='second')
+    second.run()
+
+    assert np.array_equal(copied.as_of.times, second.times)
+    assert np.array_equal(context.as_of.times, first.times)
+    weeks = (int(second.times[-1]) - datetime_to_ns(datetime(2015, 1, 1))) // (7 * NS_PER_DAY)
+    assert copied.as_of.get('STK', 'value') == float(weeks)
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.backtesting.backtesting_result import BacktestResult
+from shinywaffle.strategy import sma_crossover
+from shinywaffle.utils.misc import ns_to_datetime
+
+
+def test_result_times_are_datetimes(make_bars, make_context, tmp_path):
+    context = make_context(bars={'STK': make_bars(200)},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 6, 1), path=str(tmp_path), filename='result')
+    backtester.run()
+
+    result = BacktestResult(json_path=str(tmp_path / 'result.json'))
+    assert isinstance(result.times, list)
+    assert result.times == [ns_to_datetime(t) for t in context.times_ns]
+
+    positions = result.account.positions['STK']
+    assert positions
+    for position in positions:
+        assert isinstance(position.times, list)
+        assert all(isinstance(t, datetime) for t in position.times)
+        assert position.times[0] >= position.opened_time
@@ -0,0 +1,48 @@
+import copy
+import pickle
+from datetime import datetime
+
+import pytest
+
+from shinywaffle.data.bar import Bar, BarView
+from shinywaffle.utils.misc import datetime_to_ns
+
+
+def test_bar_has_no_instance_dict():
+    bar = Bar(datetime(2015, 1, 1), '1.5', 2., 3., 1., '10.5')
+    assert not hasattr(bar, '__dict__')
+    with pytest.raises(AttributeError):
+        bar.spread = 1.
+    assert bar.time == datetime_to_ns(datetime(2015, 1, 1))
+    assert bar.datetime == datetime(2015, 1, 1)
+    assert (bar.open, bar.close, bar.high, bar.low, bar.volume) == (1.5, 2., 3., 1., 10.5)
+
+
+def test_bar_view_reads_the_columns(make_bars):
+    bars = make_bars(5)
+    view = bars[1]
+    assert isinstance(view, BarView)
+    assert not hasattr(view, '__dict__')
+    assert (view.time, view.close, view.volume) == (bars.time[1], bars.close[1], bars.volume[1])
+    bar = view.to_bar()
+    assert isinstance(bar, Bar)
+    assert (bar.time, bar.open, bar.close, bar.high, bar.low, bar.volume) == \
+           (view.time, view.open, view.close, view.high, view.low, view.volume)
+
+
+@pytest.mark.parametrize('duplicate', [copy.copy, copy.deepcopy, lambda b: pickle.loads(pickle.dumps(b))])
+def test_copied_bar_views_are_bars(make_bars, duplicate):
+    view = make_bars(5)[0]
+    copied = duplicate(view)
+    assert type(copied) is Bar
+    assert (copied.time, copied.close, copied.volume) == (view.time, view.close, view.volume)
+
+
+def test_arithmetic_returns_bars(make_bars):
+    bars = make_bars(5)
+    total = bars[0] + bars[1]
+    assert type(total) is Bar
+    assert total.time == bars[0].time
+    assert total.close == pytest.approx(bars.close[0] + bars.close[1])
+    assert (bars[0] * 2.).high == pytest.approx(2 * bars.high[0])
+    assert (bars[0] / 2).volume == pytest.approx(bars.volume[0] / 2)
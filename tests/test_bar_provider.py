@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from shinywaffle.data import bar_provider
+from shinywaffle.data.bar_provider import BarProvider
+from shinywaffle.data.time_series_data import BarSeries
+
+
+def write_csv(path, bars: BarSeries) -> None:
+    pd.DataFrame({
+        'Date': pd.to_datetime(bars.get('time')[::-1]).strftime('%Y-%m-%d'),
+        'Open': bars.get('open')[::-1],
+        'High': bars.get('high')[::-1],
+        'Low': bars.get('low')[::-1],
+        'Close': bars.get('close')[::-1],
+        'Volume': bars.get('volume')[::-1]
+    }).to_csv(path, index=False)
+
+
+def assert_same_bars(series: BarSeries, expected: BarSeries) -> None:
+    np.testing.assert_array_equal(series.get('time'), expected.get('time'))
+    for field in ('open', 'high', 'low', 'close', 'volume'):
+        np.testing.assert_allclose(series.get(field), expected.get(field), rtol=1e-12)
+
+
+def test_parsed_bars_are_cached_outside_the_data_directory(make_bars, tmp_path):
+    bars = make_bars(30)
+    data_dir, cache_dir = tmp_path / 'data', tmp_path / 'cache'
+    data_dir.mkdir()
+    csv_path = str(data_dir / 'STK.csv')
+    write_csv(csv_path, bars)
+
+    parsed = BarProvider(csv_path, '%Y-%m-%d', cache_dir=str(cache_dir))
+    assert_same_bars(parsed, bars)
+    assert os.listdir(data_dir) == ['STK.csv']
+    assert os.listdir(cache_dir) == [os.path.basename(BarProvider.cache_path(csv_path, '%Y-%m-%d', str(cache_dir)))]
+
+    assert_same_bars(BarProvider(csv_path, '%Y-%m-%d', cache_dir=str(cache_dir)), bars)
+
+
+def test_cache_of_changed_csv_replaces_the_stale_cache(make_bars, tmp_path):
+    csv_path = str(tmp_path / 'STK.csv')
+    write_csv(csv_path, make_bars(30))
+    BarProvider(csv_path, '%Y-%m-%d', cache_dir=str(tmp_path / 'cache'))
+
+    longer = make_bars(40)
+    write_csv(csv_path, longer)
+    os.utime(csv_path, ns=(os.stat(csv_path).st_atime_ns, os.stat(csv_path).st_mtime_ns + 10 ** 9))
+    assert_same_bars(BarProvider(csv_path, '%Y-%m-%d', cache_dir=str(tmp_path / 'cache')), longer)
+    assert len(os.listdir(tmp_path / 'cache')) == 1
+
+
+@pytest.mark.parametrize('error', [PermissionError, FileNotFoundError])
+def test_failing_cache_writes_only_disable_the_cache(make_bars, tmp_path, monkeypatch, error):
+    bars = make_bars(30)
+    csv_path = str(tmp_path / 'STK.csv')
+    write_csv(csv_path, bars)
+
+    def fail(*args, **kwargs):
+        raise error()
+
+    monkeypatch.setattr(bar_provider, 'write_bar_store', fail)
+    assert_same_bars(BarProvider(csv_path, '%Y-%m-%d', cache_dir=str(tmp_path / 'cache')), bars)
+
+
+def test_stale_cache_removed_by_another_loader_is_ignored(make_bars, tmp_path, monkeypatch):
+    csv_path = str(tmp_path / 'STK.csv')
+    write_csv(csv_path, make_bars(30))
+    cache_dir = str(tmp_path / 'cache')
+    stale_path = BarProvider.cache_path(csv_path, '%Y-%d-%m', cache_dir)
+    os.makedirs(cache_dir)
+    open(stale_path, 'wb').close()
+
+    remove = os.remove
+
+    def remove_twice(path):
+        remove(path)
+        remove(path)
+
+    monkeypatch.setattr(bar_provider.os, 'remove', remove_twice)
+    BarProvider(csv_path, '%Y-%m-%d', cache_dir=cache_dir)
+    assert not os.path.exists(stale_path)
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from shinywaffle.data.bar import Bar
+from shinywaffle.data.time_series_data import BarSeries
+from shinywaffle.utils.misc import datetime_to_ns, NS_PER_DAY
+
+FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+
+def test_views_are_most_recent_first(make_bars):
+    bars = make_bars(5)
+    assert np.all(np.diff(bars.time) < 0)
+    np.testing.assert_array_equal(bars.time[::-1], bars.time_index())
+    assert np.shares_memory(bars.close, bars.between(1, 3).close)
+    np.testing.assert_array_equal(bars.between(1, 3).close, bars.close[2:4])
+
+
+def test_rows_have_the_values_of_the_columns(make_bars):
+    bars = make_bars(5, volume=np.array([0.25, 1.5, 2., 3.75, 1e6 + 0.5]))
+    for i, bar in enumerate(bars):
+        for field in FIELDS:
+            assert getattr(bar, field) == bars.get(field)[i]
+    assert bars[0].volume == 1e6 + 0.5
+    assert bars[-1].volume == 0.25
+    with pytest.raises(IndexError):
+        bars[5]
+
+
+def test_from_bars_sorts_chronologically():
+    start = datetime(2015, 1, 1)
+    bars = [Bar(datetime_to_ns(start) + i * NS_PER_DAY, 1. + i, 2. + i, 3. + i, 0. + i, 0.5 + i) for i in (2, 0, 1)]
+    series = BarSeries.from_bars(bars)
+    np.testing.assert_array_equal(series.time, datetime_to_ns(start) + np.array([2, 1, 0]) * NS_PER_DAY)
+    np.testing.assert_array_equal(series.volume, [2.5, 1.5, 0.5])
+    assert series.time.dtype == np.int64 and series.volume.dtype == np.float64
+
+
+def test_from_arrays_rejects_unequal_lengths():
+    with pytest.raises(ValueError):
+        BarSeries.from_arrays(time=np.arange(3), open=np.ones(3), high=np.ones(3), low=np.ones(3),
+                              close=np.ones(2), volume=np.ones(3))
+
+
+def test_retrieve_returns_bars_after_from_time_up_to_to_time(make_bars):
+    bars = make_bars(10)
+    retrieved = bars.retrieve(datetime(2015, 1, 3), datetime(2015, 1, 6))
+    assert [bar.datetime for bar in retrieved] == [datetime(2015, 1, d) for d in (6, 5, 4)]
+
+
+def test_extend_appends_newer_bars(make_bars):
+    bars = make_bars(600)
+    series = bars.between(0, 10)
+    first_close = series.close
+    for start in range(10, 600, 7):
+        series.extend(bars.between(start, min(start + 7, 600)))
+
+    assert len(series) == 600
+    for field in FIELDS:
+        np.testing.assert_array_equal(series.get(field), bars.get(field))
+    # The buffers grow by doubling, and views handed out earlier keep their values
+    assert len(series._buffers['time']) == 1024
+    np.testing.assert_array_equal(first_close, bars.close[-10:])
+
+
+def test_extend_with_bars(make_bars):
+    bars = make_bars(10)
+    series = bars.between(0, 8)
+    series.extend([bar.to_bar() for bar in bars[:2]])
+    np.testing.assert_array_equal(series.time, bars.time)
+    series.extend([])
+    assert len(series) == 10
+
+
+def test_trim_keeps_the_latest_bars(make_bars):
+    bars = make_bars(100)
+    series = bars.between(0, 30)
+    view = series.close
+    series.trim(20)
+    assert len(series) == 30 and series.trimmed == 0
+
+    series.extend(bars.between(30, 100))
+    series.trim(20)
+    assert len(series) == 20 and series.trimmed == 80
+    np.testing.assert_array_equal(series.close, bars.close[:20])
+    np.testing.assert_array_equal(view, bars.close[70:])
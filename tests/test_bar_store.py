@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from shinywaffle.data.bar_store import BarStoreError, open_bar_store, read_bar_store_header, write_bar_store
+from shinywaffle.data.time_series_data import BarSeries
+
+FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+
+def test_store_round_trip_is_memory_mapped(make_bars, tmp_path):
+    bars = make_bars(50)
+    path = str(tmp_path / 'STK.bars')
+    header = write_bar_store(path, bars, symbol='STK', interval='1d')
+    assert (header.symbol, header.interval, header.count) == ('STK', '1d', 50)
+    assert (header.time_from, header.time_to) == (int(bars.time[-1]), int(bars.time[0]))
+    assert repr(read_bar_store_header(path)) == repr(header)
+
+    stored = BarSeries.from_bar_store(path)
+    assert isinstance(stored.time_index().base, np.memmap)
+    for field in FIELDS:
+        np.testing.assert_array_equal(stored.get(field), bars.get(field))
+
+    # The mapped columns are read-only and extending the series copies them
+    with pytest.raises(ValueError):
+        stored.close[0] = 0.
+    stored.extend(make_bars(51).between(50, 51))
+    assert len(stored) == 51
+    np.testing.assert_array_equal(open_bar_store(path).close, bars.close)
+
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / 'empty.bars')
+    write_bar_store(path, BarSeries())
+    assert len(open_bar_store(path)) == 0
+
+
+def test_invalid_stores_are_rejected(make_bars, tmp_path):
+    path = str(tmp_path / 'STK.bars')
+    with open(path, 'wb') as f:
+        f.write(b'not a bar store' * 10)
+    with pytest.raises(BarStoreError):
+        open_bar_store(path)
+
+    write_bar_store(path, make_bars(50))
+    with open(path, 'r+b') as f:
+        f.truncate(200)
+    with pytest.raises(BarStoreError):
+        open_bar_store(path)
@@ -0,0 +1,47 @@
+import pytest
+
+from shinywaffle.backtesting.orders import LimitBuyOrder, LimitSellOrder
+from shinywaffle.common.fill_models import TouchLimitFillModel
+
+
+class CountingLimitFillModel(TouchLimitFillModel):
+
+    """ Touch fills that records the number of orders of each call """
+
+    def __init__(self):
+        self.calls = list()
+
+    def fill_prices(self, opens, highs, lows, closes, limit_prices, is_buy, rng):
+        self.calls.append(len(opens))
+        return super().fill_prices(opens, highs, lows, closes, limit_prices, is_buy, rng)
+
+
+def test_woken_limit_orders_are_evaluated_in_one_call(make_bars, make_context):
+    model = CountingLimitFillModel()
+    context = make_context(bars={'A': make_bars(10), 'B': make_bars(10, seed=1)}, limit_fill_model=model)
+    bar_assets = list(context.assets.values())
+    for asset in bar_assets:
+        asset.bars.extend(context.time_series[asset.ticker].get()[0].between(0, 1))
+
+    within = [LimitBuyOrder(asset=asset, volume=1., limit_price=float(asset.bars.close[0]), time=context.time_ns,
+                            expires_at=None) for asset in bar_assets]
+    outside = LimitSellOrder(asset=bar_assets[0], volume=1., limit_price=float(bar_assets[0].bars.high[0]) + 1,
+                             time=context.time_ns, expires_at=None)
+    for order in within + [outside]:
+        context.broker.place_order(order)
+
+    # The orders are new in the first update, their events are already on the event stack
+    order_book = context.broker.order_book
+    assert order_book.update_post_event_stack(assets=bar_assets) == []
+    events = order_book.update_post_event_stack(assets=bar_assets)
+    assert [event.order_id for event in events] == [order.id for order in within]
+    assert model.calls == [2]
+
+    for order in within:
+        fill = context.broker.check_for_order_fill(order.id)
+        assert fill.filled_price == pytest.approx(min(float(order.asset.bars.open[0]), order.order_limit_price))
+    assert model.calls == [2]
+
+    # A limit order that was not woken is evaluated alone, and its limit outside the bar is not passed to the model
+    assert context.broker.check_for_order_fill(outside.id) is None
+    assert model.calls == [2]
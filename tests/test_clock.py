@@ -0,0 +1,55 @@
+from datetime import date, datetime, time
+
+import numpy as np
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.backtesting.clock import ClockType, TradingSession, data_times, grid_times
+from shinywaffle.data.time_series_data import BarSeries
+from shinywaffle.utils.misc import datetime_to_ns, ns_to_datetime, NS_PER_DAY, NS_PER_HOUR
+
+
+def ns(*args) -> int:
+    return datetime_to_ns(datetime(*args))
+
+
+def weekday_bars(make_bars, n):
+    """ The bars of n days from 2015-01-01 on the weekdays only """
+    bars = make_bars(n)
+    weekdays = np.array([ns_to_datetime(t).weekday() < 5 for t in bars.time_index()])
+    return BarSeries.from_arrays(**{field: bars.get(field)[::-1][weekdays] for field in
+                                    ('time', 'open', 'high', 'low', 'close', 'volume')})
+
+
+def test_grid_times_exclude_the_end():
+    times = grid_times(ns(2015, 1, 1), ns(2015, 1, 2), 6 * NS_PER_HOUR)
+    assert times.dtype == np.int64
+    np.testing.assert_array_equal(times, ns(2015, 1, 1) + np.arange(4) * 6 * NS_PER_HOUR)
+
+
+def test_session_keeps_open_hours_on_trading_days():
+    session = TradingSession(open=time(9, 30), close=time(16), holidays=[date(2015, 1, 2)])
+    # Thursday 1 January 2015 to Monday 5 January 2015, every hour
+    times = grid_times(ns(2015, 1, 1), ns(2015, 1, 6), NS_PER_HOUR)
+    kept = [ns_to_datetime(t) for t in times[session.mask(times)]]
+
+    assert {t.date() for t in kept} == {date(2015, 1, 1), date(2015, 1, 5)}
+    assert [t.hour for t in kept if t.day == 1] == [10, 11, 12, 13, 14, 15]
+
+
+def test_data_clock_steps_through_the_times_with_data(make_bars, make_context, tmp_path):
+    bars = weekday_bars(make_bars, 60)
+    context = make_context(bars={'STK': bars})
+    times = data_times(context, ns(2015, 1, 10), ns(2015, 2, 1))
+    assert len(times) == 15
+    assert all(ns_to_datetime(t).weekday() < 5 for t in times)
+
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 1, 10),
+                            run_to=datetime(2015, 2, 1), path=str(tmp_path), filename='data_clock',
+                            clock=ClockType.TYPE_DATA)
+    np.testing.assert_array_equal(backtester.times, times)
+
+    grid = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 1, 10),
+                      run_to=datetime(2015, 2, 1), path=str(tmp_path), filename='grid',
+                      session=TradingSession())
+    np.testing.assert_array_equal(grid.times, times)
+    assert len(grid.times) < (ns(2015, 2, 1) - ns(2015, 1, 10)) // NS_PER_DAY
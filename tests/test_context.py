@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import numpy as np
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.data.panel import BarPanel
+from shinywaffle.strategy import sma_crossover
+
+
+def run(context, tmp_path, filename):
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 6, 1), path=str(tmp_path), filename=filename)
+    backtester.run()
+    return context.account.time_series['values']
+
+
+def test_copies_share_the_market_data(make_bars, make_chunk_source, make_context, tmp_path):
+    context = make_context(bars={'STK': make_bars(200)}, streams={'STR': make_chunk_source(make_bars(200), 10)},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    BarPanel(context)
+    copied = context.copy()
+
+    assert copied.time_series['STK'].get()[0] is context.time_series['STK'].get()[0]
+    assert copied.time_series_streams['STR'][0][0] is context.time_series_streams['STR'][0][0]
+    assert copied.panel is not context.panel and copied.panel.context is copied
+    assert copied.panel.get('close') is context.panel.get('close')
+
+    # The state a backtest changes is copied
+    assert copied.account is not context.account and copied.broker is not context.broker
+    assert copied.assets['STK'].bars is not context.assets['STK'].bars
+    assert copied.account.context is copied and copied.broker.context is copied
+
+
+def test_backtest_of_a_copy_matches_the_original(make_bars, make_context, tmp_path):
+    context = make_context(bars={'STK': make_bars(200)},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    BarPanel(context)
+    copied = context.copy()
+
+    values = run(context, tmp_path, 'original')
+    assert len(copied.assets['STK'].bars) == 0 and copied.panel.position == -1
+    np.testing.assert_array_equal(run(copied, tmp_path, 'copy'), values)
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.data.data_provider import ReplayCursor
+from shinywaffle.data.time_series_data import BarSeries, TimeSeries
+from shinywaffle.strategy import sma_crossover
+from shinywaffle.utils.misc import datetime_to_ns, NS_PER_DAY
+
+
+class Sentiment:
+
+    def __init__(self, time: datetime, value: float):
+        self.time = time
+        self.value = value
+
+
+def daily_sentiment(days: int) -> TimeSeries:
+    sentiment = TimeSeries()
+    sentiment.set([Sentiment(datetime(2015, 1, 1) + timedelta(days=i), float(i)) for i in range(days)][::-1])
+    return sentiment
+
+
+def every_other_day(bars: BarSeries) -> BarSeries:
+    return BarSeries.from_arrays(**{field: bars.get(field)[::-1][::2] for field in
+                                    ('time', 'open', 'high', 'low', 'close', 'volume')})
+
+
+def test_order_book_is_only_updated_for_assets_with_new_bars(make_bars, make_context, tmp_path):
+    context = make_context(bars={'STK': every_other_day(make_bars(200))}, associated={'STK': daily_sentiment(200)},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    asset = context.assets['STK']
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 4, 1), path=str(tmp_path), filename='new_bars')
+
+    order_book = context.broker.order_book
+    update_post_event_stack = order_book.update_post_event_stack
+    updates = list()
+
+    def record(assets=None):
+        updates.append((int(asset.bars.time[0]), assets))
+        return update_post_event_stack(assets)
+
+    order_book.update_post_event_stack = record
+    backtester.run()
+
+    # Every day has new sentiment, but only every other day a new bar
+    assert len(updates) == len(backtester.times)
+    previous_bar_time = None
+    for bar_time, assets in updates:
+        assert assets == ([asset] if bar_time != previous_bar_time else [])
+        previous_bar_time = bar_time
+    assert [] in [assets for _, assets in updates]
+
+
+def test_replay_cursor_returns_each_bar_once(make_bars):
+    bars = make_bars(30)
+    start = datetime_to_ns(datetime(2015, 1, 5))
+    cursor = ReplayCursor(series=bars, start_time_ns=start)
+
+    replayed = list()
+    for to_time in range(start, int(bars.time[0]) + 3 * NS_PER_DAY, 3 * NS_PER_DAY):
+        new_bars = cursor.advance(to_time_ns=to_time)
+        assert all(start < bar.time <= to_time for bar in new_bars)
+        replayed += [bar.time for bar in new_bars][::-1]
+
+    np.testing.assert_array_equal(replayed, bars.time_index()[5:])
+    assert cursor.advance(to_time_ns=int(bars.time[0]) + NS_PER_DAY) == []
+
+
+def test_replay_cursor_replays_time_series_most_recent_first():
+    sentiment = daily_sentiment(10)
+    cursor = ReplayCursor(series=sentiment, start_time_ns=datetime_to_ns(datetime(2015, 1, 2)))
+    assert cursor.advance(to_time_ns=datetime_to_ns(datetime(2015, 1, 1))) == []
+    assert [s.value for s in cursor.advance(to_time_ns=datetime_to_ns(datetime(2015, 1, 5)))] == [4., 3., 2.]
+    assert [s.value for s in cursor.advance(to_time_ns=datetime_to_ns(datetime(2015, 1, 6)))] == [5.]
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from shinywaffle.backtesting import OrderSide, OrderType
+from shinywaffle.common.event import events
+from shinywaffle.common.event.event_handler import EventHandler
+from shinywaffle.common.event.event_stack import EventStack, EventStackEmptyError, PostEventStack
+from shinywaffle.data.data_provider import BacktestDataProvider
+
+
+@pytest.fixture
+def context(make_bars, make_context):
+    return make_context(bars={'STK': make_bars(5)})
+
+
+@pytest.fixture
+def asset(context):
+    return context.assets['STK']
+
+
+def filled(asset, order_type, side):
+    return events.OrderFilledEvent(asset=asset, filled_price=1., order_price=1., size=1., volume=1.,
+                                   order_type=order_type, side=side, commission=0., time=0)
+
+
+def test_events_are_returned_first_in_first_out(asset):
+    stack = EventStack()
+    first, second, pending = events.TimeSeriesEvent(asset), events.SignalEventMarketBuy(asset), \
+        events.PendingOrderEvent(order_id=1)
+    stack.add(first)
+    stack.add([second, None, pending])
+    stack.add(None)
+    urgent = filled(asset, OrderType.MARKET, OrderSide.BUY)
+    stack.add_next(urgent)
+    stack.add_next(None)
+
+    assert [stack.get() for _ in range(4)] == [urgent, first, second, pending]
+    with pytest.raises(EventStackEmptyError):
+        stack.get()
+
+
+def test_popped_events_are_counted_by_type(asset):
+    stack = EventStack()
+    stack.add([events.TimeSeriesEvent(asset), events.TimeSeriesEvent(asset),
+               events.SignalEventLimitSell(asset, order_limit_price=1.), events.StopLossEvent(asset, order_size=1.),
+               filled(asset, OrderType.LIMIT, OrderSide.SELL), filled(asset, OrderType.MARKET, OrderSide.BUY),
+               events.PendingOrderEvent(order_id=1)])
+    while stack.events:
+        stack.get()
+
+    counts = stack.report()
+    assert counts['time series'] == 2
+    assert counts['limit sell signal'] == 1
+    assert counts['stop loss'] == 1
+    assert (counts['limit sell filled'], counts['market buy filled'], counts['total filled']) == (1, 1, 2)
+    assert counts['market sell signal'] == 0
+
+
+def test_post_event_stack_dump_empties_the_stack(asset):
+    stack = PostEventStack()
+    stack.add([events.SignalEventMarketBuy(asset), events.SignalEventMarketSell(asset)])
+    dumped = stack.dump()
+    assert [type(e) for e in dumped] == [events.SignalEventMarketBuy, events.SignalEventMarketSell]
+    assert not stack.events
+
+
+def test_events_are_dispatched_by_type(context, asset):
+    handled = list()
+    # The event loop runs in the constructor, and ends right away without time steps
+    handler = EventHandler(context=context, data_provider=BacktestDataProvider(context, np.empty(0, dtype=np.int64)))
+    handler.handlers[events.SignalEventMarketBuy] = handled.append
+
+    signal = events.SignalEventMarketBuy(asset)
+    handler.handle_event(signal)
+    handler.handle_event(events.StopLossEvent(asset, order_size=1.))
+    assert handled == [signal]
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.common.fill_models import BrownianBridgeLimitFillModel, SimulatedLimitFillModel, \
+    TouchLimitFillModel
+from shinywaffle.strategy import sma_crossover
+
+
+def bars(n, opn=100., high=103., low=97., close=101.):
+    return tuple(np.full(n, value) for value in (opn, high, low, close))
+
+
+def test_touch_fills_at_the_open_or_the_limit():
+    opens, highs, lows, closes = bars(4)
+    limit_prices = np.array([98., 102., 102., 98.])
+    is_buy = np.array([True, True, False, False])
+    prices = TouchLimitFillModel().fill_prices(opens, highs, lows, closes, limit_prices, is_buy, None)
+    np.testing.assert_array_equal(prices, [98., 100., 102., 100.])
+
+
+def test_brownian_bridge_fills_limits_between_open_and_close():
+    opens, highs, lows, closes = bars(1000)
+    prices = BrownianBridgeLimitFillModel().fill_prices(opens, highs, lows, closes, np.full(1000, 100.5),
+                                                        np.full(1000, True), np.random.default_rng(0))
+    np.testing.assert_array_equal(prices, 100.)
+
+
+def test_brownian_bridge_fills_limits_beyond_with_the_first_passage_probability():
+    n = 20000
+    opens, highs, lows, closes = bars(n)
+    model = BrownianBridgeLimitFillModel()
+    filled = {}
+    for limit in (99., 97.):
+        prices = model.fill_prices(opens, highs, lows, closes, np.full(n, limit), np.full(n, True),
+                                   np.random.default_rng(1))
+        assert np.all(np.isnan(prices) | (prices == limit))
+        filled[limit] = np.mean(~np.isnan(prices))
+
+    variance = np.log(103. / 97.) ** 2 / (4 * np.log(2))
+    expected = np.exp(-2 * np.log(100. / 99.) * np.log(101. / 99.) / variance)
+    assert filled[99.] == pytest.approx(expected, abs=0.02)
+    assert filled[97.] < filled[99.]
+
+
+@pytest.mark.parametrize('model', [SimulatedLimitFillModel(), TouchLimitFillModel(), BrownianBridgeLimitFillModel()])
+def test_backtest_with_limit_fill_model(make_bars, make_context, tmp_path, model):
+    context = make_context(bars={'STK': make_bars(200, spread=3.)}, limit_fill_model=model,
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 6, 1), path=str(tmp_path), filename='limit_fills')
+    backtester.run()
+
+    assert context.broker.report()['limit_fill_model'] == model.name
+    assert context.account.trade_log.all_trades
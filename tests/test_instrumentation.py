@@ -0,0 +1,53 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.strategy import sma_crossover
+from shinywaffle.utils.instrumentation import Instrumentation, Timer
+
+
+def test_timer_buckets_durations_by_powers_of_two():
+    timer = Timer()
+    for duration in (0, 1, 3, 4, 1000):
+        timer.add(duration)
+    report = timer.report()
+    assert (report['calls'], report['total_ns'], report['max_ns']) == (5, 1008, 1000)
+    assert report['mean_ns'] == pytest.approx(201.6)
+    assert report['histogram'] == {'<1 ns': 1, '<2 ns': 1, '<4 ns': 1, '<8 ns': 1, '<1024 ns': 1}
+
+
+def test_wrapped_callables_are_timed_even_when_raising():
+    instrumentation = Instrumentation()
+    double = instrumentation.wrap('section', 'double', lambda x: 2 * x)
+    assert double(2) == 4
+
+    def fail():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        instrumentation.wrap('section', 'fail', fail)()
+    report = instrumentation.report()['section']
+    assert (report['double']['calls'], report['fail']['calls']) == (1, 1)
+
+
+@pytest.mark.parametrize('instrument', [False, True])
+def test_backtest_reports_instrumentation(make_bars, make_context, tmp_path, instrument):
+    context = make_context(bars={'STK': make_bars(200)},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 6, 1), path=str(tmp_path), filename='instrumented',
+                            instrument=instrument)
+    backtester.run()
+    report = json.loads((tmp_path / 'instrumented.json').read_text())['instrumentation']
+
+    if not instrument:
+        assert report is None
+        return
+
+    assert report['subsystems']['event loop']['calls'] == 1
+    assert report['subsystems']['data']['calls'] == len(backtester.times) + 1
+    assert report['events']['TimeSeriesEvent']['calls'] == len(backtester.times)
+    strategy = next(iter(context.strategies.values()))
+    assert report['strategies'][strategy.name]['calls'] == len(backtester.times)
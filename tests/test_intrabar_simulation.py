@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from shinywaffle.common.fill_models import SimulatedLimitFillModel
+from shinywaffle.data.intrabar_simulation import simulate_intrabar_paths
+
+OPENS = np.array([100., 50., 10.])
+HIGHS = np.array([105., 51., 12.])
+LOWS = np.array([98., 45., 9.5])
+CLOSES = np.array([103., 46., 11.])
+
+
+def test_paths_go_from_the_open_through_the_high_and_low_to_the_close():
+    paths = simulate_intrabar_paths(OPENS, HIGHS, LOWS, CLOSES, steps=50, rng=np.random.default_rng(0))
+    assert paths.shape == (3, 51)
+    np.testing.assert_allclose(paths[:, 0], OPENS)
+    np.testing.assert_allclose(paths[:, -1], CLOSES)
+    np.testing.assert_allclose(paths.max(axis=1), HIGHS)
+    np.testing.assert_allclose(paths.min(axis=1), LOWS)
+
+
+def test_paths_are_reproducible_from_the_seed():
+    first = simulate_intrabar_paths(OPENS, HIGHS, LOWS, CLOSES, rng=np.random.default_rng(1))
+    second = simulate_intrabar_paths(OPENS, HIGHS, LOWS, CLOSES, rng=np.random.default_rng(1))
+    np.testing.assert_array_equal(first, second)
+    assert simulate_intrabar_paths(100., 105., 98., 103., rng=np.random.default_rng(1)).shape == (1, 301)
+    with pytest.raises(ValueError):
+        simulate_intrabar_paths(OPENS, HIGHS, LOWS, CLOSES, steps=2)
+
+
+def test_simulated_fills_are_at_or_better_than_the_limit():
+    n = 200
+    rng = np.random.default_rng(2)
+    opens, closes = np.full(n, 100.), np.full(n, 101.)
+    highs, lows = np.full(n, 103.), np.full(n, 97.)
+    is_buy = np.arange(n) % 2 == 0
+    limit_prices = np.where(is_buy, rng.uniform(97, 100, n), rng.uniform(100, 103, n))
+
+    prices = SimulatedLimitFillModel(steps=100).fill_prices(opens, highs, lows, closes, limit_prices, is_buy, rng)
+    # Every path reaches the high and the low, so all the limits within the bar are filled
+    assert not np.isnan(prices).any()
+    assert np.all(np.where(is_buy, prices <= limit_prices, prices >= limit_prices))
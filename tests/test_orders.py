@@ -0,0 +1,136 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from shinywaffle.backtesting import OrderSide, OrderType
+from shinywaffle.backtesting.orders import EmptyOrderError, LimitBuyOrder, LimitSellOrder, MarketBuyOrder, \
+    MarketSellOrder
+from shinywaffle.common.event import events
+from shinywaffle.data.data_provider import BacktestDataProvider
+from shinywaffle.utils.misc import datetime_to_ns, NS_PER_DAY
+
+
+@pytest.fixture
+def context(make_bars, make_context):
+    context = make_context(bars={'A': make_bars(10), 'B': make_bars(10, seed=1)})
+    for asset in context.assets.values():
+        asset.bars.extend(context.time_series[asset.ticker].get()[0].between(0, 1))
+    return context
+
+
+def place(context, order_type, ticker, expires_at=None, **kwargs):
+    """ Places an order of volume 1 at the time of the latest bar of the asset """
+    asset = context.assets[ticker]
+    order = order_type(asset=asset, volume=1., time=int(asset.bars.time[0]), expires_at=expires_at, **kwargs)
+    context.broker.place_order(order)
+    return order
+
+
+def test_orders_and_events_are_slotted(context):
+    asset = context.assets['A']
+    slotted = [place(context, MarketBuyOrder, 'A'), place(context, LimitSellOrder, 'A', limit_price=1.),
+               events.TimeSeriesEvent(asset),
+               events.SignalEventLimitBuy(asset, order_limit_price=1.), events.PendingOrderEvent(order_id=1)]
+    for obj in slotted:
+        assert not hasattr(obj, '__dict__')
+
+    assert (MarketSellOrder.type, MarketSellOrder.side) == (OrderType.MARKET, OrderSide.SELL)
+    assert (events.SignalEventLimitBuy.type, events.SignalEventLimitBuy.side) == (OrderType.LIMIT, OrderSide.BUY)
+    with pytest.raises(EmptyOrderError):
+        MarketSellOrder(asset=asset, volume=0, time=0, expires_at=None)
+
+
+def test_pending_orders_reuse_their_event(context):
+    asset = context.assets['A']
+    order = place(context, MarketBuyOrder, 'A')
+    pending_event = order.pending_event
+    assert pending_event.order_id == order.id
+
+    order_book = context.broker.order_book
+    assert order_book.update_post_event_stack(assets=[asset]) == []
+    assert order_book.update_post_event_stack(assets=[asset]) == [pending_event]
+    assert order_book.update_post_event_stack(assets=[asset]) == [pending_event]
+
+
+def test_data_provider_reuses_the_time_series_events(context):
+    times = datetime_to_ns(datetime(2015, 1, 2)) + np.arange(3, dtype=np.int64) * NS_PER_DAY
+    data_provider = BacktestDataProvider(context, times)
+    first = data_provider.retrieve_time_series_data()
+    assert [event.asset.ticker for event in first] == ['A', 'B']
+    second = data_provider.retrieve_time_series_data()
+    assert all(a is b for a, b in zip(first, second))
+
+
+def test_pending_orders_are_indexed_by_id_asset_and_side(context):
+    buy_a = place(context, MarketBuyOrder, 'A')
+    sell_a = place(context, LimitSellOrder, 'A', limit_price=1000.)
+    buy_b = place(context, LimitBuyOrder, 'B', limit_price=1.)
+    order_book = context.broker.order_book
+    a, b = context.assets['A'], context.assets['B']
+
+    assert [order.id for order in (buy_a, sell_a, buy_b)] == [1, 2, 3]
+    assert order_book.get_by_id(2) is sell_a and order_book.get_by_id(4) is None
+    assert order_book.get_pending() == [buy_a, sell_a, buy_b]
+    assert order_book.get_pending(asset=a) == [buy_a, sell_a]
+    assert order_book.get_pending(side=OrderSide.BUY) == [buy_a, buy_b]
+    assert order_book.get_pending(asset=a, side=OrderSide.SELL) == [sell_a]
+
+    order_book.fill_order(pending_order_id=buy_a.id, filled_price=100., order_price=100., size=100., commission=0.)
+    order_book.cancel_order(sell_a.id)
+    assert order_book.get_by_id(buy_a.id) is None and order_book.get_by_id(sell_a.id) is None
+    assert not order_book.has_pending(a) and order_book.has_pending(b)
+    assert order_book.get_pending(asset=a) == []
+    assert order_book.get_pending(side=OrderSide.BUY) == [buy_b]
+    assert order_book.filled_orders[MarketBuyOrder] == [buy_a]
+    assert order_book.cancelled_orders[LimitSellOrder] == [sell_a]
+    assert order_book.limit_ladders['A'][OrderSide.SELL] == []
+
+
+def test_partially_filled_orders_stay_pending(context):
+    order = place(context, MarketSellOrder, 'A')
+    order_book = context.broker.order_book
+    fill = order_book.fill_order(pending_order_id=order.id, filled_price=100., order_price=100., size=40.,
+                                 commission=0., volume=0.4)
+    assert fill.order_volume == 0.4
+    assert order.volume == pytest.approx(0.6)
+    assert order_book.get_pending(asset=context.assets['A']) == [order]
+
+    fill = order_book.fill_order(pending_order_id=order.id, filled_price=100., order_price=100., size=60.,
+                                 commission=0., volume=1.)
+    assert fill.order_volume == pytest.approx(0.6)
+    assert not order_book.has_pending(context.assets['A'])
+
+
+def test_orders_expire_after_their_expiry_time(context):
+    time = context.time_ns
+    expiring = place(context, LimitBuyOrder, 'A', limit_price=1., expires_at=time + NS_PER_DAY)
+    kept = place(context, LimitBuyOrder, 'A', limit_price=1.)
+    order_book = context.broker.order_book
+
+    # An order can still be filled in the bar at its expiry time
+    context.update_time(time=time + NS_PER_DAY)
+    order_book.update_post_event_stack(assets=[])
+    assert order_book.get_pending() == [expiring, kept]
+
+    context.update_time(time=time + 2 * NS_PER_DAY)
+    order_book.update_post_event_stack(assets=[])
+    assert order_book.get_pending() == [kept]
+    assert order_book.cancelled_orders[LimitBuyOrder] == [expiring]
+
+
+def test_limit_orders_are_woken_when_their_price_is_within_the_bar(context):
+    a = context.assets['A']
+    low, high = float(a.bars.low[0]), float(a.bars.high[0])
+    inside = [place(context, LimitBuyOrder, 'A', limit_price=low), place(context, LimitSellOrder, 'A', limit_price=high)]
+    place(context, LimitBuyOrder, 'A', limit_price=low - 0.01)
+    place(context, LimitSellOrder, 'A', limit_price=high + 0.01)
+    other_asset = place(context, LimitBuyOrder, 'B', limit_price=float(context.assets['B'].bars.close[0]))
+    market = place(context, MarketSellOrder, 'B')
+    order_book = context.broker.order_book
+    order_book.update_post_event_stack(assets=[])
+
+    woken = order_book.update_post_event_stack(assets=[a])
+    assert {event.order_id for event in woken} == {market.id} | {order.id for order in inside}
+    assert len(order_book.update_post_event_stack()) == 6
+    assert other_asset.pending_event in order_book.update_post_event_stack(assets=list(context.assets.values()))
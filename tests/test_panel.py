@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.data.panel import BarPanel
+from shinywaffle.data.time_series_data import BarSeries
+from shinywaffle.strategy import sma_crossover
+from shinywaffle.utils.misc import NS_PER_DAY
+
+
+def test_streamed_assets_are_priced_from_their_bars(make_bars, make_chunk_source, make_context, tmp_path):
+    context = make_context(bars={'STK': make_bars(200)},
+                           streams={'STR': make_chunk_source(make_bars(200, seed=1), chunk_size=10)},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    panel = BarPanel(context)
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 6, 1), path=str(tmp_path), filename='panel')
+    backtester.run()
+
+    stream = context.assets['STR']
+    assert np.isnan(panel.latest_value('STR', 'close'))
+    assert context.broker.latest_bar_value(stream, 'close') == stream.bars.close[0]
+    np.testing.assert_array_equal(context.broker.latest_prices('close'),
+                                  [context.assets['STK'].bars.close[0], stream.bars.close[0]])
+
+    assert np.all(np.isfinite(context.account.time_series['values']))
+    traded = {trade.asset.ticker for trade in context.account.trade_log.all_trades}
+    assert traded == {'STK', 'STR'}
+
+
+def test_panel_aligns_the_bars_of_all_assets(make_bars, make_context):
+    every_day, daily = make_bars(20), make_bars(20, seed=1)
+    every_other_day = BarSeries.from_arrays(**{field: daily.get(field)[::-1][::2] for field in
+                                               ('time', 'open', 'high', 'low', 'close', 'volume')})
+    context = make_context(bars={'A': every_day, 'B': every_other_day})
+    panel = BarPanel(context)
+
+    # The bars at the start time of the context are not replayed
+    assert len(panel) == 19
+    np.testing.assert_array_equal(panel.times, every_day.time_index()[1:])
+    np.testing.assert_array_equal(panel.valid[:, 1], np.arange(1, 20) % 2 == 0)
+    assert np.isnan(panel.current('close')).all()
+
+    # Day 5 has a bar of A only, the latest bar of B is the one of day 4
+    day_5 = int(every_day.time[-1]) + 5 * NS_PER_DAY
+    assert panel.advance(to_time_ns=day_5) == 5
+    np.testing.assert_array_equal(panel.current('close'), [every_day.close[-6], np.nan])
+    np.testing.assert_array_equal(panel.current_valid(), [True, False])
+    np.testing.assert_array_equal(panel.latest('close'), [every_day.close[-6], every_other_day.close[-3]])
+    assert panel.latest_value('B', 'close') == every_other_day.close[-3]
+    np.testing.assert_array_equal(panel.history('close', window=2)[:, 0], every_day.close[-6:-4][::-1])
+
+    assert panel.advance(to_time_ns=day_5) == 0
+    with pytest.raises(ValueError):
+        panel.get('close')[0, 0] = 0.
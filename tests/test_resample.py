@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.data.resample import Resampler, resample
+from shinywaffle.data.time_series_data import BarSeries
+from shinywaffle.strategy import sma_crossover
+from shinywaffle.utils.misc import ns_to_datetime, NS_PER_DAY
+
+
+def test_trim_counts_dropped_bars(make_bars):
+    series = make_bars(10)
+    series.trim(3)
+    assert series.trimmed == 7
+    assert len(series) == 3
+
+    series.extend(make_bars(5, start=datetime(2015, 2, 1)))
+    series.trim(3)
+    assert series.trimmed == 12
+
+
+def test_resampler_follows_streamed_and_trimmed_series(make_bars, make_chunk_source, make_context, tmp_path):
+    bars = make_bars(200)
+    context = make_context(streams={'STK': make_chunk_source(bars, chunk_size=17)},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    asset = context.assets['STK']
+    strategy = next(iter(context.strategies.values()))
+    resampler = Resampler(asset.bars, timedelta(days=7), base_interval=timedelta(days=1), context=context)
+
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 7, 1), path=str(tmp_path), filename='resample')
+    backtester.run()
+
+    # The asset series only keeps the lookback of the strategy, but the resampled series has every complete week
+    assert asset.bars.trimmed > 0
+    assert len(asset.bars) <= 2 * strategy.lookback
+
+    # The stream starts after the start time of the context
+    replayed = bars.between(1, int(np.searchsorted(bars.time_index(), asset.bars.time[0], side='right')))
+    expected = resample(replayed, timedelta(days=7))
+    complete = len(expected) - 1 if expected.time[0] + 7 * NS_PER_DAY > asset.bars.time[0] + NS_PER_DAY \
+        else len(expected)
+    assert len(resampler.series) == complete
+    for field in BarSeries.fields:
+        np.testing.assert_array_equal(resampler.series.get(field), expected.get(field)[-complete:])
+
+
+def test_weekly_buckets_run_from_monday_to_sunday(make_bars):
+    # Daily bars from Thursday 2015-01-01 to Sunday 2015-02-01
+    bars = make_bars(32)
+    weekly = resample(bars, timedelta(weeks=1))
+
+    starts = [ns_to_datetime(t) for t in weekly.time[::-1]]
+    assert starts == [datetime(2014, 12, 29), datetime(2015, 1, 5), datetime(2015, 1, 12), datetime(2015, 1, 19),
+                      datetime(2015, 1, 26)]
+    assert all(start.weekday() == 0 for start in starts)
+
+    # The first week only has the bars from Thursday to Sunday, the last one the bars from Monday to Sunday
+    assert weekly.open[-1] == bars.open[-1]
+    assert weekly.close[-1] == bars.get('close')[-4]
+    assert weekly.volume[0] == pytest.approx(np.sum(bars.volume[:7]))
+
+    # A whole number of weeks is counted from the same Monday, other intervals from epoch
+    assert ns_to_datetime(resample(bars, timedelta(weeks=2)).time[-1]) == datetime(2014, 12, 22)
+    assert ns_to_datetime(resample(bars, timedelta(days=2)).time[-1]) == datetime(2015, 1, 1)
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import numpy as np
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.data.panel import BarPanel
+from shinywaffle.strategy.momentum_rotation import MomentumRotation
+from shinywaffle.strategy.strategy import CrossSectionalStrategy
+
+
+class RecordingStrategy(CrossSectionalStrategy):
+
+    """ Records the assets and panel columns of each call and never trades """
+
+    def __init__(self, context):
+        super().__init__(context, 'Recording')
+        self.calls = list()
+
+    def cross_sectional_logic(self, assets, columns):
+        self.calls.append(([asset.ticker for asset in assets], columns.tolist(), self.context.time_ns))
+        return []
+
+
+def run(context, tmp_path):
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 4, 1), path=str(tmp_path), filename='cross_section')
+    backtester.run()
+    return backtester
+
+
+def test_cross_sectional_strategy_is_called_once_per_step(make_bars, make_context, tmp_path):
+    context = make_context(bars={ticker: make_bars(100, seed=seed) for seed, ticker in enumerate('ABC')})
+    strategy = RecordingStrategy(context)
+    strategy.apply_to_asset(context.assets['A'], context.assets['C'])
+    BarPanel(context)
+    backtester = run(context, tmp_path)
+
+    assert [time for _, _, time in strategy.calls] == list(backtester.times)
+    for tickers, columns, _ in strategy.calls:
+        assert tickers == ['A', 'C']
+        assert columns == [0, 2]
+
+
+def test_momentum_rotation_holds_the_top_assets(make_bars, make_context, tmp_path):
+    trends = {'UP': 0.5, 'FLAT': 0., 'DOWN': -0.5}
+    context = make_context(bars={ticker: make_bars(100, close=100 + trend * np.arange(100))
+                                 for ticker, trend in trends.items()})
+    strategy = MomentumRotation(context, window=5, top_n=1)
+    strategy.apply_to_asset(*context.assets.values())
+    BarPanel(context)
+    run(context, tmp_path)
+
+    assert {trade.asset.ticker for trade in context.account.trade_log.all_trades} == {'UP'}
+    assert context.account.balances[context.assets['UP']].balance > 0
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.data.streaming import Prefetcher, StreamCursor
+from shinywaffle.strategy import sma_crossover
+
+
+def test_closing_prefetcher_stops_thread_and_closes_iterator():
+    closed = threading.Event()
+
+    def items():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            closed.set()
+
+    prefetcher = Prefetcher(items())
+    assert next(prefetcher) == 0
+    prefetcher.close()
+
+    assert not prefetcher._thread.is_alive()
+    assert closed.is_set()
+    assert prefetcher._queue.empty()
+    with pytest.raises(StopIteration):
+        next(prefetcher)
+
+
+def test_prefetcher_is_exhausted_after_raising():
+    def items():
+        yield 1
+        raise ValueError('broken chunk')
+
+    prefetcher = Prefetcher(items())
+    assert next(prefetcher) == 1
+    with pytest.raises(ValueError):
+        next(prefetcher)
+
+    # A further next() must not wait for an item that is never queued
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(StopIteration):
+            executor.submit(next, prefetcher).result(timeout=5)
+
+
+def test_stream_cursor_releases_chunks_when_closed(make_bars, make_chunk_source):
+    bars = make_bars(100)
+    cursor = StreamCursor(make_chunk_source(bars, chunk_size=10), start_time_ns=0)
+    assert len(cursor.advance(int(bars.time[-1]) + 5 * 24 * 60 * 60 * 10 ** 9)) == 6
+
+    cursor.close()
+    assert not cursor.chunks._thread.is_alive()
+    assert len(cursor.chunk) == 0
+    assert cursor.advance(int(bars.time[0])) == []
+
+
+def test_backtest_ending_before_stream_stops_prefetching(make_bars, make_chunk_source, make_context, tmp_path):
+    context = make_context(streams={'STK': make_chunk_source(make_bars(400), chunk_size=10)},
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 3, 1), path=str(tmp_path), filename='stream')
+    backtester.run()
+
+    cursors = [cursor for _, series_cursors in backtester.data_provider.replay for cursor, _ in series_cursors]
+    assert all(isinstance(cursor, StreamCursor) and cursor.exhausted for cursor in cursors)
+    assert not any(cursor.chunks._thread.is_alive() for cursor in cursors)
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from shinywaffle.backtesting.backtest import Backtester
+from shinywaffle.backtesting.study.study import BacktestStudy
+from shinywaffle.backtesting.study.uncertainy import UncertaintyVariableSwappable, UncertaintyVariableManifest
+from shinywaffle.strategy import sma_crossover
+
+
+def make_study(make_bars, make_context, tmp_path, seed):
+    context = make_context(bars={'STK': make_bars(200)}, seed=seed,
+                           strategy=lambda c: sma_crossover.AverageCrossOver(context=c, short=3, long=10))
+    strategy = next(iter(context.strategies.values()))
+
+    manifest = UncertaintyVariableManifest()
+    manifest.add_swappable(swappable=[UncertaintyVariableSwappable(parent_obj=strategy, attr_name='short',
+                                                                   name='sma_short')])
+    backtester = Backtester(context=context, time_increment='daily', run_from=datetime(2015, 2, 1),
+                            run_to=datetime(2015, 6, 1))
+    study = BacktestStudy(context=context, backtester=backtester, study_name='seeds', save_path=str(tmp_path),
+                          num_runs=2, num_sub_runs=2, num_stochastic_runs=2, variable_swap_manifest=manifest)
+    study.parameters = [{'sma_short': 3}, {'sma_short': 4}]
+    study.make_backtests()
+    return study
+
+
+def run_seeds(study):
+    return [s['seed'] for container in study.backtests for s in container.backtests]
+
+
+def test_runs_are_seeded_from_the_study_broker(make_bars, make_context, tmp_path):
+    study = make_study(make_bars, make_context, tmp_path / 'first', seed=1)
+    seeds = run_seeds(study)
+    assert len(set(seeds)) == study.total_number_of_runs
+    assert seeds == [s['backtest'].context.broker.seed for container in study.backtests
+                     for s in container.backtests]
+    assert study.backtests[0].report()['seeds'] == seeds[:2]
+
+    # The same seed gives the same runs, another seed other runs
+    assert seeds == run_seeds(make_study(make_bars, make_context, tmp_path / 'second', seed=1))
+    assert set(seeds).isdisjoint(run_seeds(make_study(make_bars, make_context, tmp_path / 'third', seed=2)))
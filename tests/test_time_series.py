@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from shinywaffle.data.time_series_data import TimeSeries, TimeSeriesContainer, TimeSeriesType
+
+
+class Quote:
+
+    def __init__(self, time: datetime, price: float):
+        self.time = time
+        self.price = price
+
+
+def quotes(first: int, last: int) -> list:
+    """ Quotes of the days from first up to, but not including, last, most recent first """
+    return [Quote(datetime(2015, 1, 1) + timedelta(days=i), float(i)) for i in range(first, last)][::-1]
+
+
+def test_extend_appends_newer_data_points():
+    series = TimeSeries()
+    series.set(quotes(0, 5))
+    series.extend(quotes(5, 8))
+    assert len(series) == 8
+    assert [q.price for q in series] == [7., 6., 5., 4., 3., 2., 1., 0.]
+    assert series[0].price == 7. and series[-1].price == 0.
+    assert [q.price for q in series.between(2, 4)] == [3., 2.]
+    series.extend([])
+    assert len(series) == 8
+
+
+def test_container_finds_series_by_type_and_id(make_bars):
+    container = TimeSeriesContainer()
+    bars, first, second = make_bars(5), TimeSeries(), TimeSeries()
+    container.add(bars, TimeSeriesType.TYPE_ASSET_BARS)
+    container.add(first, TimeSeriesType.TYPE_ASSOCIATED)
+    container.add(second, TimeSeriesType.TYPE_ASSOCIATED)
+
+    assert container.get(series_type=TimeSeriesType.TYPE_ASSET_BARS) == (bars,)
+    assert container.get(series_type=TimeSeriesType.TYPE_ASSOCIATED) == (first, second)
+    assert container.get() == (bars, first, second)
+    assert list(container) == [bars, first, second]
+    assert container.get(id=second.uuid) is second
+    assert container.get(series_type=TimeSeriesType.TYPE_ASSOCIATED, id=first.uuid) is first
+
+
+def test_container_rejects_unknown_ids_and_second_bars(make_bars):
+    container = TimeSeriesContainer()
+    bars = make_bars(5)
+    container.add(bars, TimeSeriesType.TYPE_ASSET_BARS)
+
+    with pytest.raises(ValueError):
+        container.get(id=TimeSeries().uuid)
+    with pytest.raises(ValueError):
+        container.get(series_type=TimeSeriesType.TYPE_ASSOCIATED, id=bars.uuid)
+    with pytest.raises(AttributeError):
+        container.add(make_bars(5), TimeSeriesType.TYPE_ASSET_BARS)
+    with pytest.raises(TypeError):
+        container.add([], TimeSeriesType.TYPE_ASSOCIATED)
+
+
+def test_attribute_views_are_built_when_read_and_follow_the_series():
+    series = TimeSeries()
+    series.set(quotes(0, 3))
+    assert series._attributes == {}
+
+    prices = series.price
+    assert series.price is prices
+    assert list(prices) == [2., 1., 0.]
+    assert prices[0] == 2. and prices[-1] == 0. and prices[:2] == [2., 1.]
+    assert list(series._attributes) == ['price']
+
+    series.extend(quotes(3, 5))
+    assert list(prices) == [4., 3., 2., 1., 0.]
+    assert series.get('price') == [4., 3., 2., 1., 0.]
+
+    # Setting new data discards the views
+    series.set(quotes(10, 12))
+    assert series.price is not prices
+    assert list(series.price) == [11., 10.]
+
+
+def test_missing_attributes_raise_attribute_error():
+    series = TimeSeries()
+    with pytest.raises(AttributeError):
+        series.price
+
+    series.set(quotes(0, 3))
+    with pytest.raises(AttributeError):
+        series.volume
+    assert not hasattr(series, '_hidden')